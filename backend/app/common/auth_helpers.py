@@ -1,6 +1,18 @@
+from typing import Any
+
 from fastapi import Depends, HTTPException, status
 
 from app.common.firebase import verify_firebase_token
+from app.core.constants import FAMILY_TREE
+
+
+def require_user(user=Depends(verify_firebase_token)):
+    """Dependency to reject requests without a signed in user."""
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated"
+        )
+    return user
 
 
 def check_roles(required_roles: list):
@@ -14,3 +26,23 @@ def check_roles(required_roles: list):
         return user
 
     return role_dependency
+
+
+async def get_accessible_tree(tree_id: str, current_user: dict, db: Any) -> Any:
+    """Returns a tree snapshot after checking the user may read it"""
+    tree = await db.collection(FAMILY_TREE).document(tree_id).get()
+    if not tree.exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Family tree not found",
+        )
+
+    tree_data = tree.to_dict()
+    if current_user["uid"] != tree_data.get("created_by") and current_user[
+        "email"
+    ] not in tree_data.get("collaborators", []):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this resource",
+        )
+    return tree
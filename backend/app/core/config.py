@@ -4,6 +4,20 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "FastAPI for One-Tree"
+    TREE_VIEWS_ENABLED: bool = True
+
+    # Media storage, "gcs" or "local"
+    STORAGE_BACKEND: str = "gcs"
+    PRIVATE_MEDIA: bool = False
+    LOCAL_STORAGE_PATH: str = "media"
+    LOCAL_STORAGE_URL: str = "/media"
+    UPLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024  # multiple of 256 KiB for GCS
+    MAX_UPLOAD_SIZE: int = 200 * 1024 * 1024
+    IMAGE_WORKERS: int = 2
+    JOB_WORKERS: int = 4
+
+    # Place names for geocoding, the bundled gazetteer when unset
+    GAZETTEER_PATH: str = ""
 
     class Config:
         case_sensitive = True
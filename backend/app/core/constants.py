@@ -4,11 +4,114 @@ PEOPLE = "people"
 CULTURAL_CONTEXT = "culturalContext"
 FAMILY_STORY = "familyStories"
 MIGRATION_RECORDS = "migrationRecords"
+TREE_VIEW = "treeViews"
+TREE_VIEW_SHARDS = "shards"
+VERSIONS = "versions"
+QUOTAS = "quotas"
+JOBS = "jobs"
+STATS = "stats"
+MIGRATION_EVENTS = "migrationEvents"
+TAG_STATS = "culturalContextTags"
 
 MAX_FAMILY_TREE = 2
-MAX_FAMILY_MEMBER = 20
+MAX_FAMILY_MEMBER = 5000
 MAX_MIGRATION_RECORDS = 2
 MAX_CULTURAL_CONTEXT = 5
 MAX_FAMILY_STORIES = 5
 
 CULTURAL_CONTEXT_GCP_PATH = "cultural_contexts"
+
+# Firestore limits
+FIRESTORE_GET_ALL_CHUNK_SIZE = 100
+FIRESTORE_MAX_PARALLEL_READS = 8
+FIRESTORE_BATCH_LIMIT = 500
+
+# Family graph cache
+FAMILY_GRAPH_CACHE_SIZE = 64
+FAMILY_GRAPH_TTL = 300  # seconds
+
+# Exports
+EXPORT_PAGE_SIZE = 500
+
+# Materialized tree views
+TREE_VIEW_MIN_SHARDS = 4
+TREE_VIEW_MEMBERS_PER_SHARD = 400
+
+# HTTP caching
+CONTEXTS_CACHE_CONTROL = "public, max-age=60"
+FEED_CACHE_SIZE = 1024
+FEED_CACHE_TTL = 60  # seconds
+
+# Tag facets
+TAG_FACETS_LIMIT = 20
+MAX_TAG_FACETS = 100
+TAG_RECOUNT_ATTEMPTS = 5
+
+# Moderation
+MAX_BULK_MODERATION = 2000
+
+# Member pagination
+MEMBERS_PAGE_SIZE = 100
+MAX_MEMBERS_PAGE_SIZE = 500
+MAX_NEIGHBORHOOD_GENERATIONS = 6
+
+# Tree migration timeline
+TIMELINE_PAGE_SIZE = 100
+MAX_TIMELINE_PAGE_SIZE = 500
+
+# Cultural context search
+SEARCH_INDEX_TTL = 600  # seconds
+SEARCH_MAX_PREFIX_TERMS = 50
+
+# Responsive image variants
+IMAGE_WIDTHS = (320, 640, 1280)
+IMAGE_QUALITY = 80
+IMAGE_MAX_SOURCE_SIZE = 30 * 1024 * 1024
+
+# Signed media URLs, those issued in the same window share one expiry
+SIGNED_URL_WINDOW = 3600  # seconds
+SIGNED_URL_GRACE = 600  # seconds a URL stays valid after its window
+SIGNED_URL_CACHE_SIZE = 10000
+
+# Background jobs
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 2  # seconds, doubled after every failed attempt
+JOB_MAX_RETRY_DELAY = 300  # seconds
+JOB_LEASE = 300  # seconds a claimed job is held, renewed while it runs
+
+# Migration event map queries
+GEOHASH_PRECISION = 9  # about 5 x 5 m cells
+GEO_MAX_CELLS = 16  # range queries per bounding box
+GEO_CELL_LIMIT = 1000  # events read per cell
+GEO_EVENTS_LIMIT = 500
+TRUNCATED_HEADER = "X-Truncated"
+MAX_GEO_RADIUS_KM = 5000
+
+# Migration flow analytics
+ANALYTICS_TTL = 3600  # seconds
+ANALYTICS_CACHE_SIZE = 128
+FLOW_RESOLUTION = 10.0  # degrees per region
+HEATMAP_RESOLUTION = 2.0  # degrees per cell
+# Coarsest detail shown across users, so one family's moves are not exposed
+MIN_ANALYTICS_RESOLUTION = 1.0  # degrees
+ANALYTICS_MIN_COUNT = 5  # smaller flows and cells are left out
+FLOWS_LIMIT = 100
+MAX_FLOWS_LIMIT = 1000
+
+# Migration maps, vector tiles in tile units of TILE_EXTENT per tile side
+TILE_EXTENT = 4096
+TILE_BUFFER = 64  # tile units drawn past each edge
+MAX_TILE_ZOOM = 22
+CLUSTER_MAX_ZOOM = 14  # points are clustered below this zoom
+CLUSTER_CELL_SIZE = 256  # tile units, 16 px on a 256 px tile
+SIMPLIFY_TOLERANCE = 8  # tile units
+MAP_CACHE_TTL = 600  # seconds
+MAP_SCOPE_CACHE_SIZE = 256
+MAP_TILE_CACHE_SIZE = 4096
+MAP_TILE_CACHE_CONTROL = "private, max-age=60"
+
+# Geocoding of migration event locations
+GEOCODE_CACHE_SIZE = 4096
+GEOCODE_MIN_LENGTH = 4  # shortest name matched by prefix or trigrams
+GEOCODE_MIN_SIMILARITY = 0.6  # trigram Dice coefficient
+GEOCODE_MAX_CANDIDATES = 50
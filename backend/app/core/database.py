@@ -8,19 +8,23 @@ from dotenv import load_dotenv
 from fastapi import FastAPI
 from firebase_admin import credentials, firestore
 
+from app.core.config import settings
+from app.services.jobs import job_queue
+from app.utils.images import shutdown_pool
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-db: Optional[firestore.Client] = None
+db: Optional[firestore.AsyncClient] = None
 
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.getenv(
     "GOOGLE_APPLICATION_CREDENTIALS"
 )
 
 
-def get_db() -> firestore.Client:
+def get_db() -> firestore.AsyncClient:
     """
     Returns the global database instance.
     Raises an exception if the database is not initialized.
@@ -32,7 +36,7 @@ def get_db() -> firestore.Client:
     return db
 
 
-def set_db(database: firestore.Client) -> None:
+def set_db(database: firestore.AsyncClient) -> None:
     """Sets the global database instance."""
     global db
     db = database
@@ -47,8 +51,10 @@ async def lifespan(app: FastAPI):
             cred, {"storageBucket": os.getenv("FIREBASE_STORAGE_BUCKET")}
         )
 
-        firestore_client = firestore.Client()
+        # Async client so Firestore I/O never blocks the event loop
+        firestore_client = firestore.AsyncClient()
         set_db(firestore_client)
+        await job_queue.start(firestore_client, settings.JOB_WORKERS)
 
         print("✅ Connected to Firestore")
         logger.info("✅ Connected to Firestore")
@@ -60,6 +66,8 @@ async def lifespan(app: FastAPI):
         raise e
     finally:
         # Shutdown event
+        await job_queue.stop()
+        shutdown_pool()
         if get_db():
             get_db().close()
             print("🔄 Closed Firestore connection")
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, EmailStr, Field
 
@@ -84,6 +84,8 @@ class CulturalContext(AbstractBaseModel):
     content: str
     video_url: Optional[str] = None
     image_url: Optional[str] = None
+    # srcset of resized image variants by MIME type, e.g. "image/webp"
+    image_srcset: Optional[Dict[str, str]] = None
     audio_url: Optional[str] = None
     link_url: Optional[str] = None
     tags: List[str] = []
@@ -96,6 +98,8 @@ class MigrationEvent(BaseModel):
     location: Optional[str] = None
     latitude: Optional[float] = None
     longitude: Optional[float] = None
+    # Gazetteer place the coordinates were filled from, None when sent
+    geocoded: Optional[str] = None
 
 
 class MigrationRecord(AbstractBaseModel):
@@ -104,3 +108,23 @@ class MigrationRecord(AbstractBaseModel):
     description: str
     timeline: List[MigrationEvent] = []
     media: Optional[List[str]] = None
+
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    RETRYING = "retrying"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class Job(AbstractBaseModel):
+    """Background job record, kept so jobs survive restarts and can be polled"""
+
+    kind: str
+    status: str = JobStatus.QUEUED.value
+    payload: Dict[str, Any] = {}
+    attempts: int = 0
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    run_at: Optional[datetime] = None
@@ -1,7 +1,7 @@
-import os
+import asyncio
+from collections import Counter
 from datetime import datetime
-from typing import List, Optional
-from urllib.parse import urlparse
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import (
     APIRouter,
@@ -11,6 +11,7 @@ from fastapi import (
     HTTPException,
     Query,
     Request,
+    Response,
     UploadFile,
     status,
 )
@@ -19,21 +20,161 @@ from firebase_admin import firestore
 from app.common.auth_helpers import check_roles
 from app.common.firebase import verify_firebase_token
 from app.core.constants import (
+    CONTEXTS_CACHE_CONTROL,
     CULTURAL_CONTEXT,
     CULTURAL_CONTEXT_GCP_PATH,
+    FEED_CACHE_SIZE,
+    FEED_CACHE_TTL,
+    FIRESTORE_BATCH_LIMIT,
     MAX_CULTURAL_CONTEXT,
+    MAX_TAG_FACETS,
+    TAG_FACETS_LIMIT,
 )
 from app.core.database import get_db
 from app.models.models import ContextStatus, CulturalContext
 from app.schemas.cultural_schemas import (
+    BulkModerationResponse,
+    BulkModerationResult,
+    BulkModerationSchema,
+    CacheStatsSchema,
     CulturalContextAdminResponse,
     CulturalContextResponse,
+    ModerationQueueResponse,
+    SignedUrlStatsSchema,
+    TagCount,
+    TagFacetsResponse,
 )
-from app.utils.helper import delete_blob, upload_to_gcs
+from app.schemas.job_schemas import JobAcceptedSchema
+from app.services.cleanup import DELETE_MEDIA
+from app.services.jobs import job_queue
+from app.services.quota import quota_slot, release_quota
+from app.services.search_index import SEARCH_FIELDS, context_search
+from app.services.signed_urls import sign_contexts, signed_urls, signing_window
+from app.services.tag_stats import (
+    count_tags,
+    read_tag_counts,
+    rebuild_tag_counts,
+    stage_tag_deltas,
+    tag_deltas,
+    top_tags,
+    write_with_tag_counts,
+)
+from app.utils.cache import TTLCache
+from app.utils.cursor import encode_cursor, read_cursor
+from app.utils.db_helpers import chunked, get_documents
+from app.utils.etag import etag_matches, make_etag, not_modified, read_version
+from app.utils.images import build_image_srcset, read_image, srcset_urls
+from app.utils.storage import MediaTooLargeError, delete_urls, upload_many, upload_media
 
 router = APIRouter()
 
-bucket_name = os.getenv("FIREBASE_STORAGE_BUCKET")
+# Approved feed pages and posts, stored with their ETag
+feed_cache = TTLCache(max_size=FEED_CACHE_SIZE, ttl=FEED_CACHE_TTL)
+FEED_TAG = "feed"
+SEARCH_TAG = "feed:search"
+
+ADMIN_FIELDS = list(CulturalContextAdminResponse.model_fields)
+
+
+def context_tag(context_id: str) -> str:
+    return f"context:{context_id}"
+
+
+def media_urls(context_data: dict) -> List[str]:
+    """URLs of every stored file of a context"""
+    urls = [
+        context_data.get(field) for field in ("image_url", "video_url", "audio_url")
+    ]
+    urls += srcset_urls(context_data.get("image_srcset"))
+    return [url for url in urls if url]
+
+
+def invalidate_feed(context_id: str, was_approved: bool, is_approved: bool) -> None:
+    """Drops the cached feed entries affected by a change to one context"""
+    feed_cache.invalidate_tag(context_tag(context_id))
+    if was_approved != is_approved:
+        # Totals, pages and cursors shift when a context joins or leaves
+        feed_cache.invalidate_tag(FEED_TAG)
+    elif is_approved:
+        # Edited text can change which searches match
+        feed_cache.invalidate_tag(SEARCH_TAG)
+
+
+async def refresh_feed(
+    db: Any, context_id: str, old: Optional[dict], new: Optional[dict]
+) -> None:
+    """
+    Applies a write to one context to the search index and the feed cache,
+    and bumps the feed version if the approved contexts changed
+    """
+    if new is None:
+        context_search.remove(context_id)
+    else:
+        context_search.upsert(context_id, new)
+    approved = ContextStatus.APPROVED.value
+    was_approved = (old or {}).get("status") == approved
+    is_approved = (new or {}).get("status") == approved
+    invalidate_feed(context_id, was_approved, is_approved)
+    if was_approved or is_approved:
+        await context_search.publish(db)
+
+
+# A page of contexts, the total number of matches and the next cursor
+Page = Tuple[List[dict], int, Optional[str]]
+
+
+async def search_page(
+    db: Any, q: str, latest: bool, version: int, start: int, limit: int
+) -> Page:
+    """
+    Matches and orders approved contexts in the search index, then reads
+    only the requested page. An index loaded before `version` is reloaded.
+    """
+    index = await context_search.get(db, version)
+    context_ids = [context_id for context_id, _ in index.search(q)]
+    if latest:
+        context_ids = index.latest(context_ids)
+
+    end = start + limit
+    contexts = await get_documents(db, CULTURAL_CONTEXT, context_ids[start:end])
+    next_cursor = encode_cursor({"offset": end}) if end < len(context_ids) else None
+    return contexts, len(context_ids), next_cursor
+
+
+async def feed_page(
+    db: Any, latest: bool, limit: int, page: int, position: Optional[dict]
+) -> Page:
+    """
+    Reads a page of approved contexts with keyset pagination ordered by
+    Firestore, with the total from a count aggregation
+    """
+    approved = db.collection(CULTURAL_CONTEXT).where(
+        "status", "==", ContextStatus.APPROVED.value
+    )
+    direction = firestore.Query.DESCENDING if latest else firestore.Query.ASCENDING
+    query = (
+        approved.order_by("created_at", direction=direction)
+        .order_by("__name__", direction=direction)
+        .limit(limit)
+    )
+    if position:
+        query = query.start_after(
+            {"created_at": position["created_at"], "__name__": position["id"]}
+        )
+    elif page > 1:
+        query = query.offset((page - 1) * limit)
+
+    async def read_page() -> List[dict]:
+        return [doc.to_dict() async for doc in query.stream()]
+
+    contexts, count = await asyncio.gather(read_page(), approved.count().get())
+    last = contexts[-1] if contexts else None
+    next_cursor = (
+        encode_cursor({"created_at": last["created_at"], "id": last["id"]})
+        if last and len(contexts) == limit
+        else None
+    )
+    return contexts, int(count[0][0].value), next_cursor
 
 
 @router.get(
@@ -43,74 +184,82 @@ bucket_name = os.getenv("FIREBASE_STORAGE_BUCKET")
 )
 async def get_contexts(
     request: Request,
-    q: Optional[str] = Query(None, description="Search query for title and tags"),
+    response: Response,
+    q: Optional[str] = Query(
+        None, description="Search query for title, tags and content"
+    ),
     latest: bool = Query(False, description="Get latest posts first"),
     limit: int = Query(10, ge=1, le=100, description="Number of items per page"),
     page: int = Query(1, ge=1, description="Page number"),
+    cursor: Optional[str] = Query(
+        None, description="`next_cursor` of the previous page, replaces `page`"
+    ),
     db=Depends(get_db),
 ) -> CulturalContextResponse:
     """
     Get cultural contexts with search, pagination and sorting capabilities
 
     Args:
-        q: Optional search query for filtering by title and tags
+        q: Optional search query, ranked by relevance over title, tags and content
         latest: Boolean to sort by creation date descending
         limit: Number of items per page (1-100)
         page: Page number (starts at 1)
+        cursor: Position after the previous page, pages by cursor cost only
+            `limit` reads however deep they are
         db: Database connection dependency
     """
     try:
-        # Fetch all APPROVED documents
-        all_docs = (
-            db.collection(CULTURAL_CONTEXT)
-            .where("status", "==", ContextStatus.APPROVED.value)
-            .stream()
-        )
-
-        # Convert Firestore documents to Python dictionaries
-        contexts = [doc.to_dict() for doc in all_docs]
+        cache_key = ("feed", q, latest, limit, page, cursor)
+        cached = feed_cache.get(cache_key)
+        if cached is not None:
+            etag, result = cached
+        else:
+            # The feed version changes whenever approved contexts do, so an
+            # unchanged feed is answered from that one read
+            version = await read_version(db, CULTURAL_CONTEXT)
+            etag = make_etag(version, request.url.query, signing_window())
+        if etag_matches(request, etag):
+            return not_modified(etag, CONTEXTS_CACHE_CONTROL)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CONTEXTS_CACHE_CONTROL
+        if cached is not None:
+            return result
 
-        if not contexts:
-            return CulturalContextResponse(
-                cultural_contexts=[],
-                total_items=0,
-                total_pages=0,
-                current_page=page,
+        if q:
+            position = read_cursor(cursor, offset=int)
+            start = position["offset"] if position else (page - 1) * limit
+            paginated_contexts, total_items, next_cursor = await search_page(
+                db, q, latest, version, start, limit
+            )
+        else:
+            position = read_cursor(cursor, created_at=datetime, id=str)
+            paginated_contexts, total_items, next_cursor = await feed_page(
+                db, latest, limit, page, position
             )
 
-        # Search filtering (only in Python)
-        if q:
-            search_term = q.lower()
-            contexts = [
-                context
-                for context in contexts
-                if search_term in context.get("title", "").lower()
-                or any(search_term in tag.lower() for tag in context.get("tags", []))
+        cultural_contexts = await sign_contexts(
+            [
+                CulturalContext(**context)
+                for context in paginated_contexts
+                if context.get("status") == ContextStatus.APPROVED.value
             ]
+        )
 
-        # Sort by `created_at` if `latest=True`
-        if latest:
-            contexts.sort(key=lambda x: x.get("created_at", datetime.min), reverse=True)
-
-        # Pagination logic
-        total_items = len(contexts)
-        total_pages = (total_items + limit - 1) // limit
-        start_idx = (page - 1) * limit
-        end_idx = start_idx + limit
-        paginated_contexts = contexts[start_idx:end_idx]
-
-        # Convert to CulturalContext objects
-        cultural_contexts = [
-            CulturalContext(**context) for context in paginated_contexts
-        ]
-
-        return CulturalContextResponse(
+        result = CulturalContextResponse(
             cultural_contexts=cultural_contexts,
             total_items=total_items,
-            total_pages=total_pages,
+            total_pages=(total_items + limit - 1) // limit,
             current_page=page,
+            next_cursor=next_cursor,
         )
+        tags = [FEED_TAG] + [context_tag(context.id) for context in cultural_contexts]
+        if q:
+            tags.append(SEARCH_TAG)
+        feed_cache.set(cache_key, (etag, result), tags)
+        return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -128,18 +277,216 @@ async def get_cultural_posts_admin(
     db=Depends(get_db),
 ) -> list[CulturalContextAdminResponse]:
     try:
-        contexts = db.collection(CULTURAL_CONTEXT).stream()
-        contexts = [CulturalContext(**doc.to_dict()) for doc in contexts]
-        sorted_contexts = sorted(contexts, key=lambda x: x.created_at, reverse=True)
+        # Read only the fields of the admin response, newest first
+        contexts = (
+            db.collection(CULTURAL_CONTEXT)
+            .select(ADMIN_FIELDS)
+            .order_by("created_at", direction=firestore.Query.DESCENDING)
+            .stream()
+        )
+        return [CulturalContextAdminResponse(**doc.to_dict()) async for doc in contexts]
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
 
-        return sorted_contexts
 
+async def queue_page(
+    db: Any, statuses: List[ContextStatus], position: Optional[dict], limit: int
+) -> List[dict]:
+    """
+    Reads up to `limit` contexts of the moderation queue, status by status
+    and newest first, starting after `position`
+    """
+    contexts = db.collection(CULTURAL_CONTEXT)
+    items: List[dict] = []
+    for context_status in statuses:
+        query = (
+            contexts.where("status", "==", context_status.value)
+            .select(ADMIN_FIELDS)
+            .order_by("created_at", direction=firestore.Query.DESCENDING)
+            .order_by("__name__", direction=firestore.Query.DESCENDING)
+            .limit(limit - len(items))
+        )
+        if position and position["status"] == context_status.value:
+            query = query.start_after(
+                {"created_at": position["created_at"], "__name__": position["id"]}
+            )
+        items += [doc.to_dict() async for doc in query.stream()]
+        if len(items) >= limit:
+            break
+    return items
+
+
+@router.get(
+    "/contexts/admin/queue",
+    response_model=ModerationQueueResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_moderation_queue(
+    request: Request,
+    status_filter: Optional[ContextStatus] = Query(
+        None, alias="status", description="Only contexts with this status"
+    ),
+    limit: int = Query(20, ge=1, le=100, description="Number of items per page"),
+    cursor: Optional[str] = Query(
+        None, description="`next_cursor` of the previous page"
+    ),
+    current_user=Depends(check_roles(["admin"])),
+    db=Depends(get_db),
+) -> ModerationQueueResponse:
+    """
+    Get a page of the moderation queue with the number of contexts per status
+
+    Without a status filter pending contexts come first, then approved and
+    rejected ones, each newest first. Pages are read with keyset queries
+    projected to the admin fields and counts come from aggregations, so a
+    page costs the same however large the archive is.
+    """
+    try:
+        statuses = [status_filter] if status_filter else list(ContextStatus)
+        position = read_cursor(cursor, status=str, created_at=datetime, id=str)
+        if position:
+            values = [context_status.value for context_status in statuses]
+            if position["status"] not in values:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+                )
+            statuses = statuses[values.index(position["status"]) :]
+
+        contexts = db.collection(CULTURAL_CONTEXT)
+
+        async def count(context_status: ContextStatus) -> int:
+            query = contexts.where("status", "==", context_status.value)
+            result = await query.count().get()
+            return int(result[0][0].value)
+
+        items, *counts = await asyncio.gather(
+            queue_page(db, statuses, position, limit + 1),
+            *(count(context_status) for context_status in ContextStatus),
+        )
+        # One extra item is read to know whether another page exists
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = encode_cursor(
+                {
+                    "status": last["status"],
+                    "created_at": last["created_at"],
+                    "id": last["id"],
+                }
+            )
+
+        return ModerationQueueResponse(
+            items=[CulturalContextAdminResponse(**item) for item in items],
+            counts={
+                context_status.value: total
+                for context_status, total in zip(ContextStatus, counts)
+            },
+            next_cursor=next_cursor,
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
 
 
+@router.get(
+    "/contexts/cache/stats",
+    response_model=CacheStatsSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def get_feed_cache_stats(
+    request: Request,
+    current_user=Depends(check_roles(["admin"])),
+) -> CacheStatsSchema:
+    """Get hit and miss counters of this process's feed cache"""
+    return CacheStatsSchema(**feed_cache.stats())
+
+
+@router.get(
+    "/contexts/tags",
+    response_model=TagFacetsResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_context_tags(
+    request: Request,
+    q: Optional[str] = Query(
+        None, description="Only count contexts matching this search query"
+    ),
+    limit: int = Query(
+        TAG_FACETS_LIMIT, ge=1, le=MAX_TAG_FACETS, description="Number of tags"
+    ),
+    db=Depends(get_db),
+) -> TagFacetsResponse:
+    """
+    Get the most used tags of approved cultural contexts with their counts
+
+    Without `q` the counts come from the maintained tag statistics, one
+    document read. With `q` they are counted over the search index matches.
+    """
+    try:
+        if q:
+            index = await context_search.get(db)
+            counts = count_tags(
+                index.tags.get(context_id, []) for context_id, _ in index.search(q)
+            )
+        else:
+            counts = await read_tag_counts(db)
+
+        return TagFacetsResponse(
+            tags=[
+                TagCount(tag=tag, count=count) for tag, count in top_tags(counts, limit)
+            ]
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.post(
+    "/contexts/tags/rebuild",
+    response_model=TagFacetsResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def rebuild_context_tags(
+    request: Request,
+    current_user=Depends(check_roles(["admin"])),
+    db=Depends(get_db),
+) -> TagFacetsResponse:
+    """Recount the tag statistics from all approved cultural contexts"""
+    try:
+        counts = await rebuild_tag_counts(db)
+        return TagFacetsResponse(
+            tags=[
+                TagCount(tag=tag, count=count)
+                for tag, count in top_tags(counts, len(counts))
+            ]
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.get(
+    "/contexts/signed-urls/stats",
+    response_model=SignedUrlStatsSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def get_signed_url_stats(
+    request: Request,
+    current_user=Depends(check_roles(["admin"])),
+) -> SignedUrlStatsSchema:
+    """Get cache counters of this process's signed media URLs"""
+    return SignedUrlStatsSchema(**signed_urls.stats())
+
+
 @router.get(
     "/contexts/{user_id}/user",
     response_model=List[CulturalContext],
@@ -162,11 +509,13 @@ async def get_user_contexts(
         contexts = (
             db.collection(CULTURAL_CONTEXT).where("created_by", "==", user_id).stream()
         )
-        user_contexts = [CulturalContext(**context.to_dict()) for context in contexts]
+        user_contexts = [
+            CulturalContext(**context.to_dict()) async for context in contexts
+        ]
         sorted_contexts = sorted(
             user_contexts, key=lambda x: x.created_at, reverse=True
         )
-        return sorted_contexts
+        return await sign_contexts(sorted_contexts)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -180,13 +529,23 @@ async def get_user_contexts(
 )
 async def get_context_by_id(
     request: Request,
+    response: Response,
     context_id: str,
     db=Depends(get_db),
     current_user: Optional[dict] = Depends(verify_firebase_token),
 ) -> CulturalContext:
     """Get a cultural context by ID"""
     try:
-        context = db.collection(CULTURAL_CONTEXT).document(context_id).get()
+        # Only approved posts are cached, they are readable by everyone
+        cached = feed_cache.get(("post", context_id))
+        if cached is not None:
+            etag, post = cached
+            if etag_matches(request, etag):
+                return not_modified(etag)
+            response.headers["ETag"] = etag
+            return post
+
+        context = await db.collection(CULTURAL_CONTEXT).document(context_id).get()
         if not context.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -200,7 +559,17 @@ async def get_context_by_id(
                     detail="Access denied - only approved cultural posts allowed",
                 )
 
-        return CulturalContext.from_dict(context_data)
+        etag = make_etag(context_id, context.update_time, signing_window())
+        [post] = await sign_contexts([CulturalContext.from_dict(context_data)])
+        if context_data.get("status") == ContextStatus.APPROVED.value:
+            feed_cache.set(
+                ("post", context_id), (etag, post), [context_tag(context_id)]
+            )
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers["ETag"] = etag
+
+        return post
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -234,62 +603,116 @@ async def create_context(
                 detail="Not authorized to access this resource",
             )
 
-        cultural_docs = (
-            db.collection(CULTURAL_CONTEXT)
-            .where("created_by", "==", created_by)
-            .stream()
-        )
-        posts = [doc.to_dict() for doc in cultural_docs]
-
-        if len(posts) >= MAX_CULTURAL_CONTEXT:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Limit reached! You can only add up to {MAX_CULTURAL_CONTEXT} cultural posts.",
-            )
-
-        image_url, video_url, audio_url = None, None, None
-
-        context = CulturalContext(
-            name=name,
-            created_by=created_by,
-            title=title,
-            content=content,
-            link_url=link_url,
-            tags=tags,
-            video_url=video_url,
-            audio_url=audio_url,
-            image_url=image_url,
-        )
+        async with quota_slot(
+            db, created_by, CULTURAL_CONTEXT, MAX_CULTURAL_CONTEXT
+        ) as granted:
+            if not granted:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Limit reached! You can only add up to {MAX_CULTURAL_CONTEXT} cultural posts.",
+                )
 
-        if video_file:
-            video_url = upload_to_gcs(
-                video_file,
-                f"{CULTURAL_CONTEXT_GCP_PATH}/{context.id}/videos/{video_file.filename}",
+            context = CulturalContext(
+                name=name,
+                created_by=created_by,
+                title=title,
+                content=content,
+                link_url=link_url,
+                tags=tags,
             )
-            context.video_url = video_url
 
-        if image_file:
-            image_url = upload_to_gcs(
-                image_file,
-                f"{CULTURAL_CONTEXT_GCP_PATH}/{context.id}/images/{image_file.filename}",
+            # Upload all media files at once
+            path = f"{CULTURAL_CONTEXT_GCP_PATH}/{context.id}"
+            uploads = {
+                field: (file, f"{path}/{folder}/{file.filename}")
+                for field, folder, file in (
+                    ("video_url", "videos", video_file),
+                    ("image_url", "images", image_file),
+                    ("audio_url", "audio", audio_file),
+                )
+                if file
+            }
+            # Image variants are encoded while the originals upload
+            image_source = await read_image(image_file)
+            media, image_srcset = await asyncio.gather(
+                upload_many(uploads),
+                build_image_srcset(
+                    image_source,
+                    image_file.filename if image_file else "",
+                    f"{path}/images",
+                ),
+                return_exceptions=True,
             )
-            context.image_url = image_url
-
-        if audio_file:
-            audio_url = upload_to_gcs(
-                audio_file,
-                f"{CULTURAL_CONTEXT_GCP_PATH}/{context.id}/audio/{audio_file.filename}",
+            if isinstance(media, BaseException):
+                if isinstance(image_srcset, dict):
+                    await delete_urls(srcset_urls(image_srcset))
+                raise media
+            for field, url in media.items():
+                setattr(context, field, url)
+            if not isinstance(image_srcset, BaseException):
+                context.image_srcset = image_srcset
+
+            # New contexts are pending, so the feed and the index are unchanged
+            await db.collection(CULTURAL_CONTEXT).document(context.id).set(
+                context.to_dict()
             )
-            context.audio_url = audio_url
-
-        db.collection(CULTURAL_CONTEXT).document(context.id).set(context.to_dict())
-        return context
+            [context] = await sign_contexts([context])
+            return context
+    except MediaTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
 
 
+async def upload_replacement(
+    context_id: str,
+    image_file: Optional[UploadFile],
+    video_file: Optional[UploadFile],
+    audio_file: Optional[UploadFile],
+) -> dict:
+    """Uploads the new media of a context and returns the fields pointing at it"""
+    new_file, new_file_type = next(
+        (
+            (file, file_type)
+            for file, file_type in [
+                (image_file, "image"),
+                (video_file, "video"),
+                (audio_file, "audio"),
+            ]
+            if file
+        ),
+        (None, None),
+    )
+    if not new_file:
+        return {}
+
+    # Upload first so a failed upload keeps the current media
+    folder = f"{CULTURAL_CONTEXT_GCP_PATH}/{context_id}/{new_file_type}s"
+    image_source = await read_image(image_file)
+    new_url, image_srcset = await asyncio.gather(
+        upload_media(new_file, f"{folder}/{new_file.filename}"),
+        build_image_srcset(image_source, new_file.filename, folder),
+        return_exceptions=True,
+    )
+    if isinstance(new_url, BaseException):
+        if isinstance(image_srcset, dict):
+            await delete_urls(srcset_urls(image_srcset))
+        raise new_url
+    if isinstance(image_srcset, BaseException):
+        image_srcset = None
+
+    fields = {field: None for field in ["image_url", "video_url", "audio_url"]}
+    fields["image_srcset"] = image_srcset
+    fields[f"{new_file_type}_url"] = new_url
+    return fields
+
+
 @router.put(
     "/contexts/{context_id}/update",
     response_model=CulturalContext,
@@ -303,7 +726,7 @@ async def update_context(
     updated_by: str = Form(...),
     title: str = Form(...),
     content: str = Form(...),
-    status: str = Form(...),
+    new_status: str = Form(..., alias="status"),
     link_url: Optional[str] = Form(None),
     tags: List[str] = Form([]),
     image_file: Optional[UploadFile] = File(None),
@@ -319,7 +742,7 @@ async def update_context(
             )
 
         context_ref = db.collection(CULTURAL_CONTEXT).document(context_id)
-        context = context_ref.get()
+        context = await context_ref.get()
 
         if not context.exists:
             raise HTTPException(
@@ -327,71 +750,48 @@ async def update_context(
                 detail="Cultural context not found",
             )
 
-        context_data = context.to_dict()
+        fields = {
+            "title": title,
+            "content": content,
+            "updated_by": updated_by,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+            "tags": tags,
+            "status": ContextStatus.PENDING.value
+            if new_status == ContextStatus.REJECTED.value
+            else new_status,
+        }
 
-        # Update fields while preserving other existing data
-        updated_context_data = context_data.copy()
-        updated_context_data.update(
-            {
-                "title": title,
-                "content": content,
-                "updated_by": updated_by,
-                "updated_at": firestore.SERVER_TIMESTAMP,
-                "tags": tags,
-                "status": ContextStatus.PENDING.value
-                if status == ContextStatus.REJECTED.value
-                else status,
-            }
+        if link_url:
+            fields["link_url"] = link_url
+
+        fields.update(
+            await upload_replacement(context_id, image_file, video_file, audio_file)
         )
 
-        if link_url:
-            updated_context_data["link_url"] = link_url
-
-        new_file = None
-        new_file_type = None
-
-        if image_file:
-            new_file = image_file
-            new_file_type = "image"
-        elif video_file:
-            new_file = video_file
-            new_file_type = "video"
-        elif audio_file:
-            new_file = audio_file
-            new_file_type = "audio"
-
-        if new_file:
-            for field in ["image_url", "video_url", "audio_url"]:
-                old_url = context_data.get(field)
-                if old_url:
-                    try:
-                        parsed_url = urlparse(old_url)
-                        path_parts = parsed_url.path.lstrip("/").split("/")
-
-                        if bucket_name in path_parts:
-                            index = path_parts.index(bucket_name) + 1
-                            blob_name = "/".join(path_parts[index:])
-                            delete_blob(blob_name)
-                        else:
-                            raise Exception(
-                                f"Warning: Invalid Storage URL format: {old_url}"
-                            )
-                    except Exception as e:
-                        print(f"Error deleting old file: {str(e)}")
-                        raise Exception(f"Error deleting old file: {str(e)}")
-
-                    updated_context_data[field] = None
-
-            new_url = upload_to_gcs(
-                new_file,
-                f"{CULTURAL_CONTEXT_GCP_PATH}/{context_id}/{new_file_type}s/{new_file.filename}",
+        # Update fields while preserving other existing data
+        context_data, updated_context_data = await write_with_tag_counts(
+            db, context_ref, lambda current: {**current, **fields}
+        )
+        if context_data is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Cultural context not found",
+            )
+        # Old media is only deleted once nothing points at it. A file with
+        # the same name was overwritten in place, so it is kept.
+        new_urls = set(media_urls(updated_context_data))
+        old_urls = [url for url in media_urls(context_data) if url not in new_urls]
+        if old_urls:
+            await job_queue.enqueue(
+                db, DELETE_MEDIA, {"urls": old_urls}, current_user["uid"]
             )
-            updated_context_data[f"{new_file_type}_url"] = new_url
-
-        context_ref.update(updated_context_data)
 
-        updated_context = context_ref.get().to_dict()
-        return CulturalContext.from_dict(updated_context)
+        updated_context = (await context_ref.get()).to_dict()
+        await refresh_feed(db, context_id, context_data, updated_context)
+        [context] = await sign_contexts([CulturalContext.from_dict(updated_context)])
+        return context
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -408,13 +808,13 @@ async def update_context_admin(
     current_user=Depends(check_roles(["admin"])),
     db=Depends(get_db),
     updated_by: str = Form(...),
-    status: str = Form(...),
+    new_status: str = Form(..., alias="status"),
     context_id: str = Form(...),
 ) -> CulturalContext:
     """Update a cultural context by Admin user"""
     try:
         context_ref = db.collection(CULTURAL_CONTEXT).document(context_id)
-        context = context_ref.get()
+        context = await context_ref.get()
 
         if not context.exists:
             raise HTTPException(
@@ -422,20 +822,141 @@ async def update_context_admin(
                 detail="Cultural context not found",
             )
 
-        context_data = context.to_dict()
+        fields = {
+            "updated_by": updated_by,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+            "status": new_status,
+        }
+        context_data, _ = await write_with_tag_counts(
+            db, context_ref, lambda current: {**current, **fields}
+        )
+        if context_data is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Cultural context not found",
+            )
+        updated_context = (await context_ref.get()).to_dict()
+        await refresh_feed(db, context_id, context_data, updated_context)
+        [context] = await sign_contexts([CulturalContext.from_dict(updated_context)])
+        return context
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
 
-        updated_context_data = context_data.copy()
-        updated_context_data.update(
-            {
-                "updated_by": updated_by,
-                "updated_at": firestore.SERVER_TIMESTAMP,
-                "status": status,
-            }
+
+@firestore.async_transactional
+async def stage_moderation(
+    transaction, db, refs: List, new_status: str, updated_by: str
+) -> Tuple[Dict[str, str], dict]:
+    """Reads a chunk of contexts and stages the status of those that change"""
+    found = {
+        snap.id: snap.to_dict()
+        async for snap in db.get_all(
+            refs, field_paths=SEARCH_FIELDS, transaction=transaction
         )
+        if snap.exists
+    }
+    results = {}
+    deltas = Counter()
+    for ref in refs:
+        context_data = found.get(ref.id)
+        if context_data is None:
+            results[ref.id] = "not_found"
+        elif context_data.get("status") == new_status:
+            results[ref.id] = "unchanged"
+        else:
+            transaction.update(
+                ref,
+                {
+                    "status": new_status,
+                    "updated_by": updated_by,
+                    "updated_at": firestore.SERVER_TIMESTAMP,
+                },
+            )
+            deltas.update(
+                tag_deltas(context_data, {**context_data, "status": new_status})
+            )
+            results[ref.id] = "updated"
+    stage_tag_deltas(db, transaction, deltas)
+    return results, found
+
+
+async def moderate_chunk(
+    db, chunk: List[str], new_status: str, updated_by: str
+) -> List[BulkModerationResult]:
+    """Sets the status of a chunk of contexts and refreshes caches once"""
+    collection = db.collection(CULTURAL_CONTEXT)
+    refs = [collection.document(context_id) for context_id in chunk]
+    # A context written meanwhile is read again before it is counted
+    try:
+        results, found = await stage_moderation(
+            db.transaction(), db, refs, new_status, updated_by
+        )
+    except Exception as e:
+        return [
+            BulkModerationResult(id=cid, result="failed", detail=str(e))
+            for cid in chunk
+        ]
+
+    updated = [cid for cid, result in results.items() if result == "updated"]
+    if updated:
+        for context_id in updated:
+            feed_cache.invalidate_tag(context_tag(context_id))
+            context_search.upsert(
+                context_id, {**found[context_id], "status": new_status}
+            )
+        # Every update changes the status, so any approved context on
+        # either side joins or leaves the feed
+        approved = ContextStatus.APPROVED.value
+        if new_status == approved or any(
+            found[context_id].get("status") == approved for context_id in updated
+        ):
+            feed_cache.invalidate_tag(FEED_TAG)
+            await context_search.publish(db)
 
-        context_ref.update(updated_context_data)
-        updated_context = context_ref.get().to_dict()
-        return CulturalContext.from_dict(updated_context)
+    return [BulkModerationResult(id=cid, result=results[cid]) for cid in chunk]
+
+
+@router.put(
+    "/contexts/admin/bulk",
+    response_model=BulkModerationResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def update_contexts_admin_bulk(
+    request: Request,
+    moderation: BulkModerationSchema,
+    current_user=Depends(check_roles(["admin"])),
+    db=Depends(get_db),
+) -> BulkModerationResponse:
+    """
+    Set the status of many cultural contexts at once
+
+    Contexts are read and updated field by field in one transaction per
+    chunk, together with the tag counts. Each item gets its own result, and
+    caches and the search index are refreshed once per chunk.
+    """
+    try:
+        new_status = moderation.status.value
+        context_ids = list(dict.fromkeys(moderation.context_ids))
+
+        results = [
+            result
+            for chunk_results in await asyncio.gather(
+                *(
+                    moderate_chunk(db, chunk, new_status, moderation.updated_by)
+                    # One write of every batch is kept for the tag counts
+                    for chunk in chunked(context_ids, FIRESTORE_BATCH_LIMIT - 1)
+                )
+            )
+            for result in chunk_results
+        ]
+        return BulkModerationResponse(
+            updated=sum(result.result == "updated" for result in results),
+            results=results,
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -444,18 +965,19 @@ async def update_context_admin(
 
 @router.delete(
     "/contexts/{context_id}",
-    status_code=status.HTTP_204_NO_CONTENT,
+    response_model=JobAcceptedSchema,
+    status_code=status.HTTP_202_ACCEPTED,
 )
 async def delete_context(
     request: Request,
     context_id: str,
     current_user=Depends(verify_firebase_token),
     db=Depends(get_db),
-) -> None:
-    """Delete a cultural context by ID"""
+) -> JobAcceptedSchema:
+    """Delete a cultural context by ID, its media is deleted in the background"""
     try:
         context_ref = db.collection(CULTURAL_CONTEXT).document(context_id)
-        context = context_ref.get()
+        context = await context_ref.get()
         if not context.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -469,25 +991,22 @@ async def delete_context(
                 detail="Not authorized to access this resource",
             )
 
-        urls = [
-            context_data.get("image_url"),
-            context_data.get("video_url"),
-            context_data.get("audio_url"),
-        ]
-
-        for url in urls:
-            if url:
-                parsed_url = urlparse(url)
-                path_parts = parsed_url.path.lstrip("/").split("/")
-
-                if bucket_name in path_parts:
-                    index = path_parts.index(bucket_name) + 1
-                    blob_name = "/".join(path_parts[index:])
-                    delete_blob(blob_name)
-                else:
-                    raise Exception(f"Invalid Storage URL format: {url}")
+        context_data, _ = await write_with_tag_counts(
+            db, context_ref, lambda current: None
+        )
+        # Deleted by another request in the meantime
+        if context_data is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Cultural context not found",
+            )
+        await refresh_feed(db, context_id, context_data, None)
+        await release_quota(db, context_data["created_by"], CULTURAL_CONTEXT)
 
-        context_ref.delete()
+        job = await job_queue.enqueue(
+            db, DELETE_MEDIA, {"urls": media_urls(context_data)}, current_user["uid"]
+        )
+        return JobAcceptedSchema(job_id=job.id, status=job.status)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+
+from app.common.firebase import verify_firebase_token
+from app.core.database import get_db
+from app.models.models import Job
+from app.services.jobs import job_ref
+
+router = APIRouter()
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=Job,
+    status_code=status.HTTP_200_OK,
+)
+async def get_job(
+    request: Request,
+    job_id: str,
+    current_user=Depends(verify_firebase_token),
+    db=Depends(get_db),
+) -> Job:
+    """Get the status of a background job"""
+    try:
+        job = await job_ref(db, job_id).get()
+        if not job.exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found",
+            )
+
+        job_data = job.to_dict()
+        if current_user["uid"] != job_data.get(
+            "created_by"
+        ) and "admin" not in current_user.get("roles", []):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access this resource",
+            )
+
+        return Job.from_dict(job_data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
@@ -0,0 +1,106 @@
+from typing import Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
+
+from app.common.auth_helpers import get_accessible_tree, require_user
+from app.core.constants import MAP_TILE_CACHE_CONTROL, MAX_TILE_ZOOM
+from app.core.database import get_db
+from app.services.migration_maps import (
+    migration_maps,
+    scope_query,
+    stream_geojson,
+    tree_scope,
+    user_scope,
+)
+
+router = APIRouter()
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+
+async def map_scope(tree_id: Optional[str], current_user: dict, db) -> str:
+    """A tree the user may read, else the user's own records"""
+    if tree_id:
+        await get_accessible_tree(tree_id, current_user, db)
+        return tree_scope(tree_id)
+    return user_scope(current_user["uid"])
+
+
+@router.get(
+    "/migration-maps/geojson",
+    status_code=status.HTTP_200_OK,
+)
+async def get_migration_geojson(
+    request: Request,
+    tree_id: Optional[str] = Query(None, description="Map a tree instead"),
+    current_user=Depends(require_user),
+    db=Depends(get_db),
+) -> StreamingResponse:
+    """
+    Stream located migration events as a GeoJSON FeatureCollection, with a
+    point per event and a line per record through its events
+    - **tree_id**: Events of the tree's records, the user's own records when unset
+    """
+    try:
+        await map_scope(tree_id, current_user, db)
+        return StreamingResponse(
+            stream_geojson(scope_query(db, tree_id, current_user["uid"])),
+            media_type="application/geo+json",
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.get(
+    "/migration-maps/tiles/{z}/{x}/{y}.mvt",
+    status_code=status.HTTP_200_OK,
+)
+async def get_migration_tile(
+    request: Request,
+    z: int = Path(..., ge=0, le=MAX_TILE_ZOOM),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    tree_id: Optional[str] = Query(None, description="Map a tree instead"),
+    current_user=Depends(require_user),
+    db=Depends(get_db),
+) -> Response:
+    """
+    Get a Mapbox vector tile of located migration events
+    - **events** layer: Points, clustered below zoom 14 with `point_count`
+    - **routes** layer: A simplified line per record through its events
+    """
+    try:
+        if x >= 2**z or y >= 2**z:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Tile is outside the zoom level",
+            )
+        scope = await map_scope(tree_id, current_user, db)
+        tile = await migration_maps.tile(
+            scope, scope_query(db, tree_id, current_user["uid"]), z, x, y
+        )
+        return Response(
+            content=tile,
+            media_type=MVT_MEDIA_TYPE,
+            headers={"Cache-Control": MAP_TILE_CACHE_CONTROL},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
@@ -1,15 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from firebase_admin import firestore
 
+from app.common.auth_helpers import check_roles, require_user
 from app.common.firebase import verify_firebase_token
-from app.core.constants import MAX_MIGRATION_RECORDS, MIGRATION_RECORDS
+from app.core.constants import (
+    ANALYTICS_MIN_COUNT,
+    EXPORT_PAGE_SIZE,
+    FLOW_RESOLUTION,
+    FLOWS_LIMIT,
+    GEO_EVENTS_LIMIT,
+    HEATMAP_RESOLUTION,
+    MAX_FLOWS_LIMIT,
+    MAX_GEO_RADIUS_KM,
+    MAX_MIGRATION_RECORDS,
+    MIGRATION_RECORDS,
+    MIN_ANALYTICS_RESOLUTION,
+    TRUNCATED_HEADER,
+)
 from app.core.database import get_db
 from app.models.models import MigrationRecord
 from app.schemas.tracking_schema import (
     CreateMigrationRecordSchema,
+    MigrationEventLocation,
+    MigrationFlowsResponse,
+    MigrationHeatmapResponse,
     MigrationRecordsGetResponse,
     MigrationRecordUpdateSchema,
 )
+from app.services.geocoder import fill_coordinates
+from app.services.migration_analytics import migration_flows
+from app.services.migration_events import events_in_box, sync_record_events
+from app.services.quota import quota_slot, release_quota
+from app.utils.db_helpers import iter_query_pages
+from app.utils.etag import (
+    bump_version,
+    etag_matches,
+    make_etag,
+    not_modified,
+    read_version,
+    records_version_key,
+)
+from app.utils.geo import haversine_km, radius_box
 
 router = APIRouter()
 
@@ -31,23 +64,25 @@ async def create_migration_record(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authorized to access this resource",
             )
-        user_docs = (
-            db.collection(MIGRATION_RECORDS)
-            .where("created_by", "==", record.created_by)
-            .stream()
-        )
-        user_records = [doc.to_dict() for doc in user_docs]
+        async with quota_slot(
+            db, record.created_by, MIGRATION_RECORDS, MAX_MIGRATION_RECORDS
+        ) as granted:
+            if not granted:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Limit reached! You can only add up to {MAX_MIGRATION_RECORDS} migration records.",
+                )
 
-        if len(user_records) >= MAX_MIGRATION_RECORDS:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Limit reached! You can only add up to {MAX_MIGRATION_RECORDS} migration records.",
-            )
-
-        record = MigrationRecord(**record.model_dump())
-        record_ref = db.collection(MIGRATION_RECORDS).document(record.id)
-        record_ref.set(record.to_dict())
-        return record
+            data = record.model_dump()
+            fill_coordinates(data["timeline"])
+            record = MigrationRecord(**data)
+            record_ref = db.collection(MIGRATION_RECORDS).document(record.id)
+            await record_ref.set(record.to_dict())
+            await sync_record_events(db, record.id, None, record.to_dict())
+            await bump_version(db, records_version_key(record.created_by))
+            return record
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -61,6 +96,7 @@ async def create_migration_record(
 )
 async def get_migration_records(
     request: Request,
+    response: Response,
     user_id: str,
     current_user=Depends(verify_firebase_token),
     db=Depends(get_db),
@@ -72,11 +108,18 @@ async def get_migration_records(
                 detail="Not authorized to access this resource",
             )
 
+        etag = make_etag(user_id, await read_version(db, records_version_key(user_id)))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers["ETag"] = etag
+
         records = (
             db.collection(MIGRATION_RECORDS).where("created_by", "==", user_id).stream()
         )
 
-        records = [MigrationRecordsGetResponse(**doc.to_dict()) for doc in records]
+        records = [
+            MigrationRecordsGetResponse(**doc.to_dict()) async for doc in records
+        ]
         sorted_records = sorted(records, key=lambda x: x.updated_at, reverse=True)
 
         return sorted_records
@@ -87,6 +130,188 @@ async def get_migration_records(
         )
 
 
+@router.get(
+    "/migration-events/bbox",
+    response_model=List[MigrationEventLocation],
+    status_code=status.HTTP_200_OK,
+)
+async def get_migration_events_in_box(
+    request: Request,
+    response: Response,
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lng: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lng: float = Query(
+        ..., ge=-180, le=180, description="Below min_lng to cross the antimeridian"
+    ),
+    year_from: Optional[int] = Query(None),
+    year_to: Optional[int] = Query(None),
+    limit: int = Query(GEO_EVENTS_LIMIT, ge=1, le=GEO_EVENTS_LIMIT),
+    current_user=Depends(verify_firebase_token),
+    db=Depends(get_db),
+) -> List[MigrationEventLocation]:
+    """
+    Get the user's timeline events inside a bounding box, ordered by year
+    - **X-Truncated**: Header set to true when not every event could be read
+    """
+    try:
+        if min_lat > max_lat:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="min_lat must not be above max_lat",
+            )
+
+        events, truncated = await events_in_box(
+            db,
+            current_user["uid"],
+            (min_lat, min_lng, max_lat, max_lng),
+            year_from,
+            year_to,
+        )
+        response.headers[TRUNCATED_HEADER] = str(truncated).lower()
+        events.sort(key=lambda event: (event["year"], event["id"]))
+        return [MigrationEventLocation(**event) for event in events[:limit]]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.get(
+    "/migration-events/radius",
+    response_model=List[MigrationEventLocation],
+    status_code=status.HTTP_200_OK,
+)
+async def get_migration_events_in_radius(
+    request: Request,
+    response: Response,
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(..., gt=0, le=MAX_GEO_RADIUS_KM),
+    year_from: Optional[int] = Query(None),
+    year_to: Optional[int] = Query(None),
+    limit: int = Query(GEO_EVENTS_LIMIT, ge=1, le=GEO_EVENTS_LIMIT),
+    current_user=Depends(verify_firebase_token),
+    db=Depends(get_db),
+) -> List[MigrationEventLocation]:
+    """
+    Get the user's timeline events within `radius_km` of a point, nearest first
+    - **X-Truncated**: Header set to true when not every event could be read
+    """
+    try:
+        events, truncated = await events_in_box(
+            db, current_user["uid"], radius_box(lat, lng, radius_km), year_from, year_to
+        )
+        response.headers[TRUNCATED_HEADER] = str(truncated).lower()
+        nearby = []
+        for event in events:
+            distance = haversine_km(lat, lng, event["latitude"], event["longitude"])
+            if distance <= radius_km:
+                nearby.append(MigrationEventLocation(**event, distance_km=distance))
+        nearby.sort(key=lambda event: event.distance_km)
+        return nearby[:limit]
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.get(
+    "/migration-analytics/flows",
+    response_model=MigrationFlowsResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_migration_flows(
+    request: Request,
+    resolution: float = Query(
+        FLOW_RESOLUTION,
+        ge=MIN_ANALYTICS_RESOLUTION,
+        le=90,
+        description="Region size in degrees",
+    ),
+    decade_from: Optional[int] = Query(None),
+    decade_to: Optional[int] = Query(None),
+    limit: int = Query(FLOWS_LIMIT, ge=1, le=MAX_FLOWS_LIMIT),
+    current_user=Depends(require_user),
+    db=Depends(get_db),
+) -> MigrationFlowsResponse:
+    """
+    Get the moves between regions over all migration records, by decade.
+    A move is two consecutive located events of one record. Flows of fewer
+    than ANALYTICS_MIN_COUNT moves are left out.
+    """
+    try:
+        flows = await migration_flows.load(db)
+        return MigrationFlowsResponse(
+            **flows.flows(
+                resolution, decade_from, decade_to, limit, ANALYTICS_MIN_COUNT
+            )
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.get(
+    "/migration-analytics/heatmap",
+    response_model=MigrationHeatmapResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_migration_heatmap(
+    request: Request,
+    resolution: float = Query(
+        HEATMAP_RESOLUTION,
+        ge=MIN_ANALYTICS_RESOLUTION,
+        le=90,
+        description="Cell size in degrees",
+    ),
+    decade_from: Optional[int] = Query(None),
+    decade_to: Optional[int] = Query(None),
+    current_user=Depends(require_user),
+    db=Depends(get_db),
+) -> MigrationHeatmapResponse:
+    """
+    Get the number of located events per grid cell over all migration
+    records, cells of fewer than ANALYTICS_MIN_COUNT events left out
+    """
+    try:
+        flows = await migration_flows.load(db)
+        return MigrationHeatmapResponse(
+            **flows.heatmap(resolution, decade_from, decade_to, ANALYTICS_MIN_COUNT)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.post(
+    "/migration-events/rebuild",
+    status_code=status.HTTP_200_OK,
+)
+async def rebuild_migration_events(
+    request: Request,
+    current_user=Depends(check_roles(["admin"])),
+    db=Depends(get_db),
+) -> dict:
+    """Re-index the timeline events of every migration record"""
+    try:
+        records = 0
+        pages = iter_query_pages(db.collection(MIGRATION_RECORDS), EXPORT_PAGE_SIZE)
+        async for page in pages:
+            for record in page:
+                await sync_record_events(db, record.id, None, record.to_dict())
+            records += len(page)
+        return {"records": records}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
 @router.get(
     "/migration-records/{record_id}",
     response_model=MigrationRecord,
@@ -94,13 +319,14 @@ async def get_migration_records(
 )
 async def get_migration_records(
     request: Request,
+    response: Response,
     record_id: str,
     current_user=Depends(verify_firebase_token),
     db=Depends(get_db),
 ):
     try:
         record_ref = db.collection(MIGRATION_RECORDS).document(record_id)
-        record = record_ref.get()
+        record = await record_ref.get()
 
         if not record.exists:
             raise HTTPException(
@@ -116,6 +342,11 @@ async def get_migration_records(
                 detail="Not authorized to access this resource",
             )
 
+        etag = make_etag(record_id, record.update_time)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers["ETag"] = etag
+
         return MigrationRecord(**record_data)
 
     except Exception as e:
@@ -144,7 +375,7 @@ async def update_migration_record(
             )
 
         record_ref = db.collection(MIGRATION_RECORDS).document(record_id)
-        record = record_ref.get()
+        record = await record_ref.get()
 
         if not record.exists:
             raise HTTPException(
@@ -153,12 +384,16 @@ async def update_migration_record(
             )
 
         update_data = record_update.model_dump(exclude_unset=True)
+        if update_data.get("timeline"):
+            fill_coordinates(update_data["timeline"], record.to_dict().get("timeline"))
         update_data["updated_by"] = record_update.updated_by
         update_data["updated_at"] = firestore.SERVER_TIMESTAMP
 
-        record_ref.update(update_data)
+        await record_ref.update(update_data)
 
-        updated_record = record_ref.get().to_dict()
+        updated_record = (await record_ref.get()).to_dict()
+        await sync_record_events(db, record_id, record.to_dict(), updated_record)
+        await bump_version(db, records_version_key(updated_record["created_by"]))
 
         return MigrationRecord.from_dict(updated_record)
     except Exception as e:
@@ -176,7 +411,7 @@ async def delete_migration_record(
 ) -> None:
     try:
         record_ref = db.collection(MIGRATION_RECORDS).document(record_id)
-        record = record_ref.get()
+        record = await record_ref.get()
 
         if not record.exists:
             raise HTTPException(
@@ -190,7 +425,10 @@ async def delete_migration_record(
                 detail="Not authorized to access this resource",
             )
 
-        record_ref.delete()
+        await record_ref.delete()
+        await sync_record_events(db, record_id, record_data, None)
+        await release_quota(db, record_data["created_by"], MIGRATION_RECORDS)
+        await bump_version(db, records_version_key(record_data["created_by"]))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
 from app.routes.v1 import cultural_context as cultural_context_router
+from app.routes.v1 import jobs as job_router
+from app.routes.v1 import migration_maps as migration_maps_router
 from app.routes.v1 import migration_tracking as migration_tracking_router
 from app.routes.v1 import trees as tree_router
 from app.routes.v1 import users as user_router
@@ -17,3 +19,8 @@ api_router.include_router(
     migration_tracking_router.router,
     tags=["migration-tracking"],
 )
+api_router.include_router(
+    migration_maps_router.router,
+    tags=["migration-maps"],
+)
+api_router.include_router(job_router.router, tags=["jobs"])
@@ -1,20 +1,49 @@
+import asyncio
+import json
 import logging
-from typing import Any, List, Optional
-
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+import shutil
+import tempfile
+from itertools import islice
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional, Tuple
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from firebase_admin import firestore
 
+from app.common.auth_helpers import get_accessible_tree
 from app.common.firebase import verify_firebase_token
+from app.core.config import settings
 from app.core.constants import (
+    EXPORT_PAGE_SIZE,
     FAMILY_STORY,
     FAMILY_TREE,
+    FIRESTORE_BATCH_LIMIT,
     MAX_FAMILY_MEMBER,
     MAX_FAMILY_STORIES,
     MAX_FAMILY_TREE,
+    MAX_MEMBERS_PAGE_SIZE,
+    MAX_NEIGHBORHOOD_GENERATIONS,
+    MAX_TIMELINE_PAGE_SIZE,
+    MEMBERS_PAGE_SIZE,
+    MIGRATION_EVENTS,
     PEOPLE,
+    TIMELINE_PAGE_SIZE,
 )
 from app.core.database import get_db
 from app.models.models import FamilyStory, FamilyTree, Person
+from app.schemas.job_schemas import JobAcceptedSchema
 from app.schemas.tree_schemas import (
     AddCollaboratorSchema,
     AddFamilyStorySchema,
@@ -23,25 +52,255 @@ from app.schemas.tree_schemas import (
     DeleteMemberSchema,
     FamilyStoriesSchema,
     FamilyTreesResponse,
+    MembersPageSchema,
+    NeighborhoodSchema,
+    RelationshipSchema,
+    RelationshipStepSchema,
     RelationToMemberSchema,
-    RelationType,
+    RelativeSchema,
+    TreeTimelineEventSchema,
+    TreeTimelinePageSchema,
+    TreeViewSchema,
     UpdatedFamilyStorySchema,
     UpdatePersonSchema,
     UpdateTreeSchema,
 )
+from app.services.cleanup import DELETE_TREE
+from app.services.family_graph import FamilyGraph, family_graphs
+from app.services.jobs import job_queue
+from app.services.quota import quota_slot, release_quota
+from app.services.relations import plan_new_member_relations
+from app.services.tree_view import (
+    apply_member_changes,
+    read_tree_members,
+    read_tree_version,
+    rebuild_tree_view,
+    stage_member_changes,
+    view_has_room,
+    view_ref,
+)
+from app.utils.cursor import encode_cursor, read_cursor
+from app.utils.db_helpers import get_documents, iter_query_pages
+from app.utils.etag import (
+    bump_version,
+    etag_matches,
+    make_etag,
+    not_modified,
+    stories_version_key,
+    version_of,
+    version_ref,
+)
+from app.utils.gedcom import (
+    GEDCOM_HEADER,
+    GEDCOM_TRAILER,
+    FamilyCollector,
+    FamilyLinks,
+    format_individual,
+    iter_people,
+    scan_families,
+)
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
 
-def fetch_members(members_data: List[str], db: Any):
-    members = []
-    for member_id in members_data:
-        member = db.collection(PEOPLE).document(member_id).get()
-        if member.exists:
-            members.append(Person.from_dict(member.to_dict()))
-    return members
+def tree_etag(tree: Any, version: int) -> Optional[str]:
+    """ETag of a tree payload, only available once the tree has a view"""
+    return make_etag(tree.id, tree.update_time, version) if version else None
+
+
+async def get_tree_graph(tree_id: str, current_user: dict, db: Any) -> FamilyGraph:
+    """Checks access to a tree and returns its cached relationship graph"""
+    await get_accessible_tree(tree_id, current_user, db)
+    return await family_graphs.get(tree_id, db)
+
+
+def graph_node(graph: FamilyGraph, person_id: str) -> int:
+    if person_id not in graph.index:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Family member not found",
+        )
+    return graph.node(person_id)
+
+
+async def load_neighborhood(
+    db: Any, focus: dict, up: int, down: int, include_spouses: bool
+) -> Tuple[List[dict], Dict[str, int]]:
+    """
+    Walks `up` generations of parents and `down` generations of children from
+    a member, reading one batch of documents per generation.
+
+    Returns the member documents found and their generation relative to
+    `focus`, negative for ancestors and positive for descendants. Spouses
+    share the generation of their partner.
+    """
+    tree_id = focus["tree_id"]
+    members = {focus["id"]: focus}
+    generations = {focus["id"]: 0}
+
+    async def walk(steps: int, direction: int, next_ids) -> None:
+        frontier = [focus]
+        for step in range(1, steps + 1):
+            ids = [
+                member_id
+                for member in frontier
+                for member_id in next_ids(member)
+                if member_id and member_id not in members
+            ]
+            if not ids:
+                return
+            frontier = [
+                member
+                for member in await get_documents(db, PEOPLE, ids)
+                if member.get("tree_id") == tree_id
+            ]
+            for member in frontier:
+                members.setdefault(member["id"], member)
+                generations.setdefault(member["id"], direction * step)
+
+    await asyncio.gather(
+        walk(up, -1, lambda m: (m.get("father_id"), m.get("mother_id"))),
+        walk(down, 1, lambda m: m.get("children_id") or []),
+    )
+
+    if include_spouses:
+        partners = {
+            spouse_id: generations[member["id"]]
+            for member in list(members.values())
+            for spouse_id in member.get("spouse_id") or []
+            if spouse_id not in members
+        }
+        for spouse in await get_documents(db, PEOPLE, list(partners)):
+            if spouse.get("tree_id") == tree_id:
+                members[spouse["id"]] = spouse
+                generations[spouse["id"]] = partners[spouse["id"]]
+
+    return list(members.values()), generations
+
+
+def spool_and_scan(upload: BinaryIO) -> tuple:
+    """Copies an upload to a private temp file and runs the GEDCOM first pass"""
+    spooled = tempfile.TemporaryFile()
+    try:
+        shutil.copyfileobj(upload, spooled)
+        spooled.seek(0)
+        links = scan_families(spooled)
+        spooled.seek(0)
+        return spooled, links
+    except Exception:
+        spooled.close()
+        raise
+
+
+async def stream_gedcom_import(
+    db: Any, tree_id: str, created_by: str, spooled: BinaryIO, links: FamilyLinks
+) -> AsyncIterator[str]:
+    """
+    Writes GEDCOM individuals in batches of up to FIRESTORE_BATCH_LIMIT
+    operations and yields NDJSON progress lines after every commit.
+    """
+    total = len(links.ids)
+    imported = 0
+    tree_ref = db.collection(FAMILY_TREE).document(tree_id)
+    people = iter_people(spooled, links, tree_id, created_by)
+    try:
+        yield json.dumps({"status": "importing", "imported": 0, "total": total}) + "\n"
+        while True:
+            # One slot of every batch is kept for the tree members update
+            chunk = await run_in_threadpool(
+                list, islice(people, FIRESTORE_BATCH_LIMIT - 1)
+            )
+            if not chunk:
+                break
+
+            batch = db.batch()
+            for person_data in chunk:
+                person = Person(**person_data)
+                batch.set(db.collection(PEOPLE).document(person.id), person.to_dict())
+            batch.update(
+                tree_ref,
+                {"members": firestore.ArrayUnion([p["id"] for p in chunk])},
+            )
+            await batch.commit()
+
+            imported += len(chunk)
+            yield json.dumps(
+                {"status": "importing", "imported": imported, "total": total}
+            ) + "\n"
+
+        yield json.dumps(
+            {"status": "completed", "imported": imported, "total": total}
+        ) + "\n"
+    except Exception as e:
+        logger.error(f"Unexpected error from importing GEDCOM: {str(e)}")
+        yield json.dumps(
+            {"status": "failed", "imported": imported, "total": total, "detail": str(e)}
+        ) + "\n"
+    finally:
+        family_graphs.invalidate(tree_id)
+        spooled.close()
+
+
+async def stream_tree_export(db: Any, tree_id: str, export_format: str):
+    """Streams a tree's members page by page as GEDCOM or NDJSON"""
+    people = db.collection(PEOPLE).where("tree_id", "==", tree_id)
+
+    if export_format == "ndjson":
+        async for page in iter_query_pages(people, EXPORT_PAGE_SIZE):
+            yield "".join(
+                json.dumps(jsonable_encoder(Person.from_dict(snapshot.to_dict())))
+                + "\n"
+                for snapshot in page
+            )
+        return
+
+    families = FamilyCollector()
+    yield GEDCOM_HEADER
+    async for page in iter_query_pages(people, EXPORT_PAGE_SIZE):
+        chunk = []
+        for snapshot in page:
+            person = snapshot.to_dict()
+            links = families.add(person)
+            chunk.append(format_individual(families.xref(person["id"]), person, links))
+        yield "".join(chunk)
+    for record in families.records():
+        yield record
+    yield GEDCOM_TRAILER
+
+
+# (year, record ID, position in the record's timeline)
+TimelineKey = Tuple[int, str, int]
+TIMELINE_FIELDS = list(TreeTimelineEventSchema.model_fields)
+
+
+def timeline_key(event: dict) -> TimelineKey:
+    return (event["year"], event["record_id"], event["index"])
+
+
+async def read_tree_timeline(
+    db: Any, tree_id: str, after: Optional[TimelineKey], limit: int
+) -> List[dict]:
+    """
+    The first `limit` events after `after` of all the tree's migration
+    records, read in timeline order from the events index
+    """
+    query = (
+        db.collection(MIGRATION_EVENTS)
+        .where("tree_id", "==", tree_id)
+        .select(TIMELINE_FIELDS)
+        .order_by("year")
+        .order_by("record_id")
+        .order_by("index")
+        .limit(limit)
+    )
+    if after is not None:
+        year, record_id, index = after
+        query = query.start_after(
+            {"year": year, "record_id": record_id, "index": index}
+        )
+    return [event.to_dict() async for event in query.stream()]
 
 
 @router.get(
@@ -68,7 +327,9 @@ async def get_user_trees(
         user_trees = (
             db.collection(FAMILY_TREE).where("created_by", "==", user_id).stream()
         )
-        trees.extend([FamilyTreesResponse(**tree.to_dict()) for tree in user_trees])
+        trees.extend(
+            [FamilyTreesResponse(**tree.to_dict()) async for tree in user_trees]
+        )
 
         if collaborator:
             collaborator_trees = (
@@ -77,7 +338,10 @@ async def get_user_trees(
                 .stream()
             )
             trees.extend(
-                [FamilyTreesResponse(**tree.to_dict()) for tree in collaborator_trees]
+                [
+                    FamilyTreesResponse(**tree.to_dict())
+                    async for tree in collaborator_trees
+                ]
             )
 
         return trees
@@ -94,13 +358,21 @@ async def get_user_trees(
 )
 async def get_family_tree(
     request: Request,
+    response: Response,
     tree_id: str,
     current_user=Depends(verify_firebase_token),
     db=Depends(get_db),
 ) -> FamilyTree:
-    """Get a family tree by ID"""
+    """
+    Get a family tree by ID
+
+    Conditional requests are answered from the tree and view versions alone,
+    returning 304 before any member is read when `If-None-Match` matches.
+    """
     try:
-        tree = db.collection(FAMILY_TREE).document(tree_id).get()
+        # Access is checked before the members are read, since reading them
+        # can rebuild the view
+        tree, version = await read_tree_version(db, tree_id)
         if not tree.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -116,9 +388,15 @@ async def get_family_tree(
                 detail="Not authorized to access this resource",
             )
 
-        # Fetch members details
-        tree_data["members"] = fetch_members(tree_data.get("members", []), db)
+        etag = tree_etag(tree, version)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        tree, members, version = await read_tree_members(db, tree_id)
+        tree_data, etag = tree.to_dict(), tree_etag(tree, version)
+        if etag:
+            response.headers["ETag"] = etag
 
+        tree_data["members"] = [Person.from_dict(member) for member in members]
         return FamilyTree.from_dict(tree_data)
     except Exception as e:
         raise HTTPException(
@@ -141,75 +419,77 @@ async def create_tree_with_members(
         )
 
     try:
-        user_docs = (
-            db.collection(FAMILY_TREE)
-            .where("created_by", "==", family_tree.created_by)
-            .stream()
-        )
-        user_trees = [doc.to_dict() for doc in user_docs]
-
-        if len(user_trees) >= MAX_FAMILY_TREE:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Limit reached! You can only add up to {MAX_FAMILY_TREE} family tree.",
-            )
-
-        tree = FamilyTree(
-            name=family_tree.name,
-            description=family_tree.description,
-            is_public=family_tree.is_public,
-            created_by=family_tree.created_by,
-        )
-        db.collection(FAMILY_TREE).document(tree.id).set(tree.to_dict())
+        async with quota_slot(
+            db, family_tree.created_by, FAMILY_TREE, MAX_FAMILY_TREE
+        ) as granted:
+            if not granted:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Limit reached! You can only add up to {MAX_FAMILY_TREE} family tree.",
+                )
 
-        def add_member(member_data: dict, tree_id: str) -> str:
-            """Helper function to add a member"""
-            member = Person(
-                **member_data,
-                tree_id=tree_id,
+            tree = FamilyTree(
+                name=family_tree.name,
+                description=family_tree.description,
+                is_public=family_tree.is_public,
                 created_by=family_tree.created_by,
             )
-            db.collection(PEOPLE).document(member.id).set(member.to_dict())
-            return member.id
-
-        # Add members
-        root_id = add_member(family_tree.root_member, tree.id)
-        father_id = (
-            add_member(family_tree.father, tree.id) if family_tree.father else None
-        )
-        mother_id = (
-            add_member(family_tree.mother, tree.id) if family_tree.mother else None
-        )
-
-        # Update root member with parent ids
-        root_ref = db.collection(PEOPLE).document(root_id)
-        root_ref.update({"father_id": father_id, "mother_id": mother_id})
-
-        # Update father and mother with root member as their child & spouse ids
-        if father_id:
-            father_ref = db.collection(PEOPLE).document(father_id)
-            father_ref.update(
-                {
-                    "children_id": firestore.ArrayUnion([root_id]),
-                    "spouse_id": firestore.ArrayUnion([mother_id]),
-                }
+            await db.collection(FAMILY_TREE).document(tree.id).set(tree.to_dict())
+
+            async def add_member(member_data: dict, tree_id: str) -> str:
+                """Helper function to add a member"""
+                member = Person(
+                    **member_data,
+                    tree_id=tree_id,
+                    created_by=family_tree.created_by,
+                )
+                await db.collection(PEOPLE).document(member.id).set(member.to_dict())
+                return member.id
+
+            # Add members
+            root_id = await add_member(family_tree.root_member, tree.id)
+            father_id = (
+                await add_member(family_tree.father, tree.id)
+                if family_tree.father
+                else None
             )
-        if mother_id:
-            mother_ref = db.collection(PEOPLE).document(mother_id)
-            mother_ref.update(
-                {
-                    "children_id": firestore.ArrayUnion([root_id]),
-                    "spouse_id": firestore.ArrayUnion([father_id]),
-                }
+            mother_id = (
+                await add_member(family_tree.mother, tree.id)
+                if family_tree.mother
+                else None
             )
 
-        # Update tree with members IDs
-        tree_ref = db.collection(FAMILY_TREE).document(tree.id)
-        tree_ref.update(
-            {"members": firestore.ArrayUnion([root_id, father_id, mother_id])}
-        )
+            # Update root member with parent ids
+            root_ref = db.collection(PEOPLE).document(root_id)
+            await root_ref.update({"father_id": father_id, "mother_id": mother_id})
+
+            # Update father and mother with root member as their child & spouse ids
+            if father_id:
+                father_ref = db.collection(PEOPLE).document(father_id)
+                await father_ref.update(
+                    {
+                        "children_id": firestore.ArrayUnion([root_id]),
+                        "spouse_id": firestore.ArrayUnion([mother_id]),
+                    }
+                )
+            if mother_id:
+                mother_ref = db.collection(PEOPLE).document(mother_id)
+                await mother_ref.update(
+                    {
+                        "children_id": firestore.ArrayUnion([root_id]),
+                        "spouse_id": firestore.ArrayUnion([father_id]),
+                    }
+                )
+
+            # Update tree with members IDs
+            tree_ref = db.collection(FAMILY_TREE).document(tree.id)
+            await tree_ref.update(
+                {"members": firestore.ArrayUnion([root_id, father_id, mother_id])}
+            )
 
-        return tree
+            return tree
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -231,7 +511,7 @@ async def add_collaborator(
     """Add collaborators to a family tree"""
     try:
         tree_ref = db.collection(FAMILY_TREE).document(tree_id)
-        tree = tree_ref.get()
+        tree = await tree_ref.get()
         if not tree.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -245,20 +525,16 @@ async def add_collaborator(
                 detail="Not authorized to access this resource",
             )
 
-        tree_ref.update(
+        await tree_ref.update(
             {
                 "collaborators": firestore.ArrayUnion(data.collaborators),
             }
         )
 
-        # Fetch updated document after update
-        updated_tree_snapshot = tree_ref.get()
+        # Fetch updated document and members after update
+        updated_tree_snapshot, members, _ = await read_tree_members(db, tree_id)
         updated_tree_data = updated_tree_snapshot.to_dict()
-
-        # Fetch updated members
-        updated_tree_data["members"] = fetch_members(
-            updated_tree_data.get("members", []), db
-        )
+        updated_tree_data["members"] = [Person.from_dict(m) for m in members]
 
         return FamilyTree.from_dict(updated_tree_data)
     except Exception as e:
@@ -287,151 +563,233 @@ async def add_member_tree(
     - **relation**: Relationship of new member to the primary user
     """
     try:
-        # Fetch the tree document
         tree_ref = db.collection(FAMILY_TREE).document(tree_id)
-        tree = tree_ref.get()
+        primary_user_ref = db.collection(PEOPLE).document(relation.primary_user_id)
+
+        # Create a new person entry
+        person = Person(
+            **member.model_dump(),
+            tree_id=tree_id,
+        )
+        # Prevent self-referencing
+        if relation.primary_user_id == person.id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="A person cannot be their own relative.",
+            )
+
+        @firestore.async_transactional
+        async def add_member_transaction(transaction):
+            """Reads affected documents in batches and commits all changes at once"""
+            view_root_ref = view_ref(db, tree_id)
+            snapshots = {
+                snapshot.reference.path: snapshot
+                async for snapshot in await transaction.get_all(
+                    [tree_ref, primary_user_ref, view_root_ref]
+                )
+            }
+            tree = snapshots[tree_ref.path]
+            if not tree.exists:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Family tree not found",
+                )
+
+            tree_data = tree.to_dict()
+            if current_user["uid"] != tree_data.get("created_by") and current_user[
+                "email"
+            ] not in tree_data.get("collaborators"):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Not authorized to access this resource",
+                )
+
+            if len(tree_data.get("members")) >= MAX_FAMILY_MEMBER:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Limit reached! You can only add up to {MAX_FAMILY_MEMBER} family members.",
+                )
+
+            primary_user = snapshots[primary_user_ref.path]
+            plan = plan_new_member_relations(
+                person.id,
+                member.gender,
+                member.children_id or [],
+                relation,
+                primary_user.to_dict() if primary_user.exists else None,
+            )
+
+            # Only relatives that exist are updated
+            relative_refs = [
+                db.collection(PEOPLE).document(member_id)
+                for member_id in plan.member_ids()
+                if member_id not in (person.id, relation.primary_user_id)
+            ]
+            existing = {}
+            if primary_user.exists:
+                existing[primary_user.id] = primary_user.to_dict()
+            if relative_refs:
+                existing.update(
+                    {
+                        snapshot.id: snapshot.to_dict()
+                        async for snapshot in await transaction.get_all(relative_refs)
+                        if snapshot.exists
+                    }
+                )
+
+            person_data = plan.apply(person.id, person.to_dict())
+            transaction.set(db.collection(PEOPLE).document(person.id), person_data)
+            updated_members = [person_data]
+            for member_id in plan.member_ids():
+                if member_id in existing and member_id != person.id:
+                    transaction.update(
+                        db.collection(PEOPLE).document(member_id),
+                        plan.update_for(member_id),
+                    )
+                    updated_members.append(plan.apply(member_id, existing[member_id]))
+            transaction.update(tree_ref, {"members": firestore.ArrayUnion([person.id])})
+
+            view_root = snapshots[view_root_ref.path]
+            member_count = len(tree_data.get("members")) + 1
+            # A full view is left behind, the read below rebuilds it with
+            # more shards
+            if (
+                view_root.exists
+                and settings.TREE_VIEWS_ENABLED
+                and view_has_room(view_root.get("shard_count"), member_count)
+            ):
+                stage_member_changes(
+                    transaction,
+                    db,
+                    tree_id,
+                    view_root.get("shard_count"),
+                    updated_members,
+                )
+
+        await add_member_transaction(db.transaction())
+
+        family_graphs.invalidate(tree_id)
+
+        # Fetch updated tree members
+        tree, members, _ = await read_tree_members(db, tree_id)
+        tree_data = tree.to_dict()
+        tree_data["members"] = [Person.from_dict(m) for m in members]
+        return FamilyTree.from_dict(tree_data)
+    except Exception as e:
+        logger.error(f"Unexpected error from adding a member: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.post(
+    "/trees/{tree_id}/import/gedcom",
+    status_code=status.HTTP_200_OK,
+)
+async def import_gedcom(
+    request: Request,
+    tree_id: str,
+    file: UploadFile = File(...),
+    current_user=Depends(verify_firebase_token),
+    db=Depends(get_db),
+) -> StreamingResponse:
+    """
+    Import members into a family tree from a GEDCOM file
+    - **file**: GEDCOM (.ged) upload; INDI records become members and FAM
+      records set their parent, spouse, child and sibling links
+    - Streams NDJSON progress lines: `{"status", "imported", "total"}`
+    """
+    try:
+        tree = await db.collection(FAMILY_TREE).document(tree_id).get()
         if not tree.exists:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Family tree not found"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Family tree not found",
             )
 
         tree_data = tree.to_dict()
         if current_user["uid"] != tree_data.get("created_by") and current_user[
             "email"
-        ] not in tree_data.get("collaborators"):
+        ] not in tree_data.get("collaborators", []):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authorized to access this resource",
             )
 
-        if len(tree_data.get("members")) >= MAX_FAMILY_MEMBER:
+        # The upload is closed once this handler returns, so the streamed
+        # second pass reads from a private copy
+        spooled, links = await run_in_threadpool(spool_and_scan, file.file)
+
+        if not links.has_header:
+            spooled.close()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Not a GEDCOM file",
+            )
+        if len(tree_data.get("members", [])) + len(links.ids) > MAX_FAMILY_MEMBER:
+            spooled.close()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Limit reached! You can only add up to {MAX_FAMILY_MEMBER} family members.",
             )
 
-        # Create a new person entry
-        person = Person(
-            **member.model_dump(),
-            tree_id=tree_id,
+        return StreamingResponse(
+            stream_gedcom_import(db, tree_id, current_user["uid"], spooled, links),
+            media_type="application/x-ndjson",
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
-        person_ref = db.collection(PEOPLE).document(person.id)
-        person_ref.set(person.to_dict())
-
-        # Update the tree to include the new member
-        tree_ref.update({"members": firestore.ArrayUnion([person_ref.id])})
-
-        def update_relation(relation_id, field, profile_id):
-            """Updates relationships bi-directionally in Firestore"""
-            if relation_id:
-                relation_ref = db.collection(PEOPLE).document(relation_id)
-                relation_doc = relation_ref.get()
-
-                if relation_doc.exists:
-                    relation_data = relation_doc.to_dict()
 
-                    if field in ["spouse_id", "children_id", "sibling_id"]:
-                        if profile_id not in relation_data.get(
-                            field, []
-                        ):  # Prevent duplicates
-                            relation_data[field] = relation_data.get(field, []) + [
-                                profile_id
-                            ]
-                    else:
-                        relation_data[field] = profile_id
-
-                    relation_ref.set(relation_data)
-
-        relation_mapping = {
-            RelationType.FATHER: ("father_id", "children_id"),
-            RelationType.MOTHER: ("mother_id", "children_id"),
-            RelationType.SPOUSE: ("spouse_id", "spouse_id"),
-            RelationType.SIBLING: (
-                "sibling_id",
-                "sibling_id",
-            ),  # No parent-child reverse needed
-            RelationType.CHILD: (
-                "children_id",
-                "father_id" if relation.primary_user_gender == "male" else "mother_id",
-            ),
-        }
 
-        if relation.rel in relation_mapping:
-            new_person_field, primary_user_field = relation_mapping[relation.rel]
-            # Prevent self-referencing
-            if relation.primary_user_id == person.id:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="A person cannot be their own relative.",
-                )
-            # Update primary user's relationship with the new member
-            update_relation(relation.primary_user_id, new_person_field, person.id)
-            # Update new member's relationship with the primary user
-            update_relation(person.id, primary_user_field, relation.primary_user_id)
-
-        # SIBLINGS - Assign parents
-        if relation.rel == RelationType.SIBLING:
-            primary_user_ref = db.collection(PEOPLE).document(relation.primary_user_id)
-            primary_user_doc = primary_user_ref.get()
-            if primary_user_doc.exists:
-                primary_user_data = primary_user_doc.to_dict()
-                father_id = primary_user_data.get("father_id")
-                mother_id = primary_user_data.get("mother_id")
-
-                # Assign same parents to the new sibling
-                update_relation(person.id, "father_id", father_id)
-                update_relation(person.id, "mother_id", mother_id)
-                if father_id:
-                    update_relation(father_id, "children_id", person.id)
-                if mother_id:
-                    update_relation(mother_id, "children_id", person.id)
-
-        # Update spouse children_id field
-        if relation.rel == RelationType.CHILD:
-            if relation.primary_spouse_id:
-                update_relation(relation.primary_spouse_id, "children_id", person.id)
-                update_relation(
-                    person.id,
-                    "father_id"
-                    if relation.primary_spouse_gender == "male"
-                    else "mother_id",
-                    relation.primary_spouse_id,
-                )
+@router.get(
+    "/trees/{tree_id}/export",
+    status_code=status.HTTP_200_OK,
+)
+async def export_tree(
+    request: Request,
+    tree_id: str,
+    format: str = Query("gedcom", pattern="^(gedcom|ndjson)$"),
+    current_user=Depends(verify_firebase_token),
+    db=Depends(get_db),
+) -> StreamingResponse:
+    """
+    Export a family tree's members
+    - **format**: `gedcom` (GEDCOM 5.5.1) or `ndjson` (one member per line)
+    """
+    try:
+        tree = await db.collection(FAMILY_TREE).document(tree_id).get()
+        if not tree.exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Family tree not found",
+            )
 
-            if relation.primary_children_id:
-                for child_id in relation.primary_children_id:
-                    if child_id != person.id:
-                        update_relation(child_id, "sibling_id", person.id)
-                        update_relation(person.id, "sibling_id", child_id)
-
-        # Handle case where there is parent_ids in primary user
-        if relation.rel in (RelationType.FATHER, RelationType.MOTHER):
-            primary_user_ref = db.collection(PEOPLE).document(relation.primary_user_id)
-            primary_user_doc = primary_user_ref.get()
-            if primary_user_doc.exists:
-                primary_user_data = primary_user_doc.to_dict()
-                # parent field to look for in primary_user_data
-                field_id = (
-                    "mother_id" if relation.rel == RelationType.FATHER else "father_id"
-                )
-                spouse_id = primary_user_data.get(field_id)
-                if spouse_id is not None:
-                    # update spouse fields
-                    update_relation(person.id, "spouse_id", spouse_id)
-                    update_relation(spouse_id, "spouse_id", person.id)
-
-        # Update parent field of children for when adding spouse
-        if relation.rel == RelationType.SPOUSE:
-            parent_gender = "father_id" if member.gender == "male" else "mother_id"
-            for child_id in member.children_id:
-                update_relation(child_id, parent_gender, person.id)
+        tree_data = tree.to_dict()
+        if current_user["uid"] != tree_data.get("created_by") and current_user[
+            "email"
+        ] not in tree_data.get("collaborators", []):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access this resource",
+            )
 
-        # Fetch updated tree members
-        tree_data = tree_ref.get().to_dict()
-        tree_data["members"] = fetch_members(tree_data.get("members", []), db)
-        return FamilyTree.from_dict(tree_data)
+        extension, media_type = (
+            ("ged", "text/vnd.familysearch.gedcom")
+            if format == "gedcom"
+            else ("ndjson", "application/x-ndjson")
+        )
+        return StreamingResponse(
+            stream_tree_export(db, tree_id, format),
+            media_type=media_type,
+            headers={
+                "Content-Disposition": f'attachment; filename="{tree_id}.{extension}"'
+            },
+        )
     except Exception as e:
-        logger.error(f"Unexpected error from adding a member: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
@@ -452,7 +810,7 @@ async def update_tree(
     """Update a family tree"""
     try:
         tree_ref = db.collection(FAMILY_TREE).document(tree_id)
-        tree = tree_ref.get()
+        tree = await tree_ref.get()
         if not tree.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -468,12 +826,12 @@ async def update_tree(
         updated_data = tree_data.model_dump(exclude_unset=True)
         updated_data["updated_by"] = tree_data.updated_by
         updated_data["updated_at"] = firestore.SERVER_TIMESTAMP
-        tree_ref.update(updated_data)
-
-        updated_tree = tree_ref.get().to_dict()
+        await tree_ref.update(updated_data)
 
         # Fetch updated tree members
-        updated_tree["members"] = fetch_members(updated_tree.get("members", []), db)
+        updated_tree_snapshot, members, _ = await read_tree_members(db, tree_id)
+        updated_tree = updated_tree_snapshot.to_dict()
+        updated_tree["members"] = [Person.from_dict(m) for m in members]
         return FamilyTree.from_dict(updated_tree)
     except Exception as e:
         raise HTTPException(
@@ -496,7 +854,7 @@ async def update_member(
     """Update a family member"""
     try:
         person_ref = db.collection(PEOPLE).document(person_id)
-        person = person_ref.get()
+        person = await person_ref.get()
         if not person.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -505,7 +863,7 @@ async def update_member(
         person_data = person.to_dict()
         tree_id = person_data.get("tree_id")
         tree_ref = db.collection(FAMILY_TREE).document(tree_id)
-        tree = tree_ref.get()
+        tree = await tree_ref.get()
         if not tree.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -524,26 +882,39 @@ async def update_member(
         updated_data = member.model_dump(exclude_unset=True)
         updated_data["updated_by"] = member.updated_by
         updated_data["updated_at"] = firestore.SERVER_TIMESTAMP
-        person_ref.update(updated_data)
+        await person_ref.update(updated_data)
+        family_graphs.invalidate(tree_id)
 
-        return Person.from_dict(person_ref.get().to_dict())
+        updated_person = (await person_ref.get()).to_dict()
+        await apply_member_changes(db, tree_id, [updated_person])
+        return Person.from_dict(updated_person)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
 
 
-@router.delete("/trees/{tree_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/trees/{tree_id}",
+    response_model=JobAcceptedSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 async def delete_tree(
     request: Request,
     tree_id: str,
     current_user=Depends(verify_firebase_token),
     db=Depends(get_db),
-) -> None:
-    """Delete a family tree"""
+) -> JobAcceptedSchema:
+    """
+    Delete a family tree
+
+    The tree is removed right away. Its members, stories and migration
+    records are deleted by a background job that can be polled at
+    `/jobs/{job_id}`.
+    """
     try:
         tree_ref = db.collection(FAMILY_TREE).document(tree_id)
-        tree = tree_ref.get()
+        tree = await tree_ref.get()
         if not tree.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -557,24 +928,15 @@ async def delete_tree(
                 detail="Not authorized to access this resource",
             )
 
-        # Batch delete all members of the tree
-        people_batch = db.batch()
-        people_query = db.collection(PEOPLE).where("tree_id", "==", tree_id).stream()
-        for person in people_query:
-            people_batch.delete(person.reference)
-        people_batch.commit()
+        await tree_ref.delete()
+        await release_quota(db, tree_data["created_by"], FAMILY_TREE)
+        await version_ref(db, stories_version_key(tree_id)).delete()
+        family_graphs.invalidate(tree_id)
 
-        # Delete stories
-        story_batch = db.batch()
-        story_query = (
-            db.collection(FAMILY_STORY).where("tree_id", "==", tree_id).stream()
+        job = await job_queue.enqueue(
+            db, DELETE_TREE, {"tree_id": tree_id}, current_user["uid"]
         )
-        for story in story_query:
-            story_batch.delete(story.reference)
-        story_batch.commit()
-
-        # Delete the tree
-        tree_ref.delete()
+        return JobAcceptedSchema(job_id=job.id, status=job.status)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -602,13 +964,13 @@ async def delete_tree_member(
         user_ref = db.collection(PEOPLE).document(item.delete_member_id)
 
         # Read necessary documents before starting the deletion
-        tree = tree_ref.get()
+        tree = await tree_ref.get()
         if not tree.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Family tree not found"
             )
 
-        user_doc = user_ref.get()
+        user_doc = await user_ref.get()
         if not user_doc.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -633,11 +995,14 @@ async def delete_tree_member(
                 detail="Cannot delete root user until all children are removed.",
             )
 
+        # Relatives as written, to update the tree view
+        updated_relatives = {}
+
         # Function to remove references from related users
-        def update_relation(relation_id, field):
+        async def update_relation(relation_id, field):
             if relation_id:
                 relation_ref = db.collection(PEOPLE).document(relation_id)
-                relation_doc = relation_ref.get()
+                relation_doc = await relation_ref.get()
 
                 if relation_doc.exists:
                     relation_data = relation_doc.to_dict()
@@ -650,17 +1015,18 @@ async def delete_tree_member(
                     else:
                         relation_data[field] = None
 
-                    relation_ref.set(relation_data)
+                    await relation_ref.set(relation_data)
+                    updated_relatives[relation_id] = relation_data
 
         # Update parents, siblings, spouses, and children
         if user_data.get("father_id"):
-            update_relation(user_data.get("father_id"), "children_id")
+            await update_relation(user_data.get("father_id"), "children_id")
         if user_data.get("mother_id"):
-            update_relation(user_data.get("mother_id"), "children_id")
+            await update_relation(user_data.get("mother_id"), "children_id")
 
         for child in user_data.get("children_id", []):
             child_ref = db.collection(PEOPLE).document(child)
-            child_doc = child_ref.get()
+            child_doc = await child_ref.get()
 
             if child_doc.exists:
                 child_data = child_doc.to_dict()
@@ -670,19 +1036,29 @@ async def delete_tree_member(
                 if child_data["mother_id"] == item.delete_member_id:
                     child_data["mother_id"] = None
 
-                child_ref.set(child_data)
+                await child_ref.set(child_data)
+                updated_relatives[child] = child_data
 
         for sibling in user_data.get("sibling_id", []):
-            update_relation(sibling, "sibling_id")
+            await update_relation(sibling, "sibling_id")
 
         for spouse in user_data.get("spouse_id", []):
-            update_relation(spouse, "spouse_id")
+            await update_relation(spouse, "spouse_id")
 
         # Remove user from family tree's member list
-        tree_ref.update({"members": firestore.ArrayRemove([item.delete_member_id])})
+        await tree_ref.update(
+            {"members": firestore.ArrayRemove([item.delete_member_id])}
+        )
 
         # Finally, delete the user document
-        user_ref.delete()
+        await user_ref.delete()
+        family_graphs.invalidate(tree_id)
+        await apply_member_changes(
+            db,
+            tree_id,
+            list(updated_relatives.values()),
+            removals=[item.delete_member_id],
+        )
         return None
     except Exception as e:
         logging.error(f"Unexpected error when deleting user: {str(e)}")
@@ -692,6 +1068,313 @@ async def delete_tree_member(
         )
 
 
+@router.get(
+    "/trees/{tree_id}/members",
+    response_model=MembersPageSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def get_tree_members(
+    request: Request,
+    tree_id: str,
+    limit: int = Query(
+        MEMBERS_PAGE_SIZE,
+        ge=1,
+        le=MAX_MEMBERS_PAGE_SIZE,
+        description="Number of members per page",
+    ),
+    cursor: Optional[str] = Query(
+        None, description="`next_cursor` of the previous page"
+    ),
+    current_user=Depends(verify_firebase_token),
+    db=Depends(get_db),
+) -> MembersPageSchema:
+    """
+    Get the members of a family tree one page at a time
+    - **next_cursor**: Pass as `cursor` to get the next page, null on the last page
+    """
+    try:
+        await get_accessible_tree(tree_id, current_user, db)
+
+        query = (
+            db.collection(PEOPLE)
+            .where("tree_id", "==", tree_id)
+            .order_by("__name__")
+            .limit(limit + 1)
+        )
+        if cursor:
+            query = query.start_after({"__name__": cursor})
+        page = [member async for member in query.stream()]
+
+        return MembersPageSchema(
+            members=[Person.from_dict(member.to_dict()) for member in page[:limit]],
+            next_cursor=page[limit - 1].id if len(page) > limit else None,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.get(
+    "/trees/{tree_id}/migration-timeline",
+    response_model=TreeTimelinePageSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def get_tree_migration_timeline(
+    request: Request,
+    tree_id: str,
+    year_from: Optional[int] = Query(None, description="Start at this year"),
+    limit: int = Query(
+        TIMELINE_PAGE_SIZE,
+        ge=1,
+        le=MAX_TIMELINE_PAGE_SIZE,
+        description="Number of events per page",
+    ),
+    cursor: Optional[str] = Query(
+        None, description="`next_cursor` of the previous page"
+    ),
+    current_user=Depends(verify_firebase_token),
+    db=Depends(get_db),
+) -> TreeTimelinePageSchema:
+    """
+    Get the events of every migration record of a family tree as one
+    chronological timeline, one page at a time
+    - **next_cursor**: Pass as `cursor` to get the next page, null on the last page
+    """
+    try:
+        await get_accessible_tree(tree_id, current_user, db)
+
+        after = None
+        if cursor:
+            position = read_cursor(cursor, year=int, record_id=str, index=int)
+            after = (position["year"], position["record_id"], position["index"])
+        elif year_from is not None:
+            # Sorts before every event of the year
+            after = (year_from, "", -1)
+
+        events = await read_tree_timeline(db, tree_id, after, limit + 1)
+        next_cursor = None
+        if len(events) > limit:
+            year, record_id, index = timeline_key(events[limit - 1])
+            next_cursor = encode_cursor(
+                {"year": year, "record_id": record_id, "index": index}
+            )
+        return TreeTimelinePageSchema(
+            events=[TreeTimelineEventSchema(**event) for event in events[:limit]],
+            next_cursor=next_cursor,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.get(
+    "/trees/{tree_id}/members/{person_id}/neighborhood",
+    response_model=NeighborhoodSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def get_member_neighborhood(
+    request: Request,
+    tree_id: str,
+    person_id: str,
+    up: int = Query(
+        2,
+        ge=0,
+        le=MAX_NEIGHBORHOOD_GENERATIONS,
+        description="Generations of ancestors",
+    ),
+    down: int = Query(
+        2,
+        ge=0,
+        le=MAX_NEIGHBORHOOD_GENERATIONS,
+        description="Generations of descendants",
+    ),
+    spouses: bool = Query(True, description="Include spouses of returned members"),
+    current_user=Depends(verify_firebase_token),
+    db=Depends(get_db),
+) -> NeighborhoodSchema:
+    """
+    Get the members within a number of generations of a family member
+    - **generations**: Generation of each member relative to `person_id`,
+      negative for ancestors and positive for descendants
+    """
+    try:
+        await get_accessible_tree(tree_id, current_user, db)
+
+        person = await db.collection(PEOPLE).document(person_id).get()
+        if not person.exists or person.get("tree_id") != tree_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Family member not found",
+            )
+
+        members, generations = await load_neighborhood(
+            db, person.to_dict(), up, down, spouses
+        )
+        return NeighborhoodSchema(
+            person_id=person_id,
+            members=[Person.from_dict(member) for member in members],
+            generations=generations,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.get(
+    "/trees/{tree_id}/members/{person_id}/ancestors",
+    response_model=List[RelativeSchema],
+    status_code=status.HTTP_200_OK,
+)
+async def get_member_ancestors(
+    request: Request,
+    tree_id: str,
+    person_id: str,
+    generations: Optional[int] = Query(None, ge=1, description="Generations up"),
+    current_user=Depends(verify_firebase_token),
+    db=Depends(get_db),
+) -> List[RelativeSchema]:
+    """Get the ancestors of a family member, nearest generation first"""
+    try:
+        graph = await get_tree_graph(tree_id, current_user, db)
+        node = graph_node(graph, person_id)
+        return [
+            RelativeSchema(
+                id=graph.ids[ancestor],
+                name=graph.names[ancestor],
+                gender=graph.genders[ancestor],
+                generation=generation,
+            )
+            for ancestor, generation in graph.ancestors(node, generations)
+        ]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.get(
+    "/trees/{tree_id}/members/{person_id}/descendants",
+    response_model=List[RelativeSchema],
+    status_code=status.HTTP_200_OK,
+)
+async def get_member_descendants(
+    request: Request,
+    tree_id: str,
+    person_id: str,
+    generations: Optional[int] = Query(None, ge=1, description="Generations down"),
+    current_user=Depends(verify_firebase_token),
+    db=Depends(get_db),
+) -> List[RelativeSchema]:
+    """Get the descendants of a family member, nearest generation first"""
+    try:
+        graph = await get_tree_graph(tree_id, current_user, db)
+        node = graph_node(graph, person_id)
+        return [
+            RelativeSchema(
+                id=graph.ids[descendant],
+                name=graph.names[descendant],
+                gender=graph.genders[descendant],
+                generation=generation,
+            )
+            for descendant, generation in graph.descendants(node, generations)
+        ]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.get(
+    "/trees/{tree_id}/relationship",
+    response_model=RelationshipSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def get_relationship(
+    request: Request,
+    tree_id: str,
+    from_id: str = Query(..., description="Member the relationship is seen from"),
+    to_id: str = Query(..., description="Member whose relationship is named"),
+    current_user=Depends(verify_firebase_token),
+    db=Depends(get_db),
+) -> RelationshipSchema:
+    """
+    Get how two family members are related
+    - **kinship**: What `to_id` is to `from_id`, e.g. "second cousin once removed"
+    - **path**: Shortest chain of family links from `from_id` to `to_id`
+    """
+    try:
+        graph = await get_tree_graph(tree_id, current_user, db)
+        source = graph_node(graph, from_id)
+        target = graph_node(graph, to_id)
+        path = graph.shortest_path(source, target) or []
+        return RelationshipSchema(
+            from_id=from_id,
+            to_id=to_id,
+            kinship=graph.kinship(source, target),
+            path=[
+                RelationshipStepSchema(
+                    id=graph.ids[node], name=graph.names[node], relation=relation
+                )
+                for node, relation in path
+            ],
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.post(
+    "/trees/{tree_id}/view/rebuild",
+    response_model=TreeViewSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def rebuild_view(
+    request: Request,
+    tree_id: str,
+    current_user=Depends(verify_firebase_token),
+    db=Depends(get_db),
+) -> TreeViewSchema:
+    """Rebuild the materialized view of a family tree from its members"""
+    try:
+        tree = await db.collection(FAMILY_TREE).document(tree_id).get()
+        if not tree.exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Family tree not found",
+            )
+
+        tree_data = tree.to_dict()
+        if current_user["uid"] != tree_data.get("created_by") and current_user[
+            "email"
+        ] not in tree_data.get("collaborators", []):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access this resource",
+            )
+
+        members = await get_documents(db, PEOPLE, tree_data.get("members", []))
+        version = await rebuild_tree_view(db, tree_id, members)
+        return TreeViewSchema(
+            tree_id=tree_id, version=version, member_count=len(members)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
 @router.get(
     "/stories/{tree_id}",
     response_model=List[FamilyStoriesSchema],
@@ -699,6 +1382,7 @@ async def delete_tree_member(
 )
 async def get_family_stories(
     request: Request,
+    response: Response,
     tree_id: str,
     current_user=Depends(verify_firebase_token),
     db=Depends(get_db),
@@ -706,7 +1390,12 @@ async def get_family_stories(
     """Get all family stories for a specific family tree"""
     try:
         tree_ref = db.collection(FAMILY_TREE).document(tree_id)
-        tree = tree_ref.get()
+        stories_version_ref = version_ref(db, stories_version_key(tree_id))
+        snapshots = {
+            snapshot.reference.path: snapshot
+            async for snapshot in db.get_all([tree_ref, stories_version_ref])
+        }
+        tree = snapshots[tree_ref.path]
         if not tree.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Family tree not found"
@@ -721,8 +1410,13 @@ async def get_family_stories(
                 detail="Not authorized to access this resource",
             )
 
+        etag = make_etag(tree_id, version_of(snapshots[stories_version_ref.path]))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers["ETag"] = etag
+
         stories = db.collection(FAMILY_STORY).where("tree_id", "==", tree_id).stream()
-        return [FamilyStory(**story.to_dict()) for story in stories]
+        return [FamilyStory(**story.to_dict()) async for story in stories]
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -742,7 +1436,7 @@ async def get_family_tree_by_id(
 ) -> FamilyStory:
     """Get a family story by ID"""
     try:
-        story = db.collection(FAMILY_STORY).document(story_id).get()
+        story = await db.collection(FAMILY_STORY).document(story_id).get()
         if not story.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -751,7 +1445,7 @@ async def get_family_tree_by_id(
         story_data = story.to_dict()
         tree_id = story_data.get("tree_id")
         tree_ref = db.collection(FAMILY_TREE).document(tree_id)
-        tree = tree_ref.get()
+        tree = await tree_ref.get()
         if not tree.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -786,7 +1480,7 @@ async def add_family_story(
     """Add a new family story to a family tree"""
     try:
         tree_ref = db.collection(FAMILY_TREE).document(story.tree_id)
-        tree = tree_ref.get()
+        tree = await tree_ref.get()
         if not tree.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -802,24 +1496,25 @@ async def add_family_story(
                 detail="Not authorized to access this resource",
             )
 
-        user_stories_docs = (
-            db.collection(FAMILY_STORY)
-            .where("created_by", "==", story.created_by)
-            .stream()
-        )
-        user_stories = [doc.to_dict() for doc in user_stories_docs]
+        async with quota_slot(
+            db, story.created_by, FAMILY_STORY, MAX_FAMILY_STORIES
+        ) as granted:
+            if not granted:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Limit reached! You can only add up to {MAX_FAMILY_STORIES} family stories.",
+                )
 
-        if len(user_stories) >= MAX_FAMILY_STORIES:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Limit reached! You can only add up to {MAX_FAMILY_STORIES} family stories.",
+            new_story = FamilyStory(
+                **story.model_dump(),
             )
-
-        new_story = FamilyStory(
-            **story.model_dump(),
-        )
-        db.collection(FAMILY_STORY).document(new_story.id).set(new_story.to_dict())
-        return new_story
+            await db.collection(FAMILY_STORY).document(new_story.id).set(
+                new_story.to_dict()
+            )
+            await bump_version(db, stories_version_key(story.tree_id))
+            return new_story
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -847,7 +1542,7 @@ async def update_family_story(
             )
 
         story_ref = db.collection(FAMILY_STORY).document(story_id)
-        story = story_ref.get()
+        story = await story_ref.get()
         if not story.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -857,9 +1552,10 @@ async def update_family_story(
         updated_story_data = updated_data.model_dump(exclude_unset=True)
         updated_story_data["updated_by"] = updated_data.updated_by
         updated_story_data["updated_at"] = firestore.SERVER_TIMESTAMP
-        story_ref.update(updated_story_data)
+        await story_ref.update(updated_story_data)
 
-        updated_story = story_ref.get().to_dict()
+        updated_story = (await story_ref.get()).to_dict()
+        await bump_version(db, stories_version_key(updated_story["tree_id"]))
         return FamilyStory.from_dict(updated_story)
     except Exception as e:
         raise HTTPException(
@@ -877,7 +1573,7 @@ async def delete_family_story(
     """Delete a family story"""
     try:
         story_ref = db.collection(FAMILY_STORY).document(story_id)
-        story = story_ref.get()
+        story = await story_ref.get()
         if not story.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -891,7 +1587,9 @@ async def delete_family_story(
                 detail="Not authorized to access this resource",
             )
 
-        story_ref.delete()
+        await story_ref.delete()
+        await release_quota(db, story_data["created_by"], FAMILY_STORY)
+        await bump_version(db, stories_version_key(story_data["tree_id"]))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -1,9 +1,10 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from app.models.models import CulturalContext
+from app.core.constants import MAX_BULK_MODERATION
+from app.models.models import ContextStatus, CulturalContext
 
 
 class CulturalContextResponse(BaseModel):
@@ -11,6 +12,7 @@ class CulturalContextResponse(BaseModel):
     total_items: Optional[int]
     total_pages: Optional[int]
     current_page: Optional[int]
+    next_cursor: Optional[str] = None
 
 
 class CulturalContextAdminResponse(BaseModel):
@@ -19,3 +21,53 @@ class CulturalContextAdminResponse(BaseModel):
     title: str
     updated_at: datetime
     created_at: datetime
+
+
+class ModerationQueueResponse(BaseModel):
+    items: List[CulturalContextAdminResponse] = []
+    counts: Dict[str, int]
+    next_cursor: Optional[str] = None
+
+
+class BulkModerationSchema(BaseModel):
+    context_ids: List[str] = Field(min_length=1, max_length=MAX_BULK_MODERATION)
+    status: ContextStatus
+    updated_by: str
+
+
+class BulkModerationResult(BaseModel):
+    id: str
+    result: str  # "updated", "unchanged", "not_found" or "failed"
+    detail: Optional[str] = None
+
+
+class BulkModerationResponse(BaseModel):
+    updated: int
+    results: List[BulkModerationResult]
+
+
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
+
+class TagFacetsResponse(BaseModel):
+    tags: List[TagCount] = []
+
+
+class CacheStatsSchema(BaseModel):
+    size: int
+    max_size: int
+    ttl: float
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    invalidations: int
+
+
+class SignedUrlStatsSchema(CacheStatsSchema):
+    window: int
+    grace: int
+    signed: int
+    batches: int
@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class JobAcceptedSchema(BaseModel):
+    job_id: str
+    status: str
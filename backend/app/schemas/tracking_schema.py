@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from pydantic import BaseModel
 
@@ -10,6 +10,8 @@ class MigrationEventSchema(BaseModel):
     location: Optional[str] = None
     latitude: Optional[float] = None
     longitude: Optional[float] = None
+    # Gazetteer place the coordinates were filled from, None when sent
+    geocoded: Optional[str] = None
 
 
 class CreateMigrationRecordSchema(BaseModel):
@@ -36,3 +38,40 @@ class MigrationRecordsGetResponse(BaseModel):
     created_by: str
     title: str
     updated_at: datetime
+
+
+class MigrationEventLocation(BaseModel):
+    record_id: str
+    title: Optional[str] = None
+    tree_id: Optional[str] = None
+    year: int
+    event: str
+    location: Optional[str] = None
+    latitude: float
+    longitude: float
+    distance_km: Optional[float] = None
+
+
+class MigrationFlowBin(BaseModel):
+    decade: int
+    origin: Tuple[float, float]
+    destination: Tuple[float, float]
+    count: int
+    mean_distance_km: float
+
+
+class MigrationFlowsResponse(BaseModel):
+    resolution: float
+    total_moves: int
+    flows: List[MigrationFlowBin] = []
+
+
+class HeatmapCell(BaseModel):
+    center: Tuple[float, float]
+    count: int
+
+
+class MigrationHeatmapResponse(BaseModel):
+    resolution: float
+    total_events: int
+    cells: List[HeatmapCell] = []
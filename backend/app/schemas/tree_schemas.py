@@ -1,9 +1,11 @@
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
+from app.models.models import Person
+
 
 class CreateFamilyTreeSchema(BaseModel):
     name: str
@@ -129,3 +131,56 @@ class FamilyTreesResponse(BaseModel):
     updated_at: datetime
     name: str
     created_by: str
+
+
+class RelativeSchema(BaseModel):
+    id: str
+    name: str
+    gender: Optional[str] = None
+    generation: int
+
+
+class RelationshipStepSchema(BaseModel):
+    id: str
+    name: str
+    relation: str
+
+
+class RelationshipSchema(BaseModel):
+    from_id: str
+    to_id: str
+    kinship: str
+    path: List[RelationshipStepSchema] = []
+
+
+class TreeViewSchema(BaseModel):
+    tree_id: str
+    version: int
+    member_count: int
+
+
+class MembersPageSchema(BaseModel):
+    members: List[Person] = []
+    next_cursor: Optional[str] = None
+
+
+class TreeTimelineEventSchema(BaseModel):
+    record_id: str
+    title: Optional[str] = None
+    index: int
+    year: int
+    event: str
+    location: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+class TreeTimelinePageSchema(BaseModel):
+    events: List[TreeTimelineEventSchema] = []
+    next_cursor: Optional[str] = None
+
+
+class NeighborhoodSchema(BaseModel):
+    person_id: str
+    members: List[Person] = []
+    generations: Dict[str, int] = {}
@@ -0,0 +1,107 @@
+"""
+Background cleanup jobs run by the job queue.
+
+Deletes are chunked into batched writes of up to FIRESTORE_BATCH_LIMIT and
+always re-query the first page, so a retried job carries on where the
+failed attempt stopped.
+"""
+
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.constants import (
+    FAMILY_STORY,
+    FIRESTORE_BATCH_LIMIT,
+    MIGRATION_EVENTS,
+    MIGRATION_RECORDS,
+    PEOPLE,
+)
+from app.services.jobs import job_queue
+from app.services.migration_analytics import migration_flows
+from app.services.migration_maps import migration_maps, tree_scope, user_scope
+from app.services.quota import release_quota
+from app.services.tree_view import delete_tree_view
+from app.utils.etag import bump_version, records_version_key
+from app.utils.storage import delete_urls
+
+DELETE_MEDIA = "delete_media"
+DELETE_TREE = "delete_tree"
+
+
+async def delete_where(
+    db: Any,
+    collection: str,
+    field: str,
+    value: Any,
+    on_batch: Optional[Callable[[Counter], Awaitable[None]]] = None,
+) -> int:
+    """
+    Deletes every document of `collection` where `field` equals `value` and
+    returns how many were deleted. `on_batch` is awaited after every commit
+    with the number of deleted documents per `created_by`.
+    """
+    query = (
+        db.collection(collection)
+        .where(field, "==", value)
+        .select(["created_by"])
+        .limit(FIRESTORE_BATCH_LIMIT)
+    )
+    deleted = 0
+    while True:
+        page = [snapshot async for snapshot in query.stream()]
+        if not page:
+            return deleted
+        batch = db.batch()
+        for snapshot in page:
+            batch.delete(snapshot.reference)
+        await batch.commit()
+        deleted += len(page)
+
+        if on_batch is not None:
+            owners = Counter((s.to_dict() or {}).get("created_by") for s in page)
+            owners.pop(None, None)
+            await on_batch(owners)
+
+
+@job_queue.handler(DELETE_MEDIA)
+async def delete_media_job(db: Any, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Deletes stored media files concurrently, payload: {"urls": [...]}"""
+    urls: List[str] = payload.get("urls") or []
+    await delete_urls(urls)
+    return {"deleted": len(urls)}
+
+
+@job_queue.handler(DELETE_TREE)
+async def delete_tree_job(db: Any, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Deletes what belongs to a deleted tree, payload: {"tree_id": ...}.
+    Members, stories and migration records linked to the tree are removed
+    and the quota of their owners is given back.
+    """
+    tree_id = payload["tree_id"]
+
+    async def release_stories(owners: Counter) -> None:
+        for user_id, count in owners.items():
+            await release_quota(db, user_id, FAMILY_STORY, count)
+
+    record_owners = set()
+
+    async def release_records(owners: Counter) -> None:
+        record_owners.update(owners)
+        for user_id, count in owners.items():
+            await release_quota(db, user_id, MIGRATION_RECORDS, count)
+            await bump_version(db, records_version_key(user_id))
+
+    people = await delete_where(db, PEOPLE, "tree_id", tree_id)
+    stories = await delete_where(db, FAMILY_STORY, "tree_id", tree_id, release_stories)
+    records = await delete_where(
+        db, MIGRATION_RECORDS, "tree_id", tree_id, release_records
+    )
+    await delete_where(db, MIGRATION_EVENTS, "tree_id", tree_id)
+    migration_flows.expire()
+    migration_maps.invalidate(
+        [tree_scope(tree_id), *(user_scope(user_id) for user_id in record_owners)]
+    )
+    await delete_tree_view(db, tree_id)
+
+    return {"people": people, "stories": stories, "migration_records": records}
@@ -0,0 +1,484 @@
+import asyncio
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.constants import FAMILY_GRAPH_CACHE_SIZE, FAMILY_GRAPH_TTL, PEOPLE
+
+NO_NODE = -1
+
+# Edge labels used in relationship paths, read as "next person is the ..."
+PARENT = "parent"
+CHILD = "child"
+SPOUSE = "spouse"
+SIBLING = "sibling"
+
+_ORDINALS = ["first", "second", "third", "fourth", "fifth", "sixth", "seventh"]
+_REMOVED = {1: "once", 2: "twice", 3: "thrice"}
+
+
+def _csr(lists: List[List[int]]) -> Tuple[array, array]:
+    """Packs per-node neighbour lists into offset/target arrays."""
+    offsets = array("i", [0])
+    targets = array("i")
+    for neighbours in lists:
+        targets.extend(sorted(set(neighbours)))
+        offsets.append(len(targets))
+    return offsets, targets
+
+
+def _gendered(gender: Optional[str], male: str, female: str, neutral: str) -> str:
+    if gender == "male":
+        return male
+    if gender == "female":
+        return female
+    return neutral
+
+
+def _greats(count: int) -> str:
+    if count <= 0:
+        return ""
+    if count <= 2:
+        return "great-" * count
+    return f"{count}x great-"
+
+
+def _ordinal(number: int) -> str:
+    if number <= len(_ORDINALS):
+        return _ORDINALS[number - 1]
+    return f"{number}th"
+
+
+# Relatives by marriage by (up, down) generation distance, as male, female
+# and neutral names
+_SPOUSE_RELATIVES = {
+    (1, 0): ("father-in-law", "mother-in-law", "parent-in-law"),
+    (1, 1): ("brother-in-law", "sister-in-law", "sibling-in-law"),
+    (0, 1): ("stepson", "stepdaughter", "stepchild"),
+}
+_RELATIVE_SPOUSES = {
+    (0, 1): ("son-in-law", "daughter-in-law", "child-in-law"),
+    (1, 1): ("brother-in-law", "sister-in-law", "sibling-in-law"),
+    (1, 0): ("stepfather", "stepmother", "step-parent"),
+}
+
+
+def _direct_line(gender: Optional[str], up: int, down: int) -> str:
+    """Names an ancestor (down == 0) or a descendant (up == 0)."""
+    if down == 0:
+        if up == 1:
+            return _gendered(gender, "father", "mother", "parent")
+        base = _gendered(gender, "grandfather", "grandmother", "grandparent")
+        return _greats(up - 2) + base
+    if down == 1:
+        return _gendered(gender, "son", "daughter", "child")
+    base = _gendered(gender, "grandson", "granddaughter", "grandchild")
+    return _greats(down - 2) + base
+
+
+def _collateral(gender: Optional[str], up: int, down: int) -> str:
+    """Names a relative through a common ancestor other than a sibling."""
+    if up == 1:
+        base = _gendered(gender, "nephew", "niece", "nibling")
+        if down == 2:
+            return base
+        return _greats(down - 3) + "grand" + base
+    if down == 1:
+        base = _gendered(gender, "uncle", "aunt", "pibling")
+        if up == 2:
+            return base
+        return _greats(up - 2) + base
+
+    degree = min(up, down) - 1
+    removed = abs(up - down)
+    name = f"{_ordinal(degree)} cousin"
+    if removed:
+        name += f" {_REMOVED.get(removed, f'{removed} times')} removed"
+    return name
+
+
+def _join_path(
+    forward: Dict[int, Tuple[int, str]],
+    backward: Dict[int, Tuple[int, str]],
+    meeting: int,
+) -> List[Tuple[int, str]]:
+    """Joins the two halves of a bidirectional search at their meeting node."""
+    path = []
+    node = meeting
+    while node != NO_NODE:
+        previous, relation = forward[node]
+        path.append((node, relation))
+        node = previous
+    path.reverse()
+
+    # Links found from the target side point the other way round
+    inverse = {PARENT: CHILD, CHILD: PARENT, SPOUSE: SPOUSE, SIBLING: SIBLING}
+    node = meeting
+    while True:
+        previous, relation = backward[node]
+        if previous == NO_NODE:
+            return path
+        path.append((previous, inverse[relation]))
+        node = previous
+
+
+class FamilyGraph:
+    """
+    Compact in-memory relationship graph of a single family tree.
+
+    Members are mapped to integer node IDs. Parents are kept in two fixed
+    arrays and children, spouses and siblings in CSR (offset/target) arrays,
+    so traversals never touch Firestore.
+    """
+
+    def __init__(self, members: Iterable[dict]):
+        members = list(members)
+        self.ids: List[str] = [member["id"] for member in members]
+        self.index: Dict[str, int] = {pid: node for node, pid in enumerate(self.ids)}
+        self.names: List[str] = [
+            " ".join(part for part in (m.get("first_name"), m.get("last_name")) if part)
+            for m in members
+        ]
+        self.genders: List[Optional[str]] = [m.get("gender") for m in members]
+
+        size = len(members)
+        self.father = array("i", [NO_NODE]) * size
+        self.mother = array("i", [NO_NODE]) * size
+        children: List[List[int]] = [[] for _ in range(size)]
+        spouses: List[List[int]] = [[] for _ in range(size)]
+        siblings: List[List[int]] = [[] for _ in range(size)]
+
+        for node, member in enumerate(members):
+            self._link(node, member, children, spouses, siblings)
+
+        # Children listed only on the parent's side still get a parent slot
+        for parent, kids in enumerate(children):
+            for child in kids:
+                if parent not in (self.father[child], self.mother[child]):
+                    self._assign_parent(child, parent)
+
+        # Children sharing a parent are siblings even if not linked directly
+        for kids in children:
+            unique = set(kids)
+            for child in unique:
+                siblings[child].extend(other for other in unique if other != child)
+
+        self.child_offsets, self.child_targets = _csr(children)
+        self.spouse_offsets, self.spouse_targets = _csr(spouses)
+        self.sibling_offsets, self.sibling_targets = _csr(siblings)
+
+    def _others(self, node: int, person_ids: Optional[List[str]]) -> List[int]:
+        """Nodes of linked members, leaving out unknown IDs and `node` itself."""
+        nodes = (self.index.get(person_id, NO_NODE) for person_id in person_ids or [])
+        return [other for other in nodes if other not in (NO_NODE, node)]
+
+    def _link(
+        self,
+        node: int,
+        member: dict,
+        children: List[List[int]],
+        spouses: List[List[int]],
+        siblings: List[List[int]],
+    ) -> None:
+        """Records a member's parents and its links to other members."""
+        self.father[node] = self.index.get(member.get("father_id") or "", NO_NODE)
+        self.mother[node] = self.index.get(member.get("mother_id") or "", NO_NODE)
+        for parent in self.parents(node):
+            children[parent].append(node)
+        children[node].extend(self._others(node, member.get("children_id")))
+        for spouse in self._others(node, member.get("spouse_id")):
+            spouses[node].append(spouse)
+            spouses[spouse].append(node)
+        for sibling in self._others(node, member.get("sibling_id")):
+            siblings[node].append(sibling)
+            siblings[sibling].append(node)
+
+    def _assign_parent(self, child: int, parent: int) -> None:
+        """Puts a parent in a free father or mother slot of a child."""
+        if self.genders[parent] == "male" and self.father[child] == NO_NODE:
+            self.father[child] = parent
+        elif self.mother[child] == NO_NODE:
+            self.mother[child] = parent
+        elif self.father[child] == NO_NODE:
+            self.father[child] = parent
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def node(self, person_id: str) -> int:
+        """Returns the node ID of a member, raising KeyError if unknown."""
+        return self.index[person_id]
+
+    def parents(self, node: int) -> List[int]:
+        return [p for p in (self.father[node], self.mother[node]) if p != NO_NODE]
+
+    def children(self, node: int) -> array:
+        return self.child_targets[
+            self.child_offsets[node] : self.child_offsets[node + 1]
+        ]
+
+    def spouses(self, node: int) -> array:
+        return self.spouse_targets[
+            self.spouse_offsets[node] : self.spouse_offsets[node + 1]
+        ]
+
+    def siblings(self, node: int) -> array:
+        return self.sibling_targets[
+            self.sibling_offsets[node] : self.sibling_offsets[node + 1]
+        ]
+
+    def neighbours(self, node: int) -> Iterable[Tuple[int, str]]:
+        for parent in self.parents(node):
+            yield parent, PARENT
+        for child in self.children(node):
+            yield child, CHILD
+        for spouse in self.spouses(node):
+            yield spouse, SPOUSE
+        for sibling in self.siblings(node):
+            yield sibling, SIBLING
+
+    def ancestors(
+        self, node: int, max_generations: Optional[int] = None
+    ) -> List[Tuple[int, int]]:
+        """Returns (node, generation) pairs for all ancestors, nearest first."""
+        return self._walk(node, self.parents, max_generations)
+
+    def descendants(
+        self, node: int, max_generations: Optional[int] = None
+    ) -> List[Tuple[int, int]]:
+        """Returns (node, generation) pairs for all descendants, nearest first."""
+        return self._walk(node, self.children, max_generations)
+
+    def _walk(self, start: int, step, max_generations: Optional[int]):
+        seen = {start}
+        frontier = [start]
+        result = []
+        generation = 0
+        while frontier and (max_generations is None or generation < max_generations):
+            generation += 1
+            next_frontier = []
+            for node in frontier:
+                for other in step(node):
+                    if other not in seen:
+                        seen.add(other)
+                        next_frontier.append(other)
+                        result.append((other, generation))
+            frontier = next_frontier
+        return result
+
+    def shortest_path(
+        self, source: int, target: int
+    ) -> Optional[List[Tuple[int, str]]]:
+        """
+        Finds the shortest chain of parent/child/spouse/sibling links between
+        two members with a bidirectional BFS.
+
+        Returns a list of (node, relation) steps starting with (source, "self"),
+        where each relation describes the node relative to the previous step,
+        or None when the members are not connected.
+        """
+        if source == target:
+            return [(source, "self")]
+
+        forward: Dict[int, Tuple[int, str]] = {source: (NO_NODE, "self")}
+        backward: Dict[int, Tuple[int, str]] = {target: (NO_NODE, "self")}
+        forward_frontier, backward_frontier = [source], [target]
+        meeting = NO_NODE
+
+        while forward_frontier and backward_frontier and meeting == NO_NODE:
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier, meeting = self._expand(
+                    forward_frontier, forward, backward
+                )
+            else:
+                backward_frontier, meeting = self._expand(
+                    backward_frontier, backward, forward
+                )
+
+        if meeting == NO_NODE:
+            return None
+        return _join_path(forward, backward, meeting)
+
+    def _expand(
+        self,
+        frontier: List[int],
+        visited: Dict[int, Tuple[int, str]],
+        other_side: Dict[int, Tuple[int, str]],
+    ) -> Tuple[List[int], int]:
+        """
+        Visits the neighbours of one side's frontier. Returns the next
+        frontier and the node where the sides meet, NO_NODE if they do not.
+        """
+        next_frontier = []
+        for node in frontier:
+            for other, relation in self.neighbours(node):
+                if other in visited:
+                    continue
+                visited[other] = (node, relation)
+                next_frontier.append(other)
+                if other in other_side:
+                    return next_frontier, other
+        return next_frontier, NO_NODE
+
+    def kinship(self, source: int, target: int) -> str:
+        """Names what `target` is to `source`, e.g. "second cousin once removed"."""
+        if source == target:
+            return "self"
+
+        blood = self._blood_relation(source, target)
+        if blood:
+            return blood
+
+        gender = self.genders[target]
+        if target in self.spouses(source):
+            return _gendered(gender, "husband", "wife", "spouse")
+
+        by_marriage = self._relation_by_marriage(source, target)
+        if by_marriage:
+            return by_marriage
+
+        if target in self.siblings(source):
+            return _gendered(gender, "brother", "sister", "sibling")
+        return "not related"
+
+    def _relation_by_marriage(self, source: int, target: int) -> Optional[str]:
+        """Names relatives of a spouse and spouses of blood relatives."""
+        gender = self.genders[target]
+        for spouse in self.spouses(source):
+            relation = self._blood_relation(spouse, target, distance_only=True)
+            if relation in _SPOUSE_RELATIVES:
+                return _gendered(gender, *_SPOUSE_RELATIVES[relation])
+            if relation:
+                return f"spouse's {self._blood_relation(spouse, target)}"
+
+        for spouse in self.spouses(target):
+            relation = self._blood_relation(source, spouse, distance_only=True)
+            if relation in _RELATIVE_SPOUSES:
+                return _gendered(gender, *_RELATIVE_SPOUSES[relation])
+            if relation:
+                return f"{self._blood_relation(source, spouse)}'s spouse"
+        return None
+
+    def _closest_common_ancestor(
+        self, source: int, target: int
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Climbs both ancestries one generation at a time, always expanding the
+        shallower side, and stops once no unexplored ancestor can be closer
+        than the best common ancestor found so far.
+        """
+        depths = ({source: 0}, {target: 0})
+        frontiers = ([source], [target])
+        generations = [0, 0]
+        best: Optional[Tuple[int, int]] = (0, 0) if source == target else None
+
+        while frontiers[0] or frontiers[1]:
+            bound = min(generations[side] for side in (0, 1) if frontiers[side])
+            if best is not None and sum(best) <= bound + 1:
+                break
+            side = (
+                0
+                if frontiers[0]
+                and (not frontiers[1] or generations[0] <= generations[1])
+                else 1
+            )
+            other = 1 - side
+            generations[side] += 1
+            next_frontier = []
+            for node in frontiers[side]:
+                for parent in self.parents(node):
+                    if parent in depths[side]:
+                        continue
+                    depths[side][parent] = generations[side]
+                    next_frontier.append(parent)
+                    if parent in depths[other]:
+                        pair = [0, 0]
+                        pair[side] = generations[side]
+                        pair[other] = depths[other][parent]
+                        if best is None or sum(pair) < sum(best):
+                            best = (pair[0], pair[1])
+            frontiers[side].clear()
+            frontiers[side].extend(next_frontier)
+        return best
+
+    def _blood_relation(self, source: int, target: int, distance_only: bool = False):
+        """
+        Finds the closest common ancestor and names the relationship from the
+        generation distances (up from source, up from target).
+        """
+        best = self._closest_common_ancestor(source, target)
+        if best is None and target in self.siblings(source):
+            best = (1, 1)
+        if best is None or distance_only:
+            return best
+
+        up, down = best
+        gender = self.genders[target]
+        if up == 0 or down == 0:
+            return _direct_line(gender, up, down)
+        if up == 1 and down == 1:
+            shared = set(self.parents(source)) & set(self.parents(target))
+            half = (
+                len(shared) == 1
+                and len(self.parents(source)) == 2
+                and len(self.parents(target)) == 2
+            )
+            sibling = _gendered(gender, "brother", "sister", "sibling")
+            return f"half-{sibling}" if half else sibling
+        return _collateral(gender, up, down)
+
+
+class FamilyGraphCache:
+    """
+    Per-process cache of family graphs keyed by tree ID.
+
+    Graphs are built from a single PEOPLE query, kept for `ttl` seconds and
+    evicted least-recently-used beyond `max_size` trees. Member writes call
+    `invalidate` so the next read rebuilds the graph.
+    """
+
+    def __init__(
+        self, max_size: int = FAMILY_GRAPH_CACHE_SIZE, ttl: int = FAMILY_GRAPH_TTL
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._graphs: "OrderedDict[str, Tuple[float, FamilyGraph]]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get(self, tree_id: str, db: Any) -> FamilyGraph:
+        cached = self._lookup(tree_id)
+        if cached is not None:
+            return cached
+
+        lock = self._locks.setdefault(tree_id, asyncio.Lock())
+        async with lock:
+            cached = self._lookup(tree_id)
+            if cached is not None:
+                return cached
+
+            members = db.collection(PEOPLE).where("tree_id", "==", tree_id).stream()
+            graph = FamilyGraph([member.to_dict() async for member in members])
+            self._graphs[tree_id] = (time.monotonic(), graph)
+            self._graphs.move_to_end(tree_id)
+            while len(self._graphs) > self.max_size:
+                evicted, _ = self._graphs.popitem(last=False)
+                self._locks.pop(evicted, None)
+            return graph
+
+    def _lookup(self, tree_id: str) -> Optional[FamilyGraph]:
+        entry = self._graphs.get(tree_id)
+        if entry is None:
+            return None
+        loaded_at, graph = entry
+        if time.monotonic() - loaded_at > self.ttl:
+            del self._graphs[tree_id]
+            return None
+        self._graphs.move_to_end(tree_id)
+        return graph
+
+    def invalidate(self, tree_id: str) -> None:
+        self._graphs.pop(tree_id, None)
+
+
+family_graphs = FamilyGraphCache()
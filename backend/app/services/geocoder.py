@@ -0,0 +1,219 @@
+"""
+Offline geocoding of migration event locations.
+
+Place names come from a gazetteer bundled with the app, a tab separated
+file of places with their alternate names, country, coordinates and
+population. Names are normalized and indexed three ways: a dict for exact
+names, a sorted list searched with bisect for prefixes and trigram
+postings for misspellings. A location such as "Kingston, Jamaica" is
+resolved from its first part, limited to places in the countries named
+by the rest, then taking the most populous place. A location qualified
+by areas the gazetteer does not know, such as "Paris, Texas", is left
+unresolved rather than guessed. Results are memoized, so repeated
+locations cost a dict lookup.
+"""
+
+import bisect
+import csv
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from app.core.config import settings
+from app.core.constants import (
+    GEOCODE_CACHE_SIZE,
+    GEOCODE_MAX_CANDIDATES,
+    GEOCODE_MIN_LENGTH,
+    GEOCODE_MIN_SIMILARITY,
+)
+
+GAZETTEER_PATH = Path(__file__).resolve().parent.parent / "data" / "gazetteer.tsv"
+
+# Features whose names qualify a location, as in "Lagos, Nigeria"
+AREA_FEATURES = ("country", "region")
+
+
+class Place(NamedTuple):
+    name: str
+    country: str
+    feature: str
+    latitude: float
+    longitude: float
+    population: int
+
+
+def normalize(text: str) -> str:
+    """Lowercase ASCII words, accents and punctuation removed"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = "".join(c if c.isalnum() else " " for c in text)
+    return " ".join(text.split())
+
+
+def trigrams(name: str) -> Set[str]:
+    padded = f"  {name} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class Gazetteer:
+    def __init__(self, places: List[Place], alternates: List[List[str]]):
+        self.places = places
+        ids: Dict[str, List[int]] = {}
+        self.areas: Dict[str, Set[str]] = {}
+        for place_id, place in enumerate(places):
+            for name in {normalize(n) for n in [place.name, *alternates[place_id]]}:
+                if not name:
+                    continue
+                ids.setdefault(name, []).append(place_id)
+                if place.feature in AREA_FEATURES:
+                    self.areas.setdefault(name, set()).add(place.country)
+
+        # Parallel lists, names sorted for prefix search
+        self.names = sorted(ids)
+        self.name_places = [ids[name] for name in self.names]
+        self.exact = {name: i for i, name in enumerate(self.names)}
+        self.gram_counts: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+        for i, name in enumerate(self.names):
+            grams = trigrams(name)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "Gazetteer":
+        places, alternates = [], []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f, delimiter="\t"):
+                places.append(
+                    Place(
+                        name=row["name"],
+                        country=row["country"],
+                        feature=row["feature"],
+                        latitude=float(row["latitude"]),
+                        longitude=float(row["longitude"]),
+                        population=int(row["population"] or 0),
+                    )
+                )
+                alternates.append(
+                    [n for n in (row["alternate_names"] or "").split(";") if n]
+                )
+        return cls(places, alternates)
+
+    def _prefixed(self, name: str) -> List[int]:
+        """The one place name starting with `name`, none if it is ambiguous"""
+        start = bisect.bisect_left(self.names, name)
+        end = bisect.bisect_left(self.names, name + "\uffff", start)
+        # Areas are left out, so "Port" does not mean Portugal
+        matches = [
+            i
+            for i in range(start, min(end, start + GEOCODE_MAX_CANDIDATES))
+            if self.names[i] not in self.areas
+        ]
+        return matches if len(matches) == 1 else []
+
+    def _similar(self, name: str) -> List[int]:
+        """Names sharing the most trigrams, if similar enough"""
+        grams = trigrams(name)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        if not shared:
+            return []
+
+        def similarity(i: int) -> float:
+            return 2 * shared[i] / (len(grams) + self.gram_counts[i])
+
+        scores = {
+            i: similarity(i) for i, _ in shared.most_common(GEOCODE_MAX_CANDIDATES)
+        }
+        best = max(scores.values())
+        if best < GEOCODE_MIN_SIMILARITY:
+            return []
+        return [i for i, score in scores.items() if score == best]
+
+    def candidates(self, name: str) -> List[Place]:
+        """Places named `name`, else named by a prefix of it, else like it"""
+        if name in self.exact:
+            matches = [self.exact[name]]
+        elif len(name) < GEOCODE_MIN_LENGTH:
+            return []
+        else:
+            matches = self._prefixed(name) or self._similar(name)
+        return [self.places[p] for i in matches for p in self.name_places[i]]
+
+    def lookup(self, location: str) -> Optional[Place]:
+        """
+        The place a location names, or None when it is unknown, when the
+        parts after a name are not known areas or when no place of that
+        name lies in them
+        """
+        whole = normalize(location)
+        if whole in self.exact:
+            return self._largest(self.candidates(whole))
+        parts = [part for part in map(normalize, location.split(",")) if part]
+        # Try the most specific part first, falling back to the areas
+        for i, part in enumerate(parts):
+            qualifiers = parts[i + 1 :]
+            countries = {c for area in qualifiers for c in self.areas.get(area, ())}
+            if qualifiers and not countries:
+                return None
+            places = self.candidates(part)
+            if places and countries:
+                places = [place for place in places if place.country in countries]
+                # A known name outside the named area is not a vaguer match
+                return self._largest(places)
+            if places:
+                return self._largest(places)
+        return None
+
+    @staticmethod
+    def _largest(places: List[Place]) -> Optional[Place]:
+        return max(places, key=lambda place: place.population, default=None)
+
+
+@lru_cache
+def get_gazetteer() -> Gazetteer:
+    return Gazetteer.from_file(Path(settings.GAZETTEER_PATH or GAZETTEER_PATH))
+
+
+@lru_cache(maxsize=GEOCODE_CACHE_SIZE)
+def geocode(location: str) -> Optional[Place]:
+    return get_gazetteer().lookup(location)
+
+
+def fill_coordinates(
+    timeline: List[dict], previous: Optional[List[dict]] = None
+) -> int:
+    """
+    Sets the coordinates of events that have a location but none of their
+    own, returning how many were found. Filled events carry the gazetteer
+    place in `geocoded`. While an event still has the coordinates of a fill
+    from the `previous` timeline it is geocoded again, so the fill follows
+    its location; coordinates sent by the client are kept and the mark is
+    cleared.
+    """
+    fills = {
+        (event.get("latitude"), event.get("longitude"))
+        for event in previous or []
+        if event.get("geocoded")
+    }
+    filled = 0
+    for event in timeline:
+        if event.get("geocoded"):
+            if (event.get("latitude"), event.get("longitude")) in fills:
+                event["latitude"] = event["longitude"] = None
+            event["geocoded"] = None
+        location = event.get("location")
+        if not location or event.get("latitude") is not None:
+            continue
+        if event.get("longitude") is not None:
+            continue
+        place = geocode(location)
+        if place is not None:
+            event["latitude"], event["longitude"] = place.latitude, place.longitude
+            event["geocoded"] = f"{place.name}, {place.country}"
+            filled += 1
+    return filled
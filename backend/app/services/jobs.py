@@ -0,0 +1,227 @@
+"""
+In-process background jobs.
+
+Jobs are recorded in the `jobs` collection before they are queued, so
+clients can poll them and a restart picks up whatever was left unfinished.
+Workers are asyncio tasks started in the app lifespan. A failed attempt is
+retried with exponential backoff up to JOB_MAX_ATTEMPTS times, so handlers
+must be safe to run again after a partial run.
+
+Several instances can hold the same job ID, so a worker claims a job in a
+transaction that marks it running with a lease in `run_at`. The lease is
+renewed while the handler runs. A job is only claimed again when it is
+due and no lease on it is live, which is how the jobs of a crashed
+instance are resumed.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from firebase_admin import firestore
+
+from app.core.constants import (
+    JOB_LEASE,
+    JOB_MAX_ATTEMPTS,
+    JOB_MAX_RETRY_DELAY,
+    JOB_RETRY_DELAY,
+    JOBS,
+)
+from app.models.models import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Any, Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+PENDING_STATUSES = [
+    JobStatus.QUEUED.value,
+    JobStatus.RUNNING.value,
+    JobStatus.RETRYING.value,
+]
+
+
+def job_ref(db: Any, job_id: str):
+    return db.collection(JOBS).document(job_id)
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff before the next attempt, with jitter so retries spread out"""
+    delay = min(JOB_RETRY_DELAY * 2 ** (attempts - 1), JOB_MAX_RETRY_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class JobQueue:
+    def __init__(self):
+        self.handlers: Dict[str, Handler] = {}
+        self.db: Any = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._timers: Set[asyncio.Task] = set()
+
+    def handler(self, kind: str) -> Callable[[Handler], Handler]:
+        """Registers the coroutine that runs jobs of `kind`"""
+
+        def register(func: Handler) -> Handler:
+            self.handlers[kind] = func
+            return func
+
+        return register
+
+    async def start(self, db: Any, workers: int) -> None:
+        self.db = db
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(workers)]
+        await self._recover()
+
+    async def stop(self) -> None:
+        """Stops the workers, unfinished jobs are resumed on the next start"""
+        tasks = [*self._workers, *self._timers]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers, self._timers, self._queue = [], set(), None
+
+    async def enqueue(
+        self, db: Any, kind: str, payload: Dict[str, Any], created_by: str
+    ) -> Job:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(kind=kind, payload=payload, created_by=created_by)
+        await job_ref(db, job.id).set(job.to_dict())
+        self._schedule(job.id, 0)
+        return job
+
+    def _schedule(self, job_id: str, delay: float) -> None:
+        if self._queue is None:
+            # Not started, the record is picked up by the next start
+            return
+        if delay <= 0:
+            self._queue.put_nowait(job_id)
+            return
+        timer = asyncio.create_task(self._put_later(job_id, delay))
+        self._timers.add(timer)
+        timer.add_done_callback(self._timers.discard)
+
+    async def _put_later(self, job_id: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+
+    async def _recover(self) -> None:
+        """Queues unfinished jobs for when they are due or their lease ends"""
+        pending = self.db.collection(JOBS).where("status", "in", PENDING_STATUSES)
+        count = 0
+        async for snapshot in pending.stream():
+            run_at = (snapshot.to_dict() or {}).get("run_at")
+            self._schedule(
+                snapshot.id, run_at.timestamp() - time.time() if run_at else 0
+            )
+            count += 1
+        if count:
+            logger.info(f"Resuming {count} background jobs")
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Error from running job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _claim(self, job_id: str) -> Optional[Job]:
+        """
+        Marks a due job as running under a lease and returns it, or returns
+        None when the job is finished, not due or leased by another worker
+        """
+        ref = job_ref(self.db, job_id)
+
+        @firestore.async_transactional
+        async def claim(transaction) -> Tuple[Optional[Job], float]:
+            snapshot = await ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None, 0
+            job = Job.from_dict(snapshot.to_dict())
+            if job.status not in PENDING_STATUSES:
+                return None, 0
+            now = datetime.now(timezone.utc)
+            if job.run_at is not None and job.run_at > now:
+                return None, (job.run_at - now).total_seconds()
+            job.attempts += 1
+            transaction.update(
+                ref,
+                {
+                    "status": JobStatus.RUNNING.value,
+                    "attempts": job.attempts,
+                    "run_at": now + timedelta(seconds=JOB_LEASE),
+                    "updated_at": firestore.SERVER_TIMESTAMP,
+                },
+            )
+            return job, 0
+
+        job, wait = await claim(self.db.transaction())
+        if wait > 0:
+            # Looked at again when it is due or the lease runs out
+            self._schedule(job_id, wait)
+        return job
+
+    async def _renew(self, ref: Any) -> None:
+        while True:
+            await asyncio.sleep(JOB_LEASE / 3)
+            await ref.update(
+                {"run_at": datetime.now(timezone.utc) + timedelta(seconds=JOB_LEASE)}
+            )
+
+    async def _run(self, job_id: str) -> None:
+        job = await self._claim(job_id)
+        if job is None:
+            return
+
+        ref = job_ref(self.db, job_id)
+        renewal = asyncio.create_task(self._renew(ref))
+        try:
+            result = await self.handlers[job.kind](self.db, job.payload)
+        except Exception as e:
+            await self._failed(ref, job, e)
+            return
+        finally:
+            renewal.cancel()
+
+        await ref.update(
+            {
+                "status": JobStatus.SUCCEEDED.value,
+                "error": None,
+                "result": result or {},
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            }
+        )
+
+    async def _failed(self, ref: Any, job: Job, error: Exception) -> None:
+        """Schedules another attempt, or marks the job failed after the last"""
+        if job.attempts >= JOB_MAX_ATTEMPTS:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {error}")
+            await ref.update(
+                {
+                    "status": JobStatus.FAILED.value,
+                    "error": str(error),
+                    "updated_at": firestore.SERVER_TIMESTAMP,
+                }
+            )
+            return
+        delay = retry_delay(job.attempts)
+        await ref.update(
+            {
+                "status": JobStatus.RETRYING.value,
+                "error": str(error),
+                "run_at": datetime.now(timezone.utc) + timedelta(seconds=delay),
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            }
+        )
+        self._schedule(job.id, delay)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,259 @@
+"""
+Aggregate migration flow analytics.
+
+Timeline events with coordinates are loaded once from the
+`migrationEvents` index into columnar NumPy arrays, ordered by record and
+timeline position. A move is a pair of consecutive events of the same
+record, so origins, destinations, great-circle distances and decades of
+every move come from a few array operations, and flows are binned with
+np.unique over region codes.
+
+Record writes in this process update the columns in place and drop the
+cached results. The arrays are reloaded after ANALYTICS_TTL to pick up
+writes from other processes.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.constants import ANALYTICS_CACHE_SIZE, ANALYTICS_TTL, MIGRATION_EVENTS
+from app.utils.cache import TTLCache
+from app.utils.geo import EARTH_RADIUS_KM, located
+
+EVENT_FIELDS = ["record_id", "index", "year", "latitude", "longitude"]
+
+
+def _event_rows(events: List[dict]) -> np.ndarray:
+    """(n, 3) float array of year, latitude, longitude in timeline order"""
+    ordered = sorted(filter(located, events), key=lambda event: event["index"])
+    rows = [
+        (event.get("year") or 0, event["latitude"], event["longitude"])
+        for event in ordered
+    ]
+    return np.array(rows, dtype=np.float64).reshape(-1, 3)
+
+
+def haversine_km(
+    lat1: np.ndarray, lng1: np.ndarray, lat2: np.ndarray, lng2: np.ndarray
+) -> np.ndarray:
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(lng2 - lng1)
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def region_codes(
+    latitude: np.ndarray, longitude: np.ndarray, resolution: float
+) -> np.ndarray:
+    """Grid cell of each point, as row * columns + column"""
+    rows = int(np.ceil(180 / resolution))
+    columns = int(np.ceil(360 / resolution))
+    row = np.clip(((latitude + 90) // resolution).astype(np.int64), 0, rows - 1)
+    column = np.clip(((longitude + 180) // resolution).astype(np.int64), 0, columns - 1)
+    return row * columns + column
+
+
+def region_center(code: int, resolution: float) -> Tuple[float, float]:
+    columns = int(np.ceil(360 / resolution))
+    row, column = divmod(int(code), columns)
+    return (
+        min(-90 + (row + 0.5) * resolution, 90.0),
+        min(-180 + (column + 0.5) * resolution, 180.0),
+    )
+
+
+class MigrationFlows:
+    def __init__(self, ttl: int = ANALYTICS_TTL):
+        self.ttl = ttl
+        self._records: Optional[Dict[str, np.ndarray]] = None
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+        self._results = TTLCache(max_size=ANALYTICS_CACHE_SIZE, ttl=ttl)
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return (
+            self._records is not None and time.monotonic() - self._loaded_at <= self.ttl
+        )
+
+    async def load(self, db: Any) -> "MigrationFlows":
+        if self._fresh():
+            return self
+        async with self._lock:
+            if self._fresh():
+                return self
+            events: Dict[str, List[dict]] = {}
+            query = db.collection(MIGRATION_EVENTS).select(EVENT_FIELDS).stream()
+            async for snapshot in query:
+                event = snapshot.to_dict()
+                if not located(event):
+                    continue
+                events.setdefault(event["record_id"], []).append(event)
+            self._records = {
+                record_id: _event_rows(record_events)
+                for record_id, record_events in events.items()
+            }
+            self._loaded_at = time.monotonic()
+            self._invalidate()
+            return self
+
+    def _invalidate(self) -> None:
+        self._columns = None
+        self._results.clear()
+
+    def upsert(self, record_id: str, events: List[dict]) -> None:
+        """Replaces a record's events, given as `migrationEvents` documents"""
+        if self._records is None:
+            return
+        rows = _event_rows(events)
+        if len(rows):
+            self._records[record_id] = rows
+        else:
+            self._records.pop(record_id, None)
+        self._invalidate()
+
+    def remove(self, record_id: str) -> None:
+        self.upsert(record_id, [])
+
+    def expire(self) -> None:
+        """Reloads the events from the index on the next read"""
+        self._loaded_at = 0.0
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Events of every record as columns, each record's events adjacent"""
+        if self._columns is None:
+            blocks = list((self._records or {}).values())
+            rows = np.concatenate(blocks) if blocks else np.empty((0, 3))
+            lengths = [len(block) for block in blocks]
+            self._columns = {
+                "record": np.repeat(np.arange(len(blocks)), lengths),
+                "year": rows[:, 0].astype(np.int64),
+                "latitude": rows[:, 1],
+                "longitude": rows[:, 2],
+            }
+        return self._columns
+
+    def moves(self) -> Dict[str, np.ndarray]:
+        """Consecutive event pairs of the same record, with distance and decade"""
+        columns = self.columns()
+        same = columns["record"][1:] == columns["record"][:-1]
+        origin_lat = columns["latitude"][:-1][same]
+        origin_lng = columns["longitude"][:-1][same]
+        dest_lat = columns["latitude"][1:][same]
+        dest_lng = columns["longitude"][1:][same]
+        return {
+            "origin_lat": origin_lat,
+            "origin_lng": origin_lng,
+            "dest_lat": dest_lat,
+            "dest_lng": dest_lng,
+            "decade": columns["year"][1:][same] // 10 * 10,
+            "distance": haversine_km(origin_lat, origin_lng, dest_lat, dest_lng),
+        }
+
+    def flows(
+        self,
+        resolution: float,
+        decade_from: Optional[int] = None,
+        decade_to: Optional[int] = None,
+        limit: int = 100,
+        min_count: int = 1,
+    ) -> Dict[str, Any]:
+        """
+        Moves binned by decade, origin region and destination region, the
+        largest flows first, leaving out flows of fewer than `min_count` moves
+        """
+        key = ("flows", resolution, decade_from, decade_to, limit, min_count)
+        cached = self._results.get(key)
+        if cached is not None:
+            return cached
+
+        moves = self.moves()
+        keep = np.ones(len(moves["decade"]), dtype=bool)
+        if decade_from is not None:
+            keep &= moves["decade"] >= decade_from
+        if decade_to is not None:
+            keep &= moves["decade"] <= decade_to
+        origin = region_codes(
+            moves["origin_lat"][keep], moves["origin_lng"][keep], resolution
+        )
+        destination = region_codes(
+            moves["dest_lat"][keep], moves["dest_lng"][keep], resolution
+        )
+        # Moves within one region are not flows
+        between = origin != destination
+        keys = np.stack(
+            [moves["decade"][keep][between], origin[between], destination[between]],
+            axis=1,
+        )
+        distance = moves["distance"][keep][between]
+
+        flows = []
+        if len(keys):
+            bins, inverse, counts = np.unique(
+                keys, axis=0, return_inverse=True, return_counts=True
+            )
+            total_distance = np.bincount(inverse.ravel(), weights=distance)
+            order = np.lexsort((bins[:, 0], -counts))
+            for i in order[counts[order] >= min_count][:limit]:
+                decade, origin_code, dest_code = bins[i]
+                flows.append(
+                    {
+                        "decade": int(decade),
+                        "origin": region_center(origin_code, resolution),
+                        "destination": region_center(dest_code, resolution),
+                        "count": int(counts[i]),
+                        "mean_distance_km": float(total_distance[i] / counts[i]),
+                    }
+                )
+
+        result = {
+            "resolution": resolution,
+            "total_moves": int(between.sum()),
+            "flows": flows,
+        }
+        self._results.set(key, result)
+        return result
+
+    def heatmap(
+        self,
+        resolution: float,
+        decade_from: Optional[int] = None,
+        decade_to: Optional[int] = None,
+        min_count: int = 1,
+    ) -> Dict[str, Any]:
+        """Number of events per grid cell, cells under `min_count` left out"""
+        key = ("heatmap", resolution, decade_from, decade_to, min_count)
+        cached = self._results.get(key)
+        if cached is not None:
+            return cached
+
+        columns = self.columns()
+        decade = columns["year"] // 10 * 10
+        keep = np.ones(len(decade), dtype=bool)
+        if decade_from is not None:
+            keep &= decade >= decade_from
+        if decade_to is not None:
+            keep &= decade <= decade_to
+        codes = region_codes(
+            columns["latitude"][keep], columns["longitude"][keep], resolution
+        )
+        cells, counts = np.unique(codes, return_counts=True)
+
+        result = {
+            "resolution": resolution,
+            "total_events": int(keep.sum()),
+            "cells": [
+                {"center": region_center(code, resolution), "count": int(count)}
+                for code, count in zip(cells, counts)
+                if count >= min_count
+            ],
+        }
+        self._results.set(key, result)
+        return result
+
+
+migration_flows = MigrationFlows()
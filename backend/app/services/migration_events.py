@@ -0,0 +1,141 @@
+"""
+Index of migration timeline events.
+
+Every timeline event is copied to `migrationEvents`, one document per
+event with the ID `{record_id}-{index}`, keyed by tree, year and geohash.
+The copies are rewritten whenever their record is written, so map queries
+read only the events inside the visible cells and tree timelines are read
+in order a page at a time, instead of reading every record. Events without
+coordinates have no geohash and are left out of maps and analytics.
+"""
+
+import asyncio
+from typing import Any, List, Optional, Tuple
+
+from app.core.constants import (
+    FIRESTORE_BATCH_LIMIT,
+    GEO_CELL_LIMIT,
+    GEO_MAX_CELLS,
+    GEOHASH_PRECISION,
+    MIGRATION_EVENTS,
+)
+from app.services.migration_analytics import migration_flows
+from app.services.migration_maps import migration_maps, record_scopes
+from app.utils.db_helpers import chunked
+from app.utils.geo import Box, child_cells, covering_cells, encode, in_box, located
+
+# Sorts after every geohash character, so prefix + GEOHASH_END ends a range
+GEOHASH_END = "~"
+
+
+def event_ref(db: Any, record_id: str, index: int):
+    return db.collection(MIGRATION_EVENTS).document(f"{record_id}-{index}")
+
+
+def event_docs(record: dict) -> List[dict]:
+    """Index documents of a record's timeline events"""
+    docs = []
+    for index, event in enumerate(record.get("timeline") or []):
+        latitude, longitude = event.get("latitude"), event.get("longitude")
+        geohash = None
+        if located(event):
+            geohash = encode(latitude, longitude, GEOHASH_PRECISION)
+        docs.append(
+            {
+                "id": f"{record['id']}-{index}",
+                "record_id": record["id"],
+                "index": index,
+                "title": record.get("title"),
+                "tree_id": record.get("tree_id"),
+                "created_by": record.get("created_by"),
+                "year": event.get("year"),
+                "event": event.get("event"),
+                "location": event.get("location"),
+                "latitude": latitude,
+                "longitude": longitude,
+                "geohash": geohash,
+            }
+        )
+    return docs
+
+
+async def sync_record_events(
+    db: Any, record_id: str, old: Optional[dict], new: Optional[dict]
+) -> None:
+    """
+    Brings the index in line with a record written from `old` to `new`,
+    either of which is None for a create or a delete
+    """
+    docs = event_docs(new) if new else []
+    written = {doc["index"] for doc in docs}
+    stale = [
+        index
+        for index in range(len((old or {}).get("timeline") or []))
+        if index not in written
+    ]
+    operations = [("set", doc["index"], doc) for doc in docs]
+    operations += [("delete", index, None) for index in stale]
+
+    for chunk in chunked(operations, FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        for operation, index, doc in chunk:
+            if operation == "set":
+                batch.set(event_ref(db, record_id, index), doc)
+            else:
+                batch.delete(event_ref(db, record_id, index))
+        await batch.commit()
+    migration_flows.upsert(record_id, docs)
+    migration_maps.invalidate(record_scopes(old, new))
+
+
+async def events_in_box(
+    db: Any,
+    user_id: str,
+    box: Box,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+) -> Tuple[List[dict], bool]:
+    """
+    A user's events inside a bounding box, read with one geohash range
+    query per covering cell, optionally limited to a range of years.
+
+    A cell holding GEO_CELL_LIMIT events or more is read again as its
+    smaller cells inside the box. Also returns whether some events were
+    left out because a cell of the finest precision was still full.
+    """
+    events = db.collection(MIGRATION_EVENTS).where("created_by", "==", user_id)
+
+    async def read_cell(prefix: str) -> Tuple[List[dict], bool]:
+        query = (
+            events.where("geohash", ">=", prefix)
+            .where("geohash", "<", prefix + GEOHASH_END)
+            .limit(GEO_CELL_LIMIT)
+        )
+        found = [doc.to_dict() async for doc in query.stream()]
+        if len(found) < GEO_CELL_LIMIT:
+            return found, False
+        if len(prefix) >= GEOHASH_PRECISION:
+            return found, True
+        children = await asyncio.gather(
+            *(read_cell(child) for child in child_cells(prefix, box))
+        )
+        return (
+            [event for cell, _ in children for event in cell],
+            any(truncated for _, truncated in children),
+        )
+
+    def matches(event: dict) -> bool:
+        year = event.get("year")
+        return (
+            located(event)
+            and in_box(event["latitude"], event["longitude"], box)
+            and (year_from is None or (year is not None and year >= year_from))
+            and (year_to is None or (year is not None and year <= year_to))
+        )
+
+    cells = covering_cells(box, GEO_MAX_CELLS, GEOHASH_PRECISION)
+    results = await asyncio.gather(*(read_cell(prefix) for prefix in cells))
+    return (
+        [event for cell, _ in results for event in cell if matches(event)],
+        any(truncated for _, truncated in results),
+    )
@@ -0,0 +1,345 @@
+"""
+Map geometry of migration events.
+
+Events come from the `migrationEvents` index, for a scope that is either
+a tree or a user's records. Each located event is a point and each
+record's located events, in timeline order, form its route.
+
+GeoJSON is streamed page by page. For vector tiles, the scope's events
+are projected to Web Mercator once and cached, with points sorted by x
+and a bounding box per route so a tile only looks at what is near it.
+Concurrent requests for a scope share one load, and tiles are cut in a
+threadpool so they do not hold up the event loop. Below CLUSTER_MAX_ZOOM a
+tile clusters its points on a grid and snaps routes to the same grid, so
+routes between the same clusters merge into one line. Routes are clipped
+to the tile and simplified with Douglas-Peucker, and the tile is cached.
+A record write drops the cached data and tiles of its tree and owner.
+"""
+
+import asyncio
+import json
+from bisect import bisect_left, bisect_right
+from itertools import groupby
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.constants import (
+    CLUSTER_CELL_SIZE,
+    CLUSTER_MAX_ZOOM,
+    EXPORT_PAGE_SIZE,
+    MAP_CACHE_TTL,
+    MAP_SCOPE_CACHE_SIZE,
+    MAP_TILE_CACHE_SIZE,
+    MIGRATION_EVENTS,
+    SIMPLIFY_TOLERANCE,
+    TILE_BUFFER,
+    TILE_EXTENT,
+)
+from app.utils.cache import TTLCache
+from app.utils.db_helpers import iter_query_pages
+from app.utils.geo import clip_line, located, mercator, simplify
+from app.utils.mvt import LINESTRING, POINT, Layer, encode_tile
+
+MAP_FIELDS = [
+    "record_id",
+    "index",
+    "title",
+    "year",
+    "event",
+    "location",
+    "latitude",
+    "longitude",
+]
+EVENTS_LAYER = "events"
+ROUTES_LAYER = "routes"
+# Tile coordinates kept, including the buffer around the tile
+TILE_LOW, TILE_HIGH = -TILE_BUFFER, TILE_EXTENT + TILE_BUFFER
+
+
+def tree_scope(tree_id: str) -> str:
+    return f"tree:{tree_id}"
+
+
+def user_scope(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def record_scopes(*records: Optional[dict]) -> List[str]:
+    """Scopes whose maps show any of the records"""
+    scopes = set()
+    for record in records:
+        if not record:
+            continue
+        if record.get("tree_id"):
+            scopes.add(tree_scope(record["tree_id"]))
+        if record.get("created_by"):
+            scopes.add(user_scope(record["created_by"]))
+    return sorted(scopes)
+
+
+def scope_query(db: Any, tree_id: Optional[str], user_id: str):
+    events = db.collection(MIGRATION_EVENTS)
+    if tree_id:
+        return events.where("tree_id", "==", tree_id)
+    return events.where("created_by", "==", user_id)
+
+
+def event_properties(event: dict) -> Dict[str, Any]:
+    return {
+        "record_id": event["record_id"],
+        "index": event["index"],
+        "title": event.get("title"),
+        "year": event.get("year"),
+        "event": event.get("event"),
+        "location": event.get("location"),
+    }
+
+
+def geojson_features(events: List[dict]) -> List[dict]:
+    """Point features of one record's events, and its route if it has one"""
+    events = sorted(filter(located, events), key=lambda event: event["index"])
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [event["longitude"], event["latitude"]],
+            },
+            "properties": event_properties(event),
+        }
+        for event in events
+    ]
+    if len(events) > 1:
+        features.append(
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": [[e["longitude"], e["latitude"]] for e in events],
+                },
+                "properties": {
+                    "record_id": events[0]["record_id"],
+                    "title": events[0].get("title"),
+                },
+            }
+        )
+    return features
+
+
+async def stream_geojson(query: Any) -> AsyncIterator[str]:
+    """Streams the events of a query as a GeoJSON FeatureCollection"""
+    yield '{"type":"FeatureCollection","features":['
+    separator = ""
+    pending: List[dict] = []
+
+    def flush() -> str:
+        nonlocal separator
+        chunks = []
+        for feature in geojson_features(pending):
+            chunks.append(separator + json.dumps(feature))
+            separator = ","
+        pending.clear()
+        return "".join(chunks)
+
+    pages = iter_query_pages(query.select(MAP_FIELDS), EXPORT_PAGE_SIZE)
+    async for page in pages:
+        chunks = []
+        # Event IDs start with the record ID, so a record's events are adjacent
+        for snapshot in page:
+            event = snapshot.to_dict()
+            if pending and pending[0]["record_id"] != event["record_id"]:
+                chunks.append(flush())
+            pending.append(event)
+        yield "".join(chunks)
+    yield flush()
+    yield "]}"
+
+
+def snap(point: Tuple[int, int]) -> Tuple[int, int]:
+    """Centre of the cluster cell holding a tile point"""
+    px, py = point
+    return (
+        px // CLUSTER_CELL_SIZE * CLUSTER_CELL_SIZE + CLUSTER_CELL_SIZE // 2,
+        py // CLUSTER_CELL_SIZE * CLUSTER_CELL_SIZE + CLUSTER_CELL_SIZE // 2,
+    )
+
+
+def cluster_points(points: List[tuple], z: int) -> List[List[tuple]]:
+    """Groups tile points by cluster cell, each point alone from CLUSTER_MAX_ZOOM"""
+    if z >= CLUSTER_MAX_ZOOM:
+        return [[point] for point in points]
+    cells: Dict[Tuple[int, int], list] = {}
+    for point in points:
+        cell = (point[0] // CLUSTER_CELL_SIZE, point[1] // CLUSTER_CELL_SIZE)
+        cells.setdefault(cell, []).append(point)
+    return list(cells.values())
+
+
+def cluster_feature(members: List[tuple]) -> Tuple[int, list, Dict[str, Any]]:
+    """Point feature at the centre of a cluster, with its size and years"""
+    years = [p["year"] for _, _, p in members if p.get("year") is not None]
+    center = (
+        round(sum(px for px, _, _ in members) / len(members)),
+        round(sum(py for _, py, _ in members) / len(members)),
+    )
+    properties = {
+        "cluster": True,
+        "point_count": len(members),
+        "year_min": min(years) if years else None,
+        "year_max": max(years) if years else None,
+    }
+    return POINT, [center], properties
+
+
+def tile_lines(points: List[Tuple[int, int]]) -> tuple:
+    """Parts of a route inside a tile, simplified and on whole tile units"""
+    parts = []
+    for part in clip_line(points, TILE_LOW, TILE_HIGH):
+        line: List[Tuple[int, int]] = []
+        for px, py in simplify(part, SIMPLIFY_TOLERANCE):
+            point = (round(px), round(py))
+            if not line or point != line[-1]:
+                line.append(point)
+        if len(line) > 1:
+            parts.append(tuple(line))
+    return tuple(parts)
+
+
+class ScopeGeometry:
+    """A scope's events and routes in Web Mercator world coordinates"""
+
+    def __init__(self, events: List[dict]):
+        events = sorted(
+            filter(located, events), key=lambda e: (e["record_id"], e["index"])
+        )
+        self.points: List[Tuple[float, float, Dict[str, Any]]] = []
+        self.routes: List[Tuple[List[Tuple[float, float]], Dict[str, Any]]] = []
+        self.bounds: List[Tuple[float, float, float, float]] = []
+        for record_id, record_events in groupby(events, lambda e: e["record_id"]):
+            route = []
+            for event in record_events:
+                x, y = mercator(event["latitude"], event["longitude"])
+                self.points.append((x, y, event_properties(event)))
+                route.append((x, y))
+            if len(route) > 1:
+                title = self.points[-1][2]["title"]
+                self.routes.append((route, {"record_id": record_id, "title": title}))
+                xs, ys = [x for x, _ in route], [y for _, y in route]
+                self.bounds.append((min(xs), min(ys), max(xs), max(ys)))
+        self.points.sort(key=lambda point: point[0])
+        self.xs = [x for x, _, _ in self.points]
+
+    def tile(self, z: int, x: int, y: int) -> bytes:
+        scale = 2**z
+        # Snapped routes move by up to half a cluster cell
+        margin = (TILE_BUFFER + CLUSTER_CELL_SIZE) / TILE_EXTENT / scale
+        window = (
+            x / scale - margin,
+            y / scale - margin,
+            (x + 1) / scale + margin,
+            (y + 1) / scale + margin,
+        )
+
+        def local(wx: float, wy: float) -> Tuple[int, int]:
+            return (
+                round((wx * scale - x) * TILE_EXTENT),
+                round((wy * scale - y) * TILE_EXTENT),
+            )
+
+        return encode_tile(
+            [self._events(z, window, local), self._routes(z, window, local)]
+        )
+
+    def _events(self, z: int, window: Tuple, local: Callable) -> Layer:
+        x0, _, x1, _ = window
+        visible = []
+        for wx, wy, properties in self.points[
+            bisect_left(self.xs, x0) : bisect_right(self.xs, x1)
+        ]:
+            px, py = local(wx, wy)
+            if TILE_LOW <= px < TILE_HIGH and TILE_LOW <= py < TILE_HIGH:
+                visible.append((px, py, properties))
+
+        events = Layer(EVENTS_LAYER, TILE_EXTENT)
+        for members in cluster_points(visible, z):
+            if len(members) == 1:
+                px, py, properties = members[0]
+                events.add(POINT, [(px, py)], properties)
+            else:
+                events.add(*cluster_feature(members))
+        return events
+
+    def _routes(self, z: int, window: Tuple, local: Callable) -> Layer:
+        x0, y0, x1, y1 = window
+        lines: Dict[tuple, List[Dict[str, Any]]] = {}
+        for (route, properties), (bx0, by0, bx1, by1) in zip(self.routes, self.bounds):
+            if bx1 < x0 or bx0 > x1 or by1 < y0 or by0 > y1:
+                continue
+            points = [local(wx, wy) for wx, wy in route]
+            if z < CLUSTER_MAX_ZOOM:
+                # Routes end at the clusters, so routes between the same
+                # clusters share a line
+                points = [snap(point) for point in points]
+            parts = tile_lines(points)
+            if parts:
+                lines.setdefault(parts, []).append(properties)
+
+        routes = Layer(ROUTES_LAYER, TILE_EXTENT)
+        for parts, records in lines.items():
+            if len(records) > 1:
+                records = [{"record_count": len(records)}]
+            routes.add(LINESTRING, parts, records[0])
+        return routes
+
+
+class MigrationMaps:
+    def __init__(self):
+        self._geometry = TTLCache(max_size=MAP_SCOPE_CACHE_SIZE, ttl=MAP_CACHE_TTL)
+        self._tiles = TTLCache(max_size=MAP_TILE_CACHE_SIZE, ttl=MAP_CACHE_TTL)
+        self._loading: Dict[str, asyncio.Task] = {}
+        # Bumped by every invalidation, so work started before it is not kept
+        self._generations: Dict[str, int] = {}
+
+    async def _load(self, scope: str, query: Any) -> ScopeGeometry:
+        generation = self._generations.get(scope, 0)
+        try:
+            events = [s.to_dict() async for s in query.select(MAP_FIELDS).stream()]
+            geometry = await run_in_threadpool(ScopeGeometry, events)
+            if self._generations.get(scope, 0) == generation:
+                self._geometry.set(scope, geometry, tags=[scope])
+            return geometry
+        finally:
+            if self._loading.get(scope) is asyncio.current_task():
+                del self._loading[scope]
+
+    async def geometry(self, scope: str, query: Any) -> ScopeGeometry:
+        geometry = self._geometry.get(scope)
+        if geometry is not None:
+            return geometry
+        load = self._loading.get(scope)
+        if load is None:
+            load = self._loading[scope] = asyncio.create_task(self._load(scope, query))
+        # A cancelled request leaves the load to the others waiting on it
+        return await asyncio.shield(load)
+
+    async def tile(self, scope: str, query: Any, z: int, x: int, y: int) -> bytes:
+        key = (scope, z, x, y)
+        tile = self._tiles.get(key)
+        if tile is None:
+            generation = self._generations.get(scope, 0)
+            geometry = await self.geometry(scope, query)
+            tile = await run_in_threadpool(geometry.tile, z, x, y)
+            if self._generations.get(scope, 0) == generation:
+                self._tiles.set(key, tile, tags=[scope])
+        return tile
+
+    def invalidate(self, scopes: Iterable[str]) -> None:
+        for scope in scopes:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+            self._loading.pop(scope, None)
+            self._geometry.invalidate_tag(scope)
+            self._tiles.invalidate_tag(scope)
+
+
+migration_maps = MigrationMaps()
@@ -0,0 +1,76 @@
+"""
+Per-user creation quotas.
+
+Usage is kept in one counter document per user, `quotas/{user_id}`, with a
+field per collection. Reserving a slot reads and increments that field in a
+transaction, so concurrent creates cannot both take the last slot. A field
+that does not exist yet is seeded with a count aggregation over the user's
+existing documents.
+"""
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from firebase_admin import firestore
+
+from app.core.constants import QUOTAS
+
+
+def quota_ref(db: Any, user_id: str):
+    return db.collection(QUOTAS).document(user_id)
+
+
+async def count_owned(db: Any, user_id: str, collection: str, transaction=None) -> int:
+    query = db.collection(collection).where("created_by", "==", user_id)
+    result = await query.count().get(transaction=transaction)
+    return int(result[0][0].value)
+
+
+async def reserve_quota(db: Any, user_id: str, collection: str, limit: int) -> bool:
+    """Takes one slot of `collection` for a user, False if none are left"""
+    ref = quota_ref(db, user_id)
+
+    @firestore.async_transactional
+    async def reserve(transaction) -> bool:
+        snapshot = await ref.get(transaction=transaction)
+        used = (snapshot.to_dict() or {}).get(collection)
+        if used is None:
+            used = await count_owned(db, user_id, collection, transaction)
+        if used >= limit:
+            return False
+        transaction.set(ref, {collection: used + 1}, merge=True)
+        return True
+
+    return await reserve(db.transaction())
+
+
+async def release_quota(db: Any, user_id: str, collection: str, count: int = 1) -> None:
+    """Gives back `count` slots of `collection` after documents were deleted"""
+    ref = quota_ref(db, user_id)
+
+    @firestore.async_transactional
+    async def release(transaction) -> None:
+        snapshot = await ref.get(transaction=transaction)
+        used = (snapshot.to_dict() or {}).get(collection)
+        # An unseeded counter is recounted on the next reservation
+        if used:
+            transaction.update(ref, {collection: max(used - count, 0)})
+
+    await release(db.transaction())
+
+
+@asynccontextmanager
+async def quota_slot(
+    db: Any, user_id: str, collection: str, limit: int
+) -> AsyncIterator[bool]:
+    """
+    Reserves a slot for the duration of a create, yielding whether it was
+    granted. A granted slot is released again if the create fails.
+    """
+    granted = await reserve_quota(db, user_id, collection, limit)
+    try:
+        yield granted
+    except BaseException:
+        if granted:
+            await release_quota(db, user_id, collection)
+        raise
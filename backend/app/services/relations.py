@@ -0,0 +1,136 @@
+from typing import Any, Dict, List, Optional
+
+from firebase_admin import firestore
+
+from app.schemas.tree_schemas import RelationToMemberSchema, RelationType
+
+# Relationship fields holding several member IDs, the rest hold one ID
+ARRAY_FIELDS = ("spouse_id", "children_id", "sibling_id")
+
+
+class RelationPlan:
+    """
+    Collects every relationship field change caused by adding one member,
+    keyed by member ID, before anything is written.
+    """
+
+    def __init__(self):
+        self.changes: Dict[str, Dict[str, Any]] = {}
+
+    def link(self, member_id: Optional[str], field: str, value: Optional[str]):
+        """Points `field` of `member_id` at `value`, appending for list fields"""
+        if not member_id:
+            return
+        fields = self.changes.setdefault(member_id, {})
+        if field in ARRAY_FIELDS:
+            if value and value != member_id and value not in fields.get(field, []):
+                fields.setdefault(field, []).append(value)
+        else:
+            fields[field] = value
+
+    def member_ids(self) -> List[str]:
+        return list(self.changes)
+
+    def apply(self, member_id: str, data: dict) -> dict:
+        """Returns `data` with the planned changes for `member_id` merged in"""
+        merged = dict(data)
+        for field, value in self.changes.get(member_id, {}).items():
+            if field in ARRAY_FIELDS:
+                current = list(merged.get(field) or [])
+                merged[field] = current + [v for v in value if v not in current]
+            else:
+                merged[field] = value
+        return merged
+
+    def update_for(self, member_id: str) -> dict:
+        """Returns the planned changes as a field-level Firestore update"""
+        return {
+            field: firestore.ArrayUnion(value) if field in ARRAY_FIELDS else value
+            for field, value in self.changes.get(member_id, {}).items()
+        }
+
+
+def plan_child_relations(
+    plan: RelationPlan, person_id: str, relation: RelationToMemberSchema
+) -> None:
+    """
+    Links a new child to the primary user's spouse as its other parent and
+    to the primary user's other children as their sibling
+    """
+    # Update spouse children_id field
+    if relation.primary_spouse_id:
+        plan.link(relation.primary_spouse_id, "children_id", person_id)
+        plan.link(
+            person_id,
+            "father_id" if relation.primary_spouse_gender == "male" else "mother_id",
+            relation.primary_spouse_id,
+        )
+
+    for child_id in relation.primary_children_id or []:
+        if child_id != person_id:
+            plan.link(child_id, "sibling_id", person_id)
+            plan.link(person_id, "sibling_id", child_id)
+
+
+def plan_new_member_relations(
+    person_id: str,
+    person_gender: Optional[str],
+    person_children_id: List[str],
+    relation: RelationToMemberSchema,
+    primary_user_data: Optional[dict],
+) -> RelationPlan:
+    """
+    Plans the bi-directional relationship updates for a member added to a
+    tree relative to the primary user.
+
+    `primary_user_data` is the primary user's current document (or None if
+    it does not exist) and is used to link the new member to the primary
+    user's parents.
+    """
+    plan = RelationPlan()
+    primary_id = relation.primary_user_id
+    primary_user_data = primary_user_data or {}
+
+    relation_mapping = {
+        RelationType.FATHER: ("father_id", "children_id"),
+        RelationType.MOTHER: ("mother_id", "children_id"),
+        RelationType.SPOUSE: ("spouse_id", "spouse_id"),
+        RelationType.SIBLING: ("sibling_id", "sibling_id"),
+        RelationType.CHILD: (
+            "children_id",
+            "father_id" if relation.primary_user_gender == "male" else "mother_id",
+        ),
+    }
+
+    if relation.rel in relation_mapping:
+        new_person_field, primary_user_field = relation_mapping[relation.rel]
+        plan.link(primary_id, new_person_field, person_id)
+        plan.link(person_id, primary_user_field, primary_id)
+
+    # SIBLINGS - Assign parents
+    if relation.rel == RelationType.SIBLING:
+        father_id = primary_user_data.get("father_id")
+        mother_id = primary_user_data.get("mother_id")
+        plan.link(person_id, "father_id", father_id)
+        plan.link(person_id, "mother_id", mother_id)
+        plan.link(father_id, "children_id", person_id)
+        plan.link(mother_id, "children_id", person_id)
+
+    if relation.rel == RelationType.CHILD:
+        plan_child_relations(plan, person_id, relation)
+
+    # Handle case where there is parent_ids in primary user
+    if relation.rel in (RelationType.FATHER, RelationType.MOTHER):
+        field_id = "mother_id" if relation.rel == RelationType.FATHER else "father_id"
+        spouse_id = primary_user_data.get(field_id)
+        if spouse_id is not None:
+            plan.link(person_id, "spouse_id", spouse_id)
+            plan.link(spouse_id, "spouse_id", person_id)
+
+    # Update parent field of children for when adding spouse
+    if relation.rel == RelationType.SPOUSE:
+        parent_gender = "father_id" if person_gender == "male" else "mother_id"
+        for child_id in person_children_id:
+            plan.link(child_id, parent_gender, person_id)
+
+    return plan
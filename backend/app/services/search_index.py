@@ -0,0 +1,232 @@
+import asyncio
+import math
+import re
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core.constants import (
+    CULTURAL_CONTEXT,
+    SEARCH_INDEX_TTL,
+    SEARCH_MAX_PREFIX_TERMS,
+)
+from app.models.models import ContextStatus
+from app.utils.etag import next_version, read_version
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Term frequency weight of each indexed field
+FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "content": 1.0}
+
+# Document fields the index is built from
+SEARCH_FIELDS = [*FIELD_WEIGHTS, "status", "created_at"]
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def _timestamp(value: Any) -> float:
+    """Sort key for created_at values, naive datetimes are taken as UTC"""
+    if not isinstance(value, datetime):
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class SearchIndex:
+    """
+    In-memory BM25 inverted index over cultural contexts.
+
+    Postings map each term to the weighted term frequency per document, and
+    a sorted vocabulary makes prefix lookups a bisect plus a short scan.
+    Documents are added and removed one at a time, so writes keep the index
+    current without a rebuild.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.vocabulary: List[str] = []
+        self.terms: Dict[str, List[str]] = {}
+        self.lengths: Dict[str, float] = {}
+        self.created: Dict[str, float] = {}
+        self.tags: Dict[str, List[str]] = {}
+        self.total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def upsert(self, doc_id: str, context: dict) -> None:
+        """Indexes an approved context, or drops it if it is not approved"""
+        self.remove(doc_id)
+        if context.get("status") != ContextStatus.APPROVED.value:
+            return
+
+        frequencies: Dict[str, float] = {}
+        fields = {
+            "title": context.get("title") or "",
+            "tags": " ".join(context.get("tags") or []),
+            "content": context.get("content") or "",
+        }
+        for field, text in fields.items():
+            for term in tokenize(text):
+                frequencies[term] = frequencies.get(term, 0.0) + FIELD_WEIGHTS[field]
+
+        for term, frequency in frequencies.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                insort(self.vocabulary, term)
+            postings[doc_id] = frequency
+
+        length = sum(frequencies.values())
+        self.terms[doc_id] = list(frequencies)
+        self.lengths[doc_id] = length
+        self.created[doc_id] = _timestamp(context.get("created_at"))
+        self.tags[doc_id] = list(context.get("tags") or [])
+        self.total_length += length
+
+    def remove(self, doc_id: str) -> None:
+        length = self.lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.created.pop(doc_id, None)
+        self.tags.pop(doc_id, None)
+        self.total_length -= length
+        for term in self.terms.pop(doc_id):
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+                del self.vocabulary[bisect_left(self.vocabulary, term)]
+
+    def _expand(self, prefix: str) -> Iterator[str]:
+        """Yields indexed terms starting with `prefix`, the exact term first"""
+        start = bisect_left(self.vocabulary, prefix)
+        end = min(start + SEARCH_MAX_PREFIX_TERMS, len(self.vocabulary))
+        for term in self.vocabulary[start:end]:
+            if not term.startswith(prefix):
+                return
+            yield term
+
+    def search(self, query: str) -> List[Tuple[str, float]]:
+        """
+        Returns (document ID, score) pairs for documents matching every
+        query term, by prefix, best match first.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.lengths:
+            return []
+
+        count = len(self.lengths)
+        average_length = self.total_length / count or 1.0
+        scores: Optional[Dict[str, float]] = None
+        # Rarest terms first keeps the candidate set small
+        for prefix in sorted(terms, key=lambda t: len(self.postings.get(t, ()))):
+            term_scores: Dict[str, float] = {}
+            for term in self._expand(prefix):
+                postings = self.postings[term]
+                idf = math.log(
+                    1 + (count - len(postings) + 0.5) / (len(postings) + 0.5)
+                )
+                for doc_id, frequency in postings.items():
+                    if scores is not None and doc_id not in scores:
+                        continue
+                    norm = K1 * (1 - B + B * self.lengths[doc_id] / average_length)
+                    score = idf * frequency * (K1 + 1) / (frequency + norm)
+                    # A prefix matching several terms counts its best one
+                    if score > term_scores.get(doc_id, 0.0):
+                        term_scores[doc_id] = score
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {d: scores[d] + s for d, s in term_scores.items()}
+            if not scores:
+                return []
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def latest(self, doc_ids: List[str]) -> List[str]:
+        return sorted(doc_ids, key=lambda doc_id: -self.created.get(doc_id, 0.0))
+
+
+class SearchIndexCache:
+    """
+    Per-process search index of approved cultural contexts.
+
+    The index is loaded with a single query and rebuilt after `ttl` seconds,
+    or sooner when a caller has read a newer version of the contexts than
+    the one the index holds, which picks up writes made by other processes.
+    Writes in this process call `upsert` and `remove` so they are searchable
+    right away, then `publish` the new version, which the index holds too
+    unless another process wrote in between.
+    """
+
+    def __init__(self, ttl: int = SEARCH_INDEX_TTL):
+        self.ttl = ttl
+        self._index: Optional[SearchIndex] = None
+        self._loaded_at = 0.0
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self, version: Optional[int]) -> bool:
+        return (
+            self._index is not None
+            and time.monotonic() - self._loaded_at <= self.ttl
+            and (version is None or version <= self._version)
+        )
+
+    async def get(self, db: Any, version: Optional[int] = None) -> SearchIndex:
+        """
+        Returns the index, reloading it if it is older than `ttl` or than
+        `version`, a version of the contexts read before calling
+        """
+        if self._fresh(version):
+            return self._index
+
+        async with self._lock:
+            if self._fresh(version):
+                return self._index
+
+            # Read first, so writes made while streaming only look newer
+            loaded_version = await read_version(db, CULTURAL_CONTEXT)
+            contexts = (
+                db.collection(CULTURAL_CONTEXT)
+                .where("status", "==", ContextStatus.APPROVED.value)
+                .select(SEARCH_FIELDS)
+                .stream()
+            )
+            index = SearchIndex()
+            async for context in contexts:
+                index.upsert(context.id, context.to_dict())
+            self._index, self._loaded_at = index, time.monotonic()
+            self._version = loaded_version
+            return index
+
+    def upsert(self, doc_id: str, context: dict) -> None:
+        if self._index is not None:
+            self._index.upsert(doc_id, context)
+
+    def remove(self, doc_id: str) -> None:
+        if self._index is not None:
+            self._index.remove(doc_id)
+
+    async def publish(self, db: Any) -> None:
+        """
+        Bumps the version of the approved contexts after a change this
+        process has already applied with `upsert` or `remove`
+        """
+        version = await next_version(db, CULTURAL_CONTEXT)
+        # Any other version in between is a write this index has not seen
+        if self._index is not None and version == self._version + 1:
+            self._version = version
+
+
+context_search = SearchIndexCache()
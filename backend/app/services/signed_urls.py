@@ -0,0 +1,135 @@
+"""
+Signed URLs for private media.
+
+Signing a URL costs CPU, or an IAM round trip with credentials that cannot
+sign locally, so signatures are cached per file. Time is cut into windows
+of `SIGNED_URL_WINDOW` seconds and every URL signed in a window expires
+`SIGNED_URL_GRACE` seconds after it ends. A file is therefore signed at
+most once per window, and a response built from signed URLs can be
+revalidated by ETag for the rest of the window, see `signing_window`.
+"""
+
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.constants import (
+    SIGNED_URL_CACHE_SIZE,
+    SIGNED_URL_GRACE,
+    SIGNED_URL_WINDOW,
+)
+from app.models.models import CulturalContext
+from app.utils.cache import TTLCache
+from app.utils.images import replace_srcset_urls, srcset_urls
+from app.utils.storage import get_storage
+
+MEDIA_FIELDS = ("image_url", "video_url", "audio_url")
+
+
+def signing_window() -> Optional[int]:
+    """
+    Returns the current signing window, or None when media is public.
+
+    Include it in the ETag of responses carrying signed URLs so clients
+    fetch fresh URLs once the ones they hold are about to expire.
+    """
+    if not settings.PRIVATE_MEDIA:
+        return None
+    return int(time.time() // SIGNED_URL_WINDOW)
+
+
+class SignedUrlCache:
+    def __init__(
+        self,
+        window: int = SIGNED_URL_WINDOW,
+        grace: int = SIGNED_URL_GRACE,
+        max_size: int = SIGNED_URL_CACHE_SIZE,
+    ):
+        self.window = window
+        self.grace = grace
+        self._cache = TTLCache(max_size=max_size, ttl=window)
+        self.signed = 0
+        self.batches = 0
+
+    def _sign_all(self, names: List[str], window: int) -> List[str]:
+        backend = get_storage()
+        expires = datetime.fromtimestamp(
+            (window + 1) * self.window + self.grace, tz=timezone.utc
+        )
+        return [backend.sign(name, expires) for name in names]
+
+    async def sign_many(self, urls: Iterable[str]) -> Dict[str, str]:
+        """
+        Maps stored media URLs to signed ones, signing every uncached file
+        in one threadpool call. URLs from outside our storage are kept.
+        """
+        backend = get_storage()
+        window = int(time.time() // self.window)
+        signed: Dict[str, str] = {}
+        missing: Dict[str, List[str]] = {}
+        for url in dict.fromkeys(urls):
+            name = backend.blob_name(url)
+            if name is None:
+                signed[url] = url
+                continue
+            cached = self._cache.get((window, name))
+            if cached is not None:
+                signed[url] = cached
+            else:
+                missing.setdefault(name, []).append(url)
+
+        if missing:
+            names = list(missing)
+            results = await run_in_threadpool(self._sign_all, names, window)
+            self.signed += len(names)
+            self.batches += 1
+            for name, signed_url in zip(names, results):
+                self._cache.set((window, name), signed_url)
+                for url in missing[name]:
+                    signed[url] = signed_url
+        return signed
+
+    async def sign(self, url: str) -> str:
+        return (await self.sign_many([url]))[url]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._cache.stats(),
+            "window": self.window,
+            "grace": self.grace,
+            "signed": self.signed,
+            "batches": self.batches,
+        }
+
+
+signed_urls = SignedUrlCache()
+
+
+async def sign_contexts(contexts: List[CulturalContext]) -> List[CulturalContext]:
+    """
+    Returns copies of `contexts` with media URLs signed, in one batch for
+    the whole list. Contexts are returned as they are when media is public.
+    """
+    if not settings.PRIVATE_MEDIA or not contexts:
+        return contexts
+
+    urls = []
+    for context in contexts:
+        urls += [getattr(context, field) for field in MEDIA_FIELDS]
+        urls += srcset_urls(context.image_srcset)
+    signed = await signed_urls.sign_many(url for url in urls if url)
+
+    results = []
+    for context in contexts:
+        update: Dict[str, Any] = {
+            field: signed[getattr(context, field)]
+            for field in MEDIA_FIELDS
+            if getattr(context, field)
+        }
+        if context.image_srcset:
+            update["image_srcset"] = replace_srcset_urls(context.image_srcset, signed)
+        results.append(context.model_copy(update=update))
+    return results
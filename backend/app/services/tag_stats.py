@@ -0,0 +1,138 @@
+"""
+Tag counts of approved cultural contexts.
+
+Counts are kept in one document, `stats/culturalContextTags`, as a map of
+tag to number of approved contexts. Every write that changes which
+approved contexts carry a tag applies the difference with Increment, so
+reading the counts is a single document read however many contexts exist.
+
+Deltas are taken between the stored context and its replacement inside a
+transaction, so two writers racing on one context never both apply the
+same change. A recount only replaces the counts if no increment landed
+while it was counting, and starts over otherwise.
+"""
+
+import heapq
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+
+from app.core.constants import CULTURAL_CONTEXT, STATS, TAG_RECOUNT_ATTEMPTS, TAG_STATS
+from app.models.models import ContextStatus
+
+
+def tag_stats_ref(db: Any):
+    return db.collection(STATS).document(TAG_STATS)
+
+
+def approved_tags(context: Optional[dict]) -> Counter:
+    """Tags a context contributes to the counts, none unless approved"""
+    if not context or context.get("status") != ContextStatus.APPROVED.value:
+        return Counter()
+    return Counter(set(context.get("tags") or []))
+
+
+def tag_deltas(old: Optional[dict], new: Optional[dict]) -> Counter:
+    """Change in tag counts when a context goes from `old` to `new`"""
+    deltas = approved_tags(new)
+    deltas.subtract(approved_tags(old))
+    return Counter({tag: n for tag, n in deltas.items() if n})
+
+
+def tag_updates(deltas: Counter) -> Dict[str, Any]:
+    # Merged as a nested map, so tags are never parsed as field paths
+    return {"counts": {tag: firestore.Increment(n) for tag, n in deltas.items()}}
+
+
+def stage_tag_deltas(db: Any, batch: Any, deltas: Counter) -> None:
+    """Adds the count changes to a batch that writes the contexts themselves"""
+    if deltas:
+        batch.set(tag_stats_ref(db), tag_updates(deltas), merge=True)
+
+
+async def write_with_tag_counts(
+    db: Any, ref: Any, change: Callable[[dict], Optional[dict]]
+) -> Tuple[Optional[dict], Optional[dict]]:
+    """
+    Replaces a context with `change(context)`, or deletes it when that is
+    None, and applies the tag count changes in the same transaction.
+
+    `change` may run more than once when the context is written meanwhile.
+    Returns the context before and after, or (None, None) if it is missing.
+    """
+
+    @firestore.async_transactional
+    async def write(transaction) -> Tuple[Optional[dict], Optional[dict]]:
+        snapshot = await ref.get(transaction=transaction)
+        if not snapshot.exists:
+            return None, None
+        old = snapshot.to_dict()
+        new = change(old)
+        if new is None:
+            transaction.delete(ref)
+        else:
+            transaction.update(ref, new)
+        stage_tag_deltas(db, transaction, tag_deltas(old, new))
+        return old, new
+
+    return await write(db.transaction())
+
+
+async def rebuild_tag_counts(db: Any) -> Dict[str, int]:
+    """Recounts tags over all approved contexts and replaces the stored counts"""
+    for _ in range(TAG_RECOUNT_ATTEMPTS):
+        stats = await tag_stats_ref(db).get()
+        contexts = (
+            db.collection(CULTURAL_CONTEXT)
+            .where("status", "==", ContextStatus.APPROVED.value)
+            .select(["tags"])
+            .stream()
+        )
+        counts: Counter = Counter()
+        async for context in contexts:
+            counts.update(set((context.to_dict() or {}).get("tags") or []))
+        data = {
+            "counts": dict(counts),
+            "seeded": True,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }
+        # Increments made while counting would be lost, so count again
+        batch = db.batch()
+        if stats.exists:
+            option = db.write_option(last_update_time=stats.update_time)
+            batch.update(tag_stats_ref(db), data, option=option)
+        else:
+            batch.create(tag_stats_ref(db), data)
+        try:
+            await batch.commit()
+        except (AlreadyExists, FailedPrecondition):
+            continue
+        return dict(counts)
+    raise RuntimeError("Tag counts kept changing while being recounted")
+
+
+async def read_tag_counts(db: Any) -> Dict[str, int]:
+    """Returns the stored counts, building them on first use"""
+    stats = (await tag_stats_ref(db).get()).to_dict() or {}
+    # Increments made before the first count only hold part of the totals
+    if not stats.get("seeded"):
+        return await rebuild_tag_counts(db)
+    return stats.get("counts") or {}
+
+
+def top_tags(counts: Dict[str, int], limit: int) -> List[Tuple[str, int]]:
+    """The `limit` most used tags, ties broken alphabetically"""
+    return heapq.nsmallest(
+        limit,
+        ((tag, n) for tag, n in counts.items() if n > 0),
+        key=lambda item: (-item[1], item[0]),
+    )
+
+
+def count_tags(tag_lists: Iterable[List[str]]) -> Dict[str, int]:
+    counts: Counter = Counter()
+    for tags in tag_lists:
+        counts.update(set(tags))
+    return dict(counts)
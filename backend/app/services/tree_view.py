@@ -0,0 +1,244 @@
+"""
+Materialized tree views.
+
+A tree view is a denormalized copy of a tree's members so a whole tree can
+be served in one multi-document read. It lives in `treeViews/{tree_id}`
+(holding `version` and `shard_count`) and `treeViews/{tree_id}/shards/{n}`,
+each shard mapping member IDs to member documents under `members`.
+
+Member writes keep the view up to date incrementally and bump `version`.
+A missing view is never patched, it is rebuilt from the source collections
+on the next read or through the rebuild endpoint. A view whose shards are
+full is not patched either, so the next read rebuilds it with more shards
+and every shard stays near TREE_VIEW_MEMBERS_PER_SHARD members.
+"""
+
+import math
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from app.core.config import settings
+from app.core.constants import (
+    FAMILY_TREE,
+    PEOPLE,
+    TREE_VIEW,
+    TREE_VIEW_MEMBERS_PER_SHARD,
+    TREE_VIEW_MIN_SHARDS,
+    TREE_VIEW_SHARDS,
+)
+from app.utils.db_helpers import get_documents
+
+# Last known shard count per tree, so the view can be read in one call
+_shard_counts: Dict[str, int] = {}
+
+
+def view_ref(db: Any, tree_id: str):
+    return db.collection(TREE_VIEW).document(tree_id)
+
+
+def shard_ref(db: Any, tree_id: str, shard: int):
+    return view_ref(db, tree_id).collection(TREE_VIEW_SHARDS).document(str(shard))
+
+
+def shard_for(person_id: str, shard_count: int) -> int:
+    return zlib.crc32(person_id.encode()) % shard_count
+
+
+def view_has_room(shard_count: int, member_count: int) -> bool:
+    """Whether `member_count` members fit a view's shards without re-sharding"""
+    return member_count <= shard_count * TREE_VIEW_MEMBERS_PER_SHARD
+
+
+def member_field(person_id: str) -> str:
+    return FieldPath("members", person_id).to_api_repr()
+
+
+async def read_tree_with_view(
+    db: Any, tree_id: str
+) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """
+    Reads the tree document together with its view.
+
+    Returns the tree snapshot and the view as {"version", "members"}, or None
+    for the view when it does not exist or views are disabled. When the shard
+    count of the tree is known this is a single `get_all` call.
+    """
+    tree_ref = db.collection(FAMILY_TREE).document(tree_id)
+    if not settings.TREE_VIEWS_ENABLED:
+        return await tree_ref.get(), None
+
+    root_ref = view_ref(db, tree_id)
+    shard_count = _shard_counts.get(tree_id, 0)
+    refs = [tree_ref, root_ref] + [
+        shard_ref(db, tree_id, n) for n in range(shard_count)
+    ]
+    snapshots = {s.reference.path: s async for s in db.get_all(refs)}
+    tree, root = snapshots[tree_ref.path], snapshots[root_ref.path]
+    if not root.exists:
+        _shard_counts.pop(tree_id, None)
+        return tree, None
+
+    if root.get("shard_count") != shard_count:
+        shard_count = _shard_counts[tree_id] = root.get("shard_count")
+        refs = [shard_ref(db, tree_id, n) for n in range(shard_count)]
+        snapshots.update({s.reference.path: s async for s in db.get_all(refs)})
+
+    members: Dict[str, dict] = {}
+    for n in range(shard_count):
+        shard = snapshots.get(shard_ref(db, tree_id, n).path)
+        if shard is None or not shard.exists:
+            return tree, None
+        members.update(shard.get("members") or {})
+    return tree, {"version": root.get("version") or 0, "members": members}
+
+
+async def read_tree_version(db: Any, tree_id: str) -> Tuple[Any, int]:
+    """
+    Reads the tree document and the version of its view in one small call,
+    without touching the shards. The version is 0 when there is no view.
+    """
+    tree_ref = db.collection(FAMILY_TREE).document(tree_id)
+    if not settings.TREE_VIEWS_ENABLED:
+        return await tree_ref.get(), 0
+
+    root_ref = view_ref(db, tree_id)
+    snapshots = {s.reference.path: s async for s in db.get_all([tree_ref, root_ref])}
+    root = snapshots[root_ref.path]
+    return snapshots[tree_ref.path], (root.get("version") or 0) if root.exists else 0
+
+
+async def rebuild_tree_view(db: Any, tree_id: str, members: List[dict]) -> int:
+    """
+    Replaces the view of a tree with `members` in a single batch and returns
+    the new view version.
+    """
+    if not settings.TREE_VIEWS_ENABLED:
+        return 0
+
+    shard_count = max(
+        TREE_VIEW_MIN_SHARDS, math.ceil(len(members) / TREE_VIEW_MEMBERS_PER_SHARD)
+    )
+    shards: List[Dict[str, dict]] = [{} for _ in range(shard_count)]
+    for member in members:
+        shards[shard_for(member["id"], shard_count)][member["id"]] = member
+
+    root_ref = view_ref(db, tree_id)
+    previous = await root_ref.get()
+    # A new view starts from the clock so its versions never repeat those of
+    # a dropped view, which keeps version-derived ETags unique
+    if previous.exists:
+        version = (previous.get("version") or 0) + 1
+    else:
+        version = time.time_ns() // 1_000_000
+    batch = db.batch()
+    # Drop shards left over from a larger view
+    if previous.exists:
+        for n in range(shard_count, previous.get("shard_count") or 0):
+            batch.delete(shard_ref(db, tree_id, n))
+    for n, shard_members in enumerate(shards):
+        batch.set(shard_ref(db, tree_id, n), {"members": shard_members})
+    batch.set(
+        root_ref,
+        {
+            "tree_id": tree_id,
+            "shard_count": shard_count,
+            "version": version,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        },
+    )
+    await batch.commit()
+    _shard_counts[tree_id] = shard_count
+    return version
+
+
+async def read_tree_members(db: Any, tree_id: str) -> Tuple[Any, List[dict], int]:
+    """
+    Reads a tree with its members in tree order, served from the view.
+
+    Falls back to reading the members themselves and rebuilding the view when
+    the view is missing or its member set no longer matches the tree. Returns
+    the tree snapshot, the member documents and the view version.
+    """
+    tree, view = await read_tree_with_view(db, tree_id)
+    if not tree.exists:
+        return tree, [], 0
+
+    member_ids = [member_id for member_id in tree.get("members") or [] if member_id]
+    if view is not None and set(view["members"]) == set(member_ids):
+        return tree, [view["members"][m] for m in member_ids], view["version"]
+
+    members = await get_documents(db, PEOPLE, member_ids)
+    version = await rebuild_tree_view(db, tree_id, members)
+    return tree, members, version
+
+
+def stage_member_changes(
+    writer: Any,
+    db: Any,
+    tree_id: str,
+    shard_count: int,
+    upserts: List[dict],
+    removals: Optional[List[str]] = None,
+) -> None:
+    """
+    Adds field-level view updates for changed members to a batch or
+    transaction whose view root is known to exist.
+    """
+    changes: Dict[int, Dict[str, Any]] = {}
+    for member in upserts:
+        shard = shard_for(member["id"], shard_count)
+        changes.setdefault(shard, {})[member_field(member["id"])] = member
+    for person_id in removals or []:
+        shard = shard_for(person_id, shard_count)
+        changes.setdefault(shard, {})[member_field(person_id)] = firestore.DELETE_FIELD
+
+    for shard, fields in changes.items():
+        writer.update(shard_ref(db, tree_id, shard), fields)
+    writer.update(
+        view_ref(db, tree_id),
+        {"version": firestore.Increment(1), "updated_at": firestore.SERVER_TIMESTAMP},
+    )
+
+
+async def apply_member_changes(
+    db: Any,
+    tree_id: str,
+    upserts: List[dict],
+    removals: Optional[List[str]] = None,
+) -> None:
+    """Applies member changes to a tree's view if it has one"""
+    if not settings.TREE_VIEWS_ENABLED or not (upserts or removals):
+        return
+
+    @firestore.async_transactional
+    async def update_view(transaction):
+        root = await view_ref(db, tree_id).get(transaction=transaction)
+        if not root.exists:
+            return
+        stage_member_changes(
+            transaction,
+            db,
+            tree_id,
+            root.get("shard_count"),
+            upserts,
+            removals,
+        )
+
+    await update_view(db.transaction())
+
+
+async def delete_tree_view(db: Any, tree_id: str) -> None:
+    root_ref = view_ref(db, tree_id)
+    root = await root_ref.get()
+    if not root.exists:
+        return
+    batch = db.batch()
+    for n in range(root.get("shard_count") or 0):
+        batch.delete(shard_ref(db, tree_id, n))
+    batch.delete(root_ref)
+    await batch.commit()
+    _shard_counts.pop(tree_id, None)
@@ -0,0 +1,52 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """Packs a page position into an opaque, URL-safe token"""
+    data = {
+        key: {"$dt": value.isoformat()} if isinstance(value, datetime) else value
+        for key, value in position.items()
+    }
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, **fields: type) -> Dict[str, Any]:
+    """
+    Unpacks a token made by `encode_cursor`, raising ValueError if it is
+    invalid or lacks one of `fields`, given as name=type
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        if not isinstance(data, dict):
+            raise ValueError("Invalid cursor")
+        position = {
+            key: datetime.fromisoformat(value["$dt"])
+            if isinstance(value, dict)
+            else value
+            for key, value in data.items()
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    for key, kind in fields.items():
+        if not isinstance(position.get(key), kind):
+            raise ValueError("Invalid cursor")
+    return position
+
+
+def read_cursor(token: Optional[str], **fields: type) -> Optional[Dict[str, Any]]:
+    """Decodes a cursor query parameter, answering an invalid one with 400"""
+    if not token:
+        return None
+    try:
+        return decode_cursor(token, **fields)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List
+
+from app.core.constants import (
+    FIRESTORE_GET_ALL_CHUNK_SIZE,
+    FIRESTORE_MAX_PARALLEL_READS,
+)
+
+
+def chunked(items: List[Any], size: int) -> List[List[Any]]:
+    """Splits a list into consecutive chunks of at most `size` items."""
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+async def get_documents(
+    db: Any,
+    collection: str,
+    doc_ids: List[str],
+    chunk_size: int = FIRESTORE_GET_ALL_CHUNK_SIZE,
+) -> List[dict]:
+    """
+    Bulk loads documents by ID with multi-document reads.
+
+    IDs are split into chunks of `chunk_size`, each chunk is fetched with a
+    single `get_all` call and the chunks run concurrently. The result keeps
+    the order of `doc_ids` and skips empty IDs and missing documents.
+    """
+    ids = list(dict.fromkeys(doc_id for doc_id in doc_ids if doc_id))
+    if not ids:
+        return []
+
+    collection_ref = db.collection(collection)
+    semaphore = asyncio.Semaphore(FIRESTORE_MAX_PARALLEL_READS)
+
+    async def fetch_chunk(chunk: List[str]) -> Dict[str, dict]:
+        refs = [collection_ref.document(doc_id) for doc_id in chunk]
+        async with semaphore:
+            return {
+                snap.id: snap.to_dict()
+                async for snap in db.get_all(refs)
+                if snap.exists
+            }
+
+    found = {}
+    for result in await asyncio.gather(
+        *(fetch_chunk(chunk) for chunk in chunked(ids, chunk_size))
+    ):
+        found.update(result)
+
+    return [found[doc_id] for doc_id in ids if doc_id in found]
+
+
+async def iter_query_pages(query: Any, page_size: int) -> AsyncIterator[List[Any]]:
+    """
+    Pages through a query in document ID order with `limit` and
+    `start_after`, yielding one list of snapshots per page.
+    """
+    query = query.order_by("__name__").limit(page_size)
+    last = None
+    while True:
+        page_query = query.start_after(last) if last is not None else query
+        page = [snapshot async for snapshot in page_query.stream()]
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last = page[-1]
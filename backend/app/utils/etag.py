@@ -0,0 +1,77 @@
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Request, Response, status
+from firebase_admin import firestore
+
+from app.core.constants import FAMILY_STORY, MIGRATION_RECORDS, VERSIONS
+
+
+def make_etag(*parts: Any) -> str:
+    """Builds a strong ETag from values that change whenever the payload does"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """Checks the request's If-None-Match header against `etag`"""
+    header = request.headers.get("if-none-match")
+    if not header or not etag:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def not_modified(etag: str, cache_control: Optional[str] = None) -> Response:
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def records_version_key(user_id: str) -> str:
+    """Version of a user's migration records"""
+    return f"{MIGRATION_RECORDS}:{user_id}"
+
+
+def stories_version_key(tree_id: str) -> str:
+    """Version of a tree's family stories"""
+    return f"{FAMILY_STORY}:{tree_id}"
+
+
+def version_ref(db: Any, key: str):
+    return db.collection(VERSIONS).document(key)
+
+
+def version_of(snapshot: Any) -> int:
+    return (snapshot.get("version") or 0) if snapshot.exists else 0
+
+
+async def read_version(db: Any, key: str) -> int:
+    """Returns the current value of a version counter, 0 if never bumped"""
+    return version_of(await version_ref(db, key).get())
+
+
+async def bump_version(db: Any, key: str) -> None:
+    """Increments a version counter so cached copies of its payload go stale"""
+    await version_ref(db, key).set(
+        {"version": firestore.Increment(1), "updated_at": firestore.SERVER_TIMESTAMP},
+        merge=True,
+    )
+
+
+async def next_version(db: Any, key: str) -> int:
+    """Increments a version counter in a transaction and returns its new value"""
+    ref = version_ref(db, key)
+
+    @firestore.async_transactional
+    async def bump(transaction) -> int:
+        version = version_of(await ref.get(transaction=transaction)) + 1
+        transaction.set(
+            ref,
+            {"version": version, "updated_at": firestore.SERVER_TIMESTAMP},
+            merge=True,
+        )
+        return version
+
+    return await bump(db.transaction())
@@ -0,0 +1,386 @@
+import re
+import uuid
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# A GEDCOM line: level, optional @xref@, tag and optional value
+_LINE = re.compile(r"^\s*(\d+)\s+(?:(@[^@]+@)\s+)?(\S+)(?:\s(.*))?$")
+
+_MONTHS = {
+    month: index
+    for index, month in enumerate(
+        "JAN FEB MAR APR MAY JUN JUL AUG SEP OCT NOV DEC".split(), start=1
+    )
+}
+_DATE_QUALIFIERS = {"ABT", "ABOUT", "EST", "CAL", "BEF", "AFT", "BET", "FROM", "TO"}
+
+GedcomLine = Tuple[int, str, str]
+
+
+class GedcomRecord:
+    """A level 0 record with its nested lines as (level, tag, value) tuples"""
+
+    __slots__ = ("xref", "tag", "lines")
+
+    def __init__(self, xref: Optional[str], tag: str):
+        self.xref = xref
+        self.tag = tag
+        self.lines: List[GedcomLine] = []
+
+    def values(self, tag: str, level: int = 1) -> List[str]:
+        return [v for lvl, t, v in self.lines if lvl == level and t == tag]
+
+    def value(self, tag: str, level: int = 1) -> Optional[str]:
+        values = self.values(tag, level)
+        return values[0] if values else None
+
+    def event(self, tag: str) -> Dict[str, str]:
+        """Returns the sub-fields (DATE, PLAC, ...) of the first level 1 `tag`"""
+        fields: Dict[str, str] = {}
+        inside = False
+        for level, line_tag, value in self.lines:
+            if level == 1:
+                if inside:
+                    break
+                inside = line_tag == tag
+                if inside:
+                    fields[""] = value
+            elif inside and level == 2:
+                fields.setdefault(line_tag, value)
+        return fields
+
+    def text(self, tag: str) -> Optional[str]:
+        """Returns the first level 1 `tag` value joined with its CONT/CONC lines"""
+        parts: List[str] = []
+        inside = False
+        for level, line_tag, value in self.lines:
+            if level == 1:
+                if inside:
+                    break
+                inside = line_tag == tag
+                if inside:
+                    parts.append(value)
+            elif inside and level == 2 and line_tag in ("CONT", "CONC"):
+                parts.append(("\n" if line_tag == "CONT" else "") + value)
+        text = "".join(parts).strip()
+        # Pointers to shared NOTE records are not resolved
+        if not text or text.startswith("@"):
+            return None
+        return text
+
+
+def iter_records(stream: BinaryIO) -> Iterator[GedcomRecord]:
+    """
+    Yields GEDCOM level 0 records one at a time from a binary stream, so only
+    the current record is held in memory.
+    """
+    record: Optional[GedcomRecord] = None
+    for raw in stream:
+        line = raw.decode("utf-8-sig", errors="replace").rstrip("\r\n")
+        match = _LINE.match(line)
+        if not match:
+            continue
+        level = int(match.group(1))
+        xref, tag, value = match.group(2), match.group(3), match.group(4) or ""
+        if level == 0:
+            if record is not None:
+                yield record
+            record = GedcomRecord(xref, tag)
+        elif record is not None:
+            record.lines.append((level, tag, value))
+    if record is not None:
+        yield record
+
+
+def _date_tokens(value: str) -> List[str]:
+    """Tokens of a GEDCOM date without qualifiers, the start of a range only"""
+    tokens = [t for t in value.upper().replace(".", " ").split() if t]
+    while tokens and tokens[0] in _DATE_QUALIFIERS:
+        tokens = tokens[1:]
+    for separator in ("AND", "TO"):
+        if separator in tokens:
+            tokens = tokens[: tokens.index(separator)]
+    return tokens
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parses GEDCOM dates such as "12 JAN 1900", "JAN 1900", "ABT 1900",
+    "BET 1900 AND 1910" or "FROM 1900 TO 1910" to the earliest matching day.
+    """
+    if not value:
+        return None
+
+    day, month, year = 1, 1, None
+    for token in _date_tokens(value):
+        if token in _MONTHS:
+            month = _MONTHS[token]
+        elif token.isdigit():
+            number = int(token)
+            if len(token) <= 2 and year is None and number <= 31:
+                day = number
+            else:
+                year = number
+    if year is None:
+        return None
+    try:
+        return datetime(year, month, day)
+    except ValueError:
+        return None
+
+
+def parse_name(record: GedcomRecord) -> Tuple[str, Optional[str], str]:
+    """Returns (first name, middle names, last name) of an INDI record"""
+    name = record.value("NAME") or ""
+    given, surname = name, ""
+    if "/" in name:
+        given, _, rest = name.partition("/")
+        surname = rest.split("/")[0]
+    given = record.value("GIVN", level=2) or given
+    surname = record.value("SURN", level=2) or surname
+
+    given_names = given.split()
+    first_name = given_names[0] if given_names else "Unknown"
+    middle_name = " ".join(given_names[1:]) or None
+    return first_name, middle_name, surname.strip() or "Unknown"
+
+
+class FamilyLinks:
+    """
+    Relationships resolved from FAM records, keyed by INDI xref.
+
+    Built in a first pass over the file so that every member can be written
+    with all of its relationship fields in the second pass.
+    """
+
+    def __init__(self):
+        self.has_header = False
+        self.ids: Dict[str, str] = {}
+        self.father: Dict[str, str] = {}
+        self.mother: Dict[str, str] = {}
+        self.spouses: Dict[str, List[str]] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.siblings: Dict[str, List[str]] = {}
+
+    def add_individual(self, xref: str) -> None:
+        self.ids.setdefault(xref, str(uuid.uuid4()))
+
+    def add_family(
+        self, husband: Optional[str], wife: Optional[str], children: List[str]
+    ) -> None:
+        if husband and wife:
+            self.spouses.setdefault(husband, []).append(wife)
+            self.spouses.setdefault(wife, []).append(husband)
+        for child in children:
+            if husband:
+                self.father[child] = husband
+                self.children.setdefault(husband, []).append(child)
+            if wife:
+                self.mother[child] = wife
+                self.children.setdefault(wife, []).append(child)
+            self.siblings.setdefault(child, []).extend(
+                other for other in children if other != child
+            )
+
+    def resolve(self, xrefs: List[str]) -> List[str]:
+        return list(dict.fromkeys(self.ids[x] for x in xrefs if x in self.ids))
+
+    def relations(self, xref: str) -> dict:
+        return {
+            "father_id": self.ids.get(self.father.get(xref, "")),
+            "mother_id": self.ids.get(self.mother.get(xref, "")),
+            "spouse_id": self.resolve(self.spouses.get(xref, [])),
+            "children_id": self.resolve(self.children.get(xref, [])),
+            "sibling_id": self.resolve(self.siblings.get(xref, [])),
+        }
+
+
+def scan_families(stream: BinaryIO) -> FamilyLinks:
+    """First pass: assigns member IDs and collects FAM relationships"""
+    links = FamilyLinks()
+    for record in iter_records(stream):
+        if record.tag == "HEAD":
+            links.has_header = True
+        elif record.tag == "INDI" and record.xref:
+            links.add_individual(record.xref)
+        elif record.tag == "FAM":
+            links.add_family(
+                record.value("HUSB"), record.value("WIFE"), record.values("CHIL")
+            )
+    return links
+
+
+def iter_people(
+    stream: BinaryIO, links: FamilyLinks, tree_id: str, created_by: str
+) -> Iterator[dict]:
+    """Second pass: yields a Person-shaped dict for every INDI record"""
+    for record in iter_records(stream):
+        if record.tag != "INDI" or record.xref not in links.ids:
+            continue
+
+        first_name, middle_name, last_name = parse_name(record)
+        sex = (record.value("SEX") or "").upper()
+        birth = record.event("BIRT")
+        death = record.event("DEAT")
+        person = {
+            "id": links.ids[record.xref],
+            "first_name": first_name,
+            "middle_name": middle_name,
+            "last_name": last_name,
+            "gender": {"M": "male", "F": "female"}.get(sex),
+            "date_of_birth": parse_date(birth.get("DATE")),
+            "birth_place": birth.get("PLAC"),
+            "is_alive": not death,
+            "death_date": parse_date(death.get("DATE")),
+            "bio": record.text("NOTE"),
+            "tree_id": tree_id,
+            "created_by": created_by,
+        }
+        person.update(links.relations(record.xref))
+        yield person
+
+
+GEDCOM_HEADER = (
+    "0 HEAD\n"
+    "1 SOUR ONE-TREE\n"
+    "1 SUBM @SUBM@\n"
+    "1 GEDC\n"
+    "2 VERS 5.5.1\n"
+    "2 FORM LINEAGE-LINKED\n"
+    "1 CHAR UTF-8\n"
+    "0 @SUBM@ SUBM\n"
+    "1 NAME One Tree\n"
+)
+GEDCOM_TRAILER = "0 TRLR\n"
+
+_MONTH_NAMES = {index: month for month, index in _MONTHS.items()}
+
+
+def format_date(value: Optional[datetime]) -> Optional[str]:
+    if not isinstance(value, datetime):
+        return None
+    return f"{value.day} {_MONTH_NAMES[value.month]} {value.year}"
+
+
+def _text_lines(level: int, tag: str, text: str) -> List[str]:
+    first, *rest = text.splitlines() or [""]
+    return [f"{level} {tag} {first}".rstrip()] + [
+        f"{level + 1} CONT {line}".rstrip() for line in rest
+    ]
+
+
+def format_individual(
+    xref: str, person: dict, families: Iterable[Tuple[str, str]] = ()
+) -> str:
+    """
+    Renders a member document as a GEDCOM INDI record, with a FAMC or FAMS
+    line for every (tag, family xref) in `families`
+    """
+    given = " ".join(
+        part for part in (person.get("first_name"), person.get("middle_name")) if part
+    )
+    surname = person.get("last_name") or ""
+    lines = [
+        f"0 {xref} INDI",
+        f"1 NAME {given} /{surname}/".strip(),
+    ]
+    if given:
+        lines.append(f"2 GIVN {given}")
+    if surname:
+        lines.append(f"2 SURN {surname}")
+
+    sex = {"male": "M", "female": "F"}.get(person.get("gender") or "")
+    if sex:
+        lines.append(f"1 SEX {sex}")
+
+    birth_date = format_date(person.get("date_of_birth"))
+    if birth_date or person.get("birth_place"):
+        lines.append("1 BIRT")
+        if birth_date:
+            lines.append(f"2 DATE {birth_date}")
+        if person.get("birth_place"):
+            lines.append(f"2 PLAC {person['birth_place']}")
+
+    death_date = format_date(person.get("death_date"))
+    if death_date:
+        lines.extend(["1 DEAT", f"2 DATE {death_date}"])
+    elif person.get("is_alive") is False:
+        lines.append("1 DEAT Y")
+
+    if person.get("bio"):
+        lines.extend(_text_lines(1, "NOTE", person["bio"]))
+    lines.extend(f"1 {tag} {family}" for tag, family in families)
+    return "\n".join(lines) + "\n"
+
+
+def format_family(
+    xref: str, husband: Optional[str], wife: Optional[str], children: List[str]
+) -> str:
+    """Renders a GEDCOM FAM record from member xrefs"""
+    lines = [f"0 {xref} FAM"]
+    if husband:
+        lines.append(f"1 HUSB {husband}")
+    if wife:
+        lines.append(f"1 WIFE {wife}")
+    lines.extend(f"1 CHIL {child}" for child in children)
+    return "\n".join(lines) + "\n"
+
+
+class FamilyCollector:
+    """
+    Gathers FAM records while members are streamed out.
+
+    Only member IDs are retained: a short xref per member plus the couples
+    and their child IDs, so exports never hold whole member documents. Each
+    couple gets its family xref when first seen, so a member's FAMC and FAMS
+    lines can be written before the FAM records.
+    """
+
+    def __init__(self):
+        self.xrefs: Dict[str, str] = {}
+        self.families: Dict[str, Tuple[Optional[str], Optional[str], List[str]]] = {}
+        self._couples: Dict[frozenset, str] = {}
+
+    def xref(self, person_id: str) -> str:
+        if person_id not in self.xrefs:
+            self.xrefs[person_id] = f"@I{len(self.xrefs) + 1}@"
+        return self.xrefs[person_id]
+
+    def _family(self, husband: Optional[str], wife: Optional[str]) -> str:
+        key = frozenset(p for p in (husband, wife) if p)
+        if key not in self._couples:
+            family = f"@F{len(self._couples) + 1}@"
+            self._couples[key] = family
+            self.families[family] = (husband, wife, [])
+        return self._couples[key]
+
+    def add(self, person: dict) -> List[Tuple[str, str]]:
+        """Records a member's families, returns its (FAMC/FAMS, xref) links"""
+        person_id = person["id"]
+        links = []
+        father, mother = person.get("father_id"), person.get("mother_id")
+        if father or mother:
+            family = self._family(father, mother)
+            self.families[family][2].append(person_id)
+            links.append(("FAMC", family))
+
+        for spouse in person.get("spouse_id") or []:
+            if person.get("gender") == "female":
+                couple = (spouse, person_id)
+            elif person.get("gender") == "male":
+                couple = (person_id, spouse)
+            else:
+                couple = tuple(sorted((person_id, spouse)))
+            links.append(("FAMS", self._family(*couple)))
+        return list(dict.fromkeys(links))
+
+    def records(self) -> Iterator[str]:
+        # Every family is pointed to by a member, so all are written even
+        # when a partner is missing from the tree
+        for family, (husband, wife, children) in self.families.items():
+            yield format_family(
+                family,
+                self.xrefs.get(husband or ""),
+                self.xrefs.get(wife or ""),
+                [self.xrefs[c] for c in children if c in self.xrefs],
+            )
@@ -0,0 +1,267 @@
+"""
+Geohash keys and helpers for place queries.
+
+A geohash interleaves longitude and latitude bits into base32 characters,
+so points that share a prefix lie in the same cell and a cell is a single
+range of sorted keys. A bounding box is covered by a few cells, each read
+with one range query, and the results are then filtered exactly.
+"""
+
+import math
+from typing import List, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# (min_lat, min_lng, max_lat, max_lng)
+Box = Tuple[float, float, float, float]
+
+
+def encode(latitude: float, longitude: float, precision: int) -> str:
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def cell_box(geohash: str) -> Box:
+    """Bounds of a geohash cell"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lng_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Height and width in degrees of the cells of a precision"""
+    lng_bits = math.ceil(5 * precision / 2)
+    lat_bits = 5 * precision - lng_bits
+    return 180 / 2**lat_bits, 360 / 2**lng_bits
+
+
+def split_box(box: Box) -> List[Box]:
+    """Splits a box crossing the antimeridian (min_lng > max_lng) in two"""
+    min_lat, min_lng, max_lat, max_lng = box
+    if min_lng <= max_lng:
+        return [box]
+    return [(min_lat, min_lng, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng)]
+
+
+def _cells(box: Box, precision: int) -> List[str]:
+    min_lat, min_lng, max_lat, max_lng = box
+    height, width = cell_size(precision)
+
+    def span(low: float, high: float, origin: float, size: float, count: int):
+        first = min(int((low - origin) // size), count - 1)
+        last = min(int((high - origin) // size), count - 1)
+        return range(max(first, 0), max(last, 0) + 1)
+
+    rows = span(min_lat, max_lat, -90.0, height, round(180 / height))
+    columns = span(min_lng, max_lng, -180.0, width, round(360 / width))
+    return [
+        encode(-90.0 + (row + 0.5) * height, -180.0 + (col + 0.5) * width, precision)
+        for row in rows
+        for col in columns
+    ]
+
+
+def covering_cells(box: Box, max_cells: int, max_precision: int) -> List[str]:
+    """
+    Geohash prefixes covering a bounding box, using the finest precision
+    that needs at most `max_cells` cells
+    """
+    best = [""]
+    for precision in range(1, max_precision + 1):
+        cells = sorted({c for part in split_box(box) for c in _cells(part, precision)})
+        if len(cells) > max_cells:
+            break
+        best = cells
+    return best
+
+
+def child_cells(geohash: str, box: Box) -> List[str]:
+    """The cells one character finer than `geohash` that overlap a box"""
+    children = []
+    for char in BASE32:
+        low_lat, low_lng, high_lat, high_lng = cell_box(geohash + char)
+        for min_lat, min_lng, max_lat, max_lng in split_box(box):
+            if (
+                low_lat <= max_lat
+                and min_lat <= high_lat
+                and low_lng <= max_lng
+                and min_lng <= high_lng
+            ):
+                children.append(geohash + char)
+                break
+    return children
+
+
+def located(event: dict) -> bool:
+    """Whether an event has both coordinates"""
+    return event.get("latitude") is not None and event.get("longitude") is not None
+
+
+def in_box(latitude: float, longitude: float, box: Box) -> bool:
+    min_lat, min_lng, max_lat, max_lng = box
+    if not min_lat <= latitude <= max_lat:
+        return False
+    if min_lng <= max_lng:
+        return min_lng <= longitude <= max_lng
+    return longitude >= min_lng or longitude <= max_lng
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_box(latitude: float, longitude: float, radius_km: float) -> Box:
+    """Bounding box of a circle, all longitudes when it reaches a pole"""
+    d_lat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = latitude - d_lat, latitude + d_lat
+    if min_lat <= -90 or max_lat >= 90:
+        return (max(min_lat, -90.0), -180.0, min(max_lat, 90.0), 180.0)
+    d_lng = math.degrees(
+        math.asin(
+            min(1.0, math.sin(math.radians(d_lat)) / math.cos(math.radians(latitude)))
+        )
+    )
+    min_lng, max_lng = longitude - d_lng, longitude + d_lng
+    if d_lng >= 180:
+        return (min_lat, -180.0, max_lat, 180.0)
+    # Wrap around the antimeridian, split_box handles min_lng > max_lng
+    if min_lng < -180:
+        min_lng += 360
+    if max_lng > 180:
+        max_lng -= 360
+    return (min_lat, min_lng, max_lat, max_lng)
+
+
+# Latitude limit of Web Mercator, where the map becomes square
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def mercator(latitude: float, longitude: float) -> Tuple[float, float]:
+    """
+    Web Mercator position, (0, 0) at the top left of the world and (1, 1)
+    at the bottom right
+    """
+    latitude = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, latitude))
+    sin_lat = math.sin(math.radians(latitude))
+    x = (longitude + 180) / 360
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def _segment_distance(point, start, end) -> float:
+    (px, py), (ax, ay), (bx, by) = point, start, end
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def simplify(points: List[Tuple[float, float]], tolerance: float) -> list:
+    """
+    Douglas-Peucker line simplification, keeping the points that lie more
+    than `tolerance` from the simplified line
+    """
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        farthest, distance = first, 0.0
+        for i in range(first + 1, last):
+            d = _segment_distance(points[i], points[first], points[last])
+            if d > distance:
+                farthest, distance = i, d
+        if distance > tolerance:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def _clip_segment(
+    start: Tuple[float, float], end: Tuple[float, float], low: float, high: float
+) -> Tuple[float, float]:
+    """
+    Liang-Barsky: the fractions of a segment where it enters and leaves the
+    square, with the first greater than the second when it misses it
+    """
+    (x0, y0), (x1, y1) = start, end
+    dx, dy = x1 - x0, y1 - y0
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x0 - low), (dx, high - x0), (-dy, y0 - low), (dy, high - y0)):
+        if p == 0:
+            if q < 0:
+                return 1.0, 0.0
+        elif p < 0:
+            t0 = max(t0, q / p)
+        else:
+            t1 = min(t1, q / p)
+    return t0, t1
+
+
+def clip_line(
+    points: List[Tuple[float, float]], low: float, high: float
+) -> List[List[Tuple[float, float]]]:
+    """
+    Parts of a line inside the square from `low` to `high` on both axes,
+    clipping each segment with Liang-Barsky
+    """
+    parts: List[List[Tuple[float, float]]] = []
+    part: List[Tuple[float, float]] = []
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        t0, t1 = _clip_segment((x0, y0), (x1, y1), low, high)
+        # A segment that misses the square, or re-enters it, starts a new part
+        if part and (t0 > t1 or t0 > 0):
+            parts.append(part)
+            part = []
+        if t0 > t1:
+            continue
+        dx, dy = x1 - x0, y1 - y0
+        if not part:
+            part = [(x0 + t0 * dx, y0 + t0 * dy)]
+        part.append((x0 + t1 * dx, y0 + t1 * dy))
+        if t1 < 1:
+            parts.append(part)
+            part = []
+    if part:
+        parts.append(part)
+    return parts
@@ -0,0 +1,158 @@
+"""
+Responsive image derivatives.
+
+Uploaded images are resized to a few width buckets and re-encoded as WebP,
+and AVIF when Pillow supports it, in a process pool so encoding never holds
+the event loop or the GIL of the API process. Variants are stored next to
+the original and described by a srcset per MIME type, ready for
+`<picture><source type=... srcset=...>`.
+"""
+
+import asyncio
+import io
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import UploadFile
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+from app.core.constants import IMAGE_MAX_SOURCE_SIZE, IMAGE_QUALITY, IMAGE_WIDTHS
+from app.utils.storage import delete_media, upload_bytes
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"WEBP": ("image/webp", "webp"), "AVIF": ("image/avif", "avif")}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def make_derivatives(data: bytes) -> List[Tuple[str, int, bytes]]:
+    """
+    Returns (format, width, encoded bytes) for every width bucket smaller
+    than the source image, and the source width itself, in each format.
+    Runs in a worker process.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+    widths = sorted({w for w in IMAGE_WIDTHS if w < image.width} | {image.width})
+    widths = [w for w in widths if w <= max(IMAGE_WIDTHS)]
+    Image.init()  # registers every encoder, not just the common ones
+    formats = [f for f in FORMATS if f in Image.SAVE]
+
+    derivatives = []
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        for image_format in formats:
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, quality=IMAGE_QUALITY)
+            derivatives.append((image_format, width, buffer.getvalue()))
+    return derivatives
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def parse_srcset(value: str) -> List[Tuple[str, str]]:
+    """Splits a srcset string into (URL, descriptor) candidates"""
+    candidates = (candidate.strip() for candidate in value.split(","))
+    return [tuple(c.partition(" ")[::2]) for c in candidates if c]
+
+
+def srcset_urls(srcset: Optional[Dict[str, str]]) -> List[str]:
+    """Returns the variant URLs listed in an image srcset mapping"""
+    return [url for value in (srcset or {}).values() for url, _ in parse_srcset(value)]
+
+
+def replace_srcset_urls(srcset: Dict[str, str], urls: Dict[str, str]) -> Dict[str, str]:
+    """Rewrites the URLs of an image srcset mapping through `urls`"""
+    return {
+        mime: ", ".join(
+            f"{urls.get(url, url)} {descriptor}".strip()
+            for url, descriptor in parse_srcset(value)
+        )
+        for mime, value in srcset.items()
+    }
+
+
+async def read_image(file: Optional[UploadFile]) -> Optional[bytes]:
+    """Reads an uploaded image for processing, None if absent or too large"""
+    if file is None or (file.size is not None and file.size > IMAGE_MAX_SOURCE_SIZE):
+        return None
+    await file.seek(0)
+    data = await file.read(IMAGE_MAX_SOURCE_SIZE + 1)
+    return data if len(data) <= IMAGE_MAX_SOURCE_SIZE else None
+
+
+async def build_image_srcset(
+    data: Optional[bytes], filename: str, folder: str
+) -> Optional[Dict[str, str]]:
+    """
+    Stores resized WebP/AVIF variants of an image under `folder` and
+    returns their srcset per MIME type.
+
+    Variants are optional: when the image cannot be decoded or stored this
+    returns None, after removing any variants already stored, and the
+    original upload is kept on its own.
+    """
+    if data is None:
+        return None
+
+    loop = asyncio.get_running_loop()
+    try:
+        derivatives = await loop.run_in_executor(get_pool(), make_derivatives, data)
+    except Exception as e:
+        logger.warning(f"Skipping image variants for {filename}: {e}")
+        return None
+
+    # srcset candidates are comma and space separated, keep names plain
+    stem = re.sub(r"[^\w.-]", "_", os.path.splitext(os.path.basename(filename))[0])
+    stem = stem or "image"
+    uploads = {
+        f"{folder}/{stem}-{width}w.{FORMATS[image_format][1]}": (
+            encoded,
+            FORMATS[image_format][0],
+        )
+        for image_format, width, encoded in derivatives
+    }
+    results = await asyncio.gather(
+        *(
+            upload_bytes(encoded, name, mime)
+            for name, (encoded, mime) in uploads.items()
+        ),
+        return_exceptions=True,
+    )
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        logger.warning(f"Skipping image variants for {filename}: {errors[0]}")
+        await asyncio.gather(
+            *(
+                delete_media(name)
+                for name, result in zip(uploads, results)
+                if not isinstance(result, BaseException)
+            ),
+            return_exceptions=True,
+        )
+        return None
+
+    srcset: Dict[str, List[str]] = {}
+    for url, (image_format, width, _) in zip(results, derivatives):
+        srcset.setdefault(FORMATS[image_format][0], []).append(f"{url} {width}w")
+    return {mime: ", ".join(candidates) for mime, candidates in srcset.items()}
@@ -0,0 +1,135 @@
+"""
+Mapbox Vector Tile encoding.
+
+Tiles are written directly as the protobuf messages of the vector tile
+specification 2.1: a tile holds named layers, a layer holds features
+with integer geometry in tile units and their properties as indexes into
+the layer's shared key and value tables.
+"""
+
+import struct
+from typing import Any, Dict, Hashable, List, Sequence, Tuple
+
+POINT = 1
+LINESTRING = 2
+
+MOVE_TO = 1
+LINE_TO = 2
+
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint(field << 3 | wire_type)
+
+
+def _message(field: int, data: bytes) -> bytes:
+    return _key(field, LENGTH_DELIMITED) + _varint(len(data)) + data
+
+
+def _packed(field: int, values: Sequence[int]) -> bytes:
+    return _message(field, b"".join(_varint(v) for v in values))
+
+
+def _value(value: Any) -> bytes:
+    if isinstance(value, bool):
+        return _key(7, VARINT) + _varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return _key(5, VARINT) + _varint(value)
+        return _key(6, VARINT) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, FIXED64) + struct.pack("<d", value)
+    return _message(1, str(value).encode())
+
+
+def _command(command: int, count: int) -> int:
+    return (command & 0x7) | (count << 3)
+
+
+def encode_geometry(geometry_type: int, geometry: Sequence[Any]) -> List[int]:
+    """
+    Command stream of a set of points, or of the parts of a line, with
+    coordinates as zigzag encoded deltas
+    """
+    commands: List[int] = []
+    cursor_x = cursor_y = 0
+
+    def moves(points: Sequence[Tuple[int, int]]) -> None:
+        nonlocal cursor_x, cursor_y
+        for x, y in points:
+            commands.append(_zigzag(x - cursor_x))
+            commands.append(_zigzag(y - cursor_y))
+            cursor_x, cursor_y = x, y
+
+    if geometry_type == POINT:
+        commands.append(_command(MOVE_TO, len(geometry)))
+        moves(geometry)
+    else:
+        for line in geometry:
+            commands.append(_command(MOVE_TO, 1))
+            moves(line[:1])
+            commands.append(_command(LINE_TO, len(line) - 1))
+            moves(line[1:])
+    return commands
+
+
+class Layer:
+    def __init__(self, name: str, extent: int):
+        self.name = name
+        self.extent = extent
+        self.features: List[bytes] = []
+        self._keys: Dict[str, int] = {}
+        self._values: Dict[Hashable, int] = {}
+
+    def _tags(self, properties: Dict[str, Any]) -> List[int]:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            # Typed, so that 1, 1.0 and True stay distinct values
+            value_key = (type(value).__name__, value)
+            tags.append(self._keys.setdefault(key, len(self._keys)))
+            tags.append(self._values.setdefault(value_key, len(self._values)))
+        return tags
+
+    def add(
+        self,
+        geometry_type: int,
+        geometry: Sequence[Any],
+        properties: Dict[str, Any],
+    ) -> None:
+        """Adds a feature, `geometry` being points or the parts of a line"""
+        feature = _packed(2, self._tags(properties))
+        feature += _key(3, VARINT) + _varint(geometry_type)
+        feature += _packed(4, encode_geometry(geometry_type, geometry))
+        self.features.append(feature)
+
+    def encode(self) -> bytes:
+        data = _key(15, VARINT) + _varint(2)
+        data += _message(1, self.name.encode())
+        data += b"".join(_message(2, feature) for feature in self.features)
+        data += b"".join(_message(3, key.encode()) for key in self._keys)
+        data += b"".join(_message(4, _value(value)) for _, value in self._values)
+        data += _key(5, VARINT) + _varint(self.extent)
+        return data
+
+
+def encode_tile(layers: List[Layer]) -> bytes:
+    """A tile of the layers that have features"""
+    return b"".join(_message(3, layer.encode()) for layer in layers if layer.features)
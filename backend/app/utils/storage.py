@@ -0,0 +1,248 @@
+"""
+Media storage backends.
+
+Uploads are streamed from the request's spooled file in chunks and run in
+the threadpool, so several files can upload at once without blocking the
+event loop. The backend is picked with `STORAGE_BACKEND`: "gcs" for the
+Firebase bucket or "local" for a directory on disk. With `PRIVATE_MEDIA`
+files are not made public and are served through signed URLs instead.
+"""
+
+import asyncio
+import io
+import shutil
+from abc import ABC, abstractmethod
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from firebase_admin import storage
+from google.api_core.exceptions import NotFound
+
+from app.core.config import settings
+
+
+class MediaTooLargeError(ValueError):
+    pass
+
+
+class LimitedReader:
+    """File wrapper that fails once more than `limit` bytes have been read"""
+
+    def __init__(self, raw: BinaryIO, limit: int):
+        self.raw = raw
+        self.limit = limit
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.raw.read(size)
+        self.bytes_read += len(chunk)
+        if self.bytes_read > self.limit:
+            raise MediaTooLargeError(
+                f"File is larger than the {self.limit // (1024 * 1024)} MB limit"
+            )
+        return chunk
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        # Retried chunks are read again from the rewound position
+        self.bytes_read = self.raw.seek(offset, whence)
+        return self.bytes_read
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.raw, name)
+
+
+class StorageBackend(ABC):
+    @abstractmethod
+    def upload(
+        self,
+        stream: BinaryIO,
+        name: str,
+        content_type: Optional[str],
+        public: bool = True,
+    ) -> str:
+        """
+        Stores `stream` under `name` and returns its URL, which only grants
+        access when `public` and otherwise identifies the file for `sign`
+        """
+
+    @abstractmethod
+    def sign(self, name: str, expires: datetime) -> str:
+        """Returns a URL granting read access to `name` until `expires`"""
+
+    @abstractmethod
+    def delete(self, name: str) -> None:
+        """Removes `name`, doing nothing if it does not exist"""
+
+    @abstractmethod
+    def blob_name(self, url: str) -> Optional[str]:
+        """Returns the name of a stored file from its URL, None if not ours"""
+
+
+class GCSStorage(StorageBackend):
+    """Firebase Storage bucket, with resumable uploads sent in chunks"""
+
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+
+    def upload(
+        self,
+        stream: BinaryIO,
+        name: str,
+        content_type: Optional[str],
+        public: bool = True,
+    ) -> str:
+        blob = storage.bucket().blob(name, chunk_size=self.chunk_size)
+        blob.upload_from_file(stream, content_type=content_type)
+        if public:
+            blob.make_public()
+        return blob.public_url
+
+    def sign(self, name: str, expires: datetime) -> str:
+        return (
+            storage.bucket()
+            .blob(name)
+            .generate_signed_url(version="v4", expiration=expires)
+        )
+
+    def delete(self, name: str) -> None:
+        try:
+            storage.bucket().blob(name).delete()
+        except NotFound:
+            # Already gone, deletes are retried by background jobs
+            pass
+
+    def blob_name(self, url: str) -> Optional[str]:
+        bucket_name = storage.bucket().name
+        path_parts = urlparse(url).path.lstrip("/").split("/")
+        if bucket_name not in path_parts:
+            return None
+        index = path_parts.index(bucket_name) + 1
+        return unquote("/".join(path_parts[index:]))
+
+
+class LocalStorage(StorageBackend):
+    """Directory on disk, for development, tests and benchmarks"""
+
+    def __init__(self, root: str, base_url: str, chunk_size: int):
+        self.root = Path(root).resolve()
+        self.base_url = base_url.rstrip("/")
+        self.chunk_size = chunk_size
+
+    def _path(self, name: str) -> Path:
+        path = (self.root / name).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"Invalid storage path: {name}")
+        return path
+
+    def upload(
+        self,
+        stream: BinaryIO,
+        name: str,
+        content_type: Optional[str],
+        public: bool = True,
+    ) -> str:
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(path, "wb") as destination:
+                shutil.copyfileobj(stream, destination, self.chunk_size)
+        except BaseException:
+            path.unlink(missing_ok=True)
+            raise
+        return f"{self.base_url}/{name}"
+
+    def sign(self, name: str, expires: datetime) -> str:
+        # Nothing checks the expiry locally, it only mirrors the GCS URL shape
+        return f"{self.base_url}/{name}?expires={int(expires.timestamp())}"
+
+    def delete(self, name: str) -> None:
+        self._path(name).unlink(missing_ok=True)
+
+    def blob_name(self, url: str) -> Optional[str]:
+        prefix = f"{self.base_url}/"
+        return url[len(prefix) :] if url.startswith(prefix) else None
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(
+            settings.LOCAL_STORAGE_PATH,
+            settings.LOCAL_STORAGE_URL,
+            settings.UPLOAD_CHUNK_SIZE,
+        )
+    return GCSStorage(settings.UPLOAD_CHUNK_SIZE)
+
+
+async def upload_media(file: UploadFile, name: str) -> str:
+    """Streams an upload to storage off the event loop, enforcing the size limit"""
+    limit = settings.MAX_UPLOAD_SIZE
+    if file.size is not None and file.size > limit:
+        raise MediaTooLargeError(
+            f"{file.filename} is larger than the {limit // (1024 * 1024)} MB limit"
+        )
+    await file.seek(0)
+    return await run_in_threadpool(
+        get_storage().upload,
+        LimitedReader(file.file, limit),
+        name,
+        file.content_type,
+        not settings.PRIVATE_MEDIA,
+    )
+
+
+async def upload_bytes(data: bytes, name: str, content_type: str) -> str:
+    """Stores generated content, such as image variants, off the event loop"""
+    return await run_in_threadpool(
+        get_storage().upload,
+        io.BytesIO(data),
+        name,
+        content_type,
+        not settings.PRIVATE_MEDIA,
+    )
+
+
+async def delete_media(name: str) -> None:
+    await run_in_threadpool(get_storage().delete, name)
+
+
+async def upload_many(uploads: Dict[str, Tuple[UploadFile, str]]) -> Dict[str, str]:
+    """
+    Uploads several files concurrently, returning their URLs by key.
+
+    If any upload fails the ones that finished are deleted again and the
+    first error is raised.
+    """
+    keys = list(uploads)
+    results = await asyncio.gather(
+        *(upload_media(*uploads[key]) for key in keys), return_exceptions=True
+    )
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        await asyncio.gather(
+            *(
+                delete_media(uploads[key][1])
+                for key, result in zip(keys, results)
+                if not isinstance(result, BaseException)
+            ),
+            return_exceptions=True,
+        )
+        raise errors[0]
+    return dict(zip(keys, results))
+
+
+async def delete_urls(urls: List[str]) -> None:
+    """Deletes stored files by URL concurrently, raising on foreign URLs"""
+    backend = get_storage()
+    names = []
+    for url in urls:
+        name = backend.blob_name(url)
+        if name is None:
+            raise Exception(f"Invalid Storage URL format: {url}")
+        names.append(name)
+    await asyncio.gather(*(delete_media(name) for name in names))
@@ -0,0 +1,112 @@
+import pytest
+
+from app.services.family_graph import CHILD, PARENT, SPOUSE, FamilyGraph
+
+
+def person(pid, gender, **links):
+    return {"id": pid, "first_name": pid.title(), "gender": gender, **links}
+
+
+@pytest.fixture
+def graph():
+    return FamilyGraph(
+        [
+            person("grandpa", "male", spouse_id=["grandma"]),
+            person("grandma", "female", children_id=["dad", "aunt"]),
+            person("dad", "male", father_id="grandpa", spouse_id=["mum"]),
+            person("aunt", "female", father_id="grandpa", mother_id="grandma"),
+            person("mum", "female", children_id=["me", "brother"]),
+            person("me", "female", father_id="dad", spouse_id=["husband"]),
+            person("brother", "male", father_id="dad", mother_id="mum"),
+            person("cousin", "male", mother_id="aunt"),
+            person("cousin_kid", "female", father_id="cousin"),
+            person("son", "male", mother_id="me"),
+            person("husband", "male"),
+            person("stranger", None, spouse_id=["unknown"]),
+        ]
+    )
+
+
+def test_links_from_either_side_fill_the_csr_arrays(graph):
+    def ids(nodes):
+        return sorted(graph.ids[node] for node in nodes)
+
+    me = graph.node("me")
+    # Children only listed on the parent's side still get a parent slot
+    assert ids(graph.parents(me)) == ["dad", "mum"]
+    assert ids(graph.children(graph.node("grandma"))) == ["aunt", "dad"]
+    assert ids(graph.siblings(me)) == ["brother"]
+    assert ids(graph.spouses(graph.node("husband"))) == ["me"]
+    # Unknown IDs are dropped rather than linked
+    assert ids(graph.spouses(graph.node("stranger"))) == []
+    assert len(graph.child_offsets) == len(graph) + 1
+    assert graph.names[me] == "Me"
+
+
+def test_ancestors_and_descendants_by_generation(graph):
+    ancestors = {
+        graph.ids[node]: generation
+        for node, generation in graph.ancestors(graph.node("son"))
+    }
+    assert ancestors == {"me": 1, "dad": 2, "mum": 2, "grandpa": 3, "grandma": 3}
+    nearest = graph.descendants(graph.node("grandpa"), max_generations=1)
+    assert sorted(graph.ids[node] for node, _ in nearest) == ["aunt", "dad"]
+
+
+@pytest.mark.parametrize(
+    "source, target, expected",
+    [
+        ("me", "me", "self"),
+        ("me", "dad", "father"),
+        ("me", "grandma", "grandmother"),
+        ("son", "grandpa", "great-grandfather"),
+        ("grandpa", "son", "great-grandson"),
+        ("me", "brother", "brother"),
+        ("me", "aunt", "aunt"),
+        ("aunt", "me", "niece"),
+        ("me", "cousin", "first cousin"),
+        ("me", "cousin_kid", "first cousin once removed"),
+        ("son", "cousin_kid", "second cousin"),
+        ("me", "husband", "husband"),
+        ("husband", "dad", "father-in-law"),
+        ("dad", "husband", "son-in-law"),
+        ("husband", "aunt", "spouse's aunt"),
+        ("me", "stranger", "not related"),
+    ],
+)
+def test_kinship(graph, source, target, expected):
+    assert graph.kinship(graph.node(source), graph.node(target)) == expected
+
+
+def test_half_siblings():
+    graph = FamilyGraph(
+        [
+            person("father", "male"),
+            person("first", "female"),
+            person("second", "female"),
+            person("a", "male", father_id="father", mother_id="first"),
+            person("b", "female", father_id="father", mother_id="second"),
+        ]
+    )
+    assert graph.kinship(graph.node("a"), graph.node("b")) == "half-sister"
+
+
+def test_shortest_path(graph):
+    path = graph.shortest_path(graph.node("husband"), graph.node("grandpa"))
+    assert [(graph.ids[node], relation) for node, relation in path] == [
+        ("husband", "self"),
+        ("me", SPOUSE),
+        ("dad", PARENT),
+        ("grandpa", PARENT),
+    ]
+    down = graph.shortest_path(graph.node("dad"), graph.node("son"))
+    assert [relation for _, relation in down] == ["self", CHILD, CHILD]
+    assert graph.shortest_path(graph.node("me"), graph.node("stranger")) is None
+
+
+def test_empty_graph():
+    graph = FamilyGraph([])
+    assert len(graph) == 0
+    assert list(graph.child_offsets) == [0]
+    with pytest.raises(KeyError):
+        graph.node("missing")
@@ -0,0 +1,173 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from app.utils.gedcom import (
+    GEDCOM_HEADER,
+    GEDCOM_TRAILER,
+    FamilyCollector,
+    format_date,
+    format_individual,
+    iter_people,
+    iter_records,
+    parse_date,
+    scan_families,
+)
+
+SAMPLE = b"""\xef\xbb\xbf0 HEAD
+1 CHAR UTF-8
+0 @I1@ INDI
+1 NAME John Paul /Smith/
+1 SEX M
+1 BIRT
+2 DATE 12 JAN 1900
+2 PLAC Leeds, England
+1 DEAT
+2 DATE ABT 1970
+0 @I2@ INDI
+1 NAME Mary /Jones/
+2 GIVN Mary Ann
+1 SEX F
+1 NOTE First line
+2 CONT second line
+0 @I3@ INDI
+1 NAME /Smith/
+1 BIRT
+2 DATE not a date
+this line is not GEDCOM
+0 @F1@ FAM
+1 HUSB @I1@
+1 WIFE @I2@
+1 CHIL @I3@
+1 CHIL @I9@
+0 TRLR
+"""
+
+
+def import_people(data: bytes):
+    links = scan_families(io.BytesIO(data))
+    people = list(iter_people(io.BytesIO(data), links, "tree", "user"))
+    return {person["id"]: person for person in people}, links
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("12 JAN 1900", datetime(1900, 1, 12)),
+        ("12 jan. 1900", datetime(1900, 1, 12)),
+        ("JAN 1900", datetime(1900, 1, 1)),
+        ("1900", datetime(1900, 1, 1)),
+        ("ABT 1900", datetime(1900, 1, 1)),
+        ("BEF 3 MAR 1850", datetime(1850, 3, 3)),
+        ("BET 1900 AND 1910", datetime(1900, 1, 1)),
+        ("FROM 1 FEB 1800 TO 1810", datetime(1800, 2, 1)),
+    ],
+)
+def test_parse_date(value, expected):
+    assert parse_date(value) == expected
+
+
+@pytest.mark.parametrize(
+    "value", [None, "", "   ", "JAN", "ABT", "not a date", "31 FEB 1900", "12 JAN"]
+)
+def test_parse_date_malformed(value):
+    assert parse_date(value) is None
+
+
+def test_iter_records_skips_malformed_lines():
+    records = list(iter_records(io.BytesIO(SAMPLE)))
+    assert [(record.xref, record.tag) for record in records] == [
+        (None, "HEAD"),
+        ("@I1@", "INDI"),
+        ("@I2@", "INDI"),
+        ("@I3@", "INDI"),
+        ("@F1@", "FAM"),
+        (None, "TRLR"),
+    ]
+    assert records[1].event("BIRT") == {
+        "": "",
+        "DATE": "12 JAN 1900",
+        "PLAC": "Leeds, England",
+    }
+    assert records[2].text("NOTE") == "First line\nsecond line"
+
+
+def test_import_people():
+    people, links = import_people(SAMPLE)
+    assert links.has_header
+    john, mary, child = (people[links.ids[x]] for x in ("@I1@", "@I2@", "@I3@"))
+
+    assert (john["first_name"], john["middle_name"], john["last_name"]) == (
+        "John",
+        "Paul",
+        "Smith",
+    )
+    assert john["gender"] == "male"
+    assert john["date_of_birth"] == datetime(1900, 1, 12)
+    assert john["birth_place"] == "Leeds, England"
+    assert john["is_alive"] is False
+    assert john["death_date"] == datetime(1970, 1, 1)
+    assert john["spouse_id"] == [mary["id"]]
+    assert john["children_id"] == [child["id"]]
+
+    assert (mary["first_name"], mary["middle_name"]) == ("Mary", "Ann")
+    assert mary["bio"] == "First line\nsecond line"
+    assert mary["is_alive"] is True
+
+    # Unknown names and dates are kept as placeholders, not errors
+    assert (child["first_name"], child["last_name"]) == ("Unknown", "Smith")
+    assert child["date_of_birth"] is None
+    assert (child["father_id"], child["mother_id"]) == (john["id"], mary["id"])
+    # The missing @I9@ child is dropped from the relations
+    assert child["sibling_id"] == []
+
+
+def test_import_empty_file():
+    people, links = import_people(b"")
+    assert people == {}
+    assert links.ids == {}
+    assert not links.has_header
+
+
+def test_export_round_trip():
+    people, _ = import_people(SAMPLE)
+    families = FamilyCollector()
+    chunks = [GEDCOM_HEADER]
+    for person in people.values():
+        links = families.add(person)
+        chunks.append(format_individual(families.xref(person["id"]), person, links))
+    chunks.extend(families.records())
+    chunks.append(GEDCOM_TRAILER)
+
+    exported = "".join(chunks).encode()
+    assert exported.count(b" FAM\n") == 1
+    head, *rest = iter_records(io.BytesIO(exported))
+    records = {r.xref: r for r in rest}
+    assert head.value("SUBM") == "@SUBM@"
+    assert records["@SUBM@"].tag == "SUBM"
+    assert records["@SUBM@"].value("NAME")
+
+    # Members point back to the family records they belong to
+    family = next(r for r in records.values() if r.tag == "FAM")
+    assert len(family.lines) == 3
+    for tag, members in (("FAMS", ("HUSB", "WIFE")), ("FAMC", ("CHIL",))):
+        for member in (x for t in members for x in family.values(t)):
+            assert records[member].values(tag) == [family.xref]
+
+    reimported, links = import_people(exported)
+    by_xref = {families.xrefs[pid]: person for pid, person in people.items()}
+    for xref, person in by_xref.items():
+        again = reimported[links.ids[xref]]
+        for field in ("first_name", "middle_name", "last_name", "gender", "bio"):
+            assert again[field] == person[field]
+        assert again["date_of_birth"] == person["date_of_birth"]
+        assert again["is_alive"] == person["is_alive"]
+        assert len(again["children_id"]) == len(person["children_id"])
+        assert len(again["spouse_id"]) == len(person["spouse_id"])
+
+
+def test_format_date():
+    assert format_date(datetime(1900, 1, 12)) == "12 JAN 1900"
+    assert format_date(None) is None
+    assert format_date("1900-01-12") is None
@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+from app.utils.geo import (
+    cell_box,
+    child_cells,
+    covering_cells,
+    encode,
+    haversine_km,
+    in_box,
+    radius_box,
+    split_box,
+)
+
+BOXES = [
+    (51.2, -0.6, 51.8, 0.4),
+    (-35.0, 140.0, -30.0, 155.0),
+    (-10.0, 170.0, 10.0, -170.0),
+    (60.0, 179.9, 61.0, -179.9),
+    (-90.0, -180.0, 90.0, 180.0),
+]
+
+
+def random_point(box, rng):
+    min_lat, min_lng, max_lat, max_lng = box
+    if min_lng > max_lng:
+        max_lng += 360
+    longitude = rng.uniform(min_lng, max_lng)
+    if longitude > 180:
+        longitude -= 360
+    return rng.uniform(min_lat, max_lat), longitude
+
+
+def test_encode():
+    assert encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert encode(-90.0, -180.0, 3) == "000"
+
+
+def test_cell_box_contains_its_points():
+    rng = random.Random(1)
+    for _ in range(200):
+        latitude, longitude = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        min_lat, min_lng, max_lat, max_lng = cell_box(encode(latitude, longitude, 6))
+        assert min_lat <= latitude <= max_lat
+        assert min_lng <= longitude <= max_lng
+
+
+@pytest.mark.parametrize("box", BOXES)
+def test_covering_cells_cover_every_point(box):
+    cells = covering_cells(box, max_cells=16, max_precision=7)
+    assert 0 < len(cells) <= 16
+    rng = random.Random(2)
+    for _ in range(500):
+        geohash = encode(*random_point(box, rng), 7)
+        assert any(geohash.startswith(cell) for cell in cells)
+
+
+def test_covering_cells_across_the_antimeridian():
+    box = (-10.0, 170.0, 10.0, -170.0)
+    cells = covering_cells(box, max_cells=16, max_precision=7)
+    sides = {cell_box(cell)[1] < 0 for cell in cells}
+    assert sides == {True, False}
+    # Nothing from the far side of the world is read
+    assert not any(cell.startswith(encode(0.0, 0.0, 1)) for cell in cells)
+
+
+def test_covering_cells_of_a_point_use_the_finest_precision():
+    assert covering_cells((10.0, 20.0, 10.0, 20.0), 4, 6) == [encode(10.0, 20.0, 6)]
+
+
+def test_child_cells():
+    box = (51.2, -0.6, 51.8, 0.4)
+    [cell] = covering_cells(box, max_cells=1, max_precision=9)
+    children = child_cells(cell, box)
+    assert 0 < len(children) <= 32
+    assert all(child[:-1] == cell for child in children)
+    rng = random.Random(3)
+    for _ in range(200):
+        geohash = encode(*random_point(box, rng), 8)
+        assert any(geohash.startswith(child) for child in children)
+
+
+def test_split_box_and_in_box():
+    assert split_box((0.0, 10.0, 1.0, 20.0)) == [(0.0, 10.0, 1.0, 20.0)]
+    box = (-10.0, 170.0, 10.0, -170.0)
+    assert split_box(box) == [
+        (-10.0, 170.0, 10.0, 180.0),
+        (-10.0, -180.0, 10.0, -170.0),
+    ]
+    assert in_box(0.0, 175.0, box)
+    assert in_box(0.0, -175.0, box)
+    assert not in_box(0.0, 0.0, box)
+    assert not in_box(20.0, 175.0, box)
+
+
+def test_radius_box():
+    min_lat, min_lng, max_lat, max_lng = radius_box(0.0, 179.0, 500)
+    # Wraps around the antimeridian instead of going past 180
+    assert min_lng > max_lng
+    assert in_box(0.0, -178.0, (min_lat, min_lng, max_lat, max_lng))
+    assert radius_box(89.0, 0.0, 500)[1:4:2] == (-180.0, 180.0)
+    assert haversine_km(0.0, 0.0, 0.0, 1.0) == pytest.approx(111.2, abs=0.1)
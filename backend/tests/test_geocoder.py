@@ -0,0 +1,147 @@
+import pytest
+
+from app.services.geocoder import Gazetteer, Place, fill_coordinates, geocode, normalize
+
+
+@pytest.fixture
+def gazetteer():
+    rows = [
+        (Place("Jamaica", "JM", "country", 18.1, -77.3, 2800000), []),
+        (Place("Canada", "CA", "country", 56.1, -106.3, 40000000), []),
+        (Place("France", "FR", "country", 46.2, 2.2, 68000000), []),
+        (Place("Portugal", "PT", "country", 39.4, -8.2, 10300000), []),
+        (Place("Ontario", "CA", "region", 51.3, -85.3, 15000000), ["ON"]),
+        (Place("Kingston", "JM", "city", 17.97, -76.79, 670000), []),
+        (Place("Kingston", "CA", "city", 44.23, -76.49, 130000), []),
+        (Place("Paris", "FR", "city", 48.86, 2.35, 2100000), []),
+        (Place("Port Harcourt", "NG", "city", 4.82, 7.05, 3200000), []),
+        (Place("Port of Spain", "TT", "city", 10.65, -61.5, 37000), []),
+        (Place("Johannesburg", "ZA", "city", -26.2, 28.05, 5600000), ["Joburg"]),
+        (Place("São Paulo", "BR", "city", -23.55, -46.63, 12300000), []),
+    ]
+    return Gazetteer([place for place, _ in rows], [names for _, names in rows])
+
+
+def where(place):
+    return None if place is None else (place.name, place.country)
+
+
+def test_normalize():
+    assert normalize("  São-Paulo,  BRAZIL ") == "sao paulo brazil"
+    assert normalize("") == ""
+
+
+@pytest.mark.parametrize(
+    "location, expected",
+    [
+        ("Paris", ("Paris", "FR")),
+        ("paris, france", ("Paris", "FR")),
+        ("Sao Paulo", ("São Paulo", "BR")),
+        ("Joburg", ("Johannesburg", "ZA")),
+        # The most populous place of a name, unless the area says otherwise
+        ("Kingston", ("Kingston", "JM")),
+        ("Kingston, Ontario", ("Kingston", "CA")),
+        ("Kingston, ON, Canada", ("Kingston", "CA")),
+        # Unambiguous prefixes and misspellings
+        ("Johannes", ("Johannesburg", "ZA")),
+        ("Johanesburg", ("Johannesburg", "ZA")),
+        # A country alone resolves to the country
+        ("Jamaica", ("Jamaica", "JM")),
+    ],
+)
+def test_lookup(gazetteer, location, expected):
+    assert where(gazetteer.lookup(location)) == expected
+
+
+@pytest.mark.parametrize(
+    "location",
+    [
+        # Qualified by an area the gazetteer does not know
+        "Paris, Texas",
+        # A known place outside the named country
+        "Paris, Jamaica",
+        # Ambiguous prefix, and areas never match by prefix
+        "Port",
+        # Too short to match loosely, or nothing like any name
+        "Pa",
+        "Xyzzyville",
+        "",
+        " , ,",
+    ],
+)
+def test_lookup_unresolved(gazetteer, location):
+    assert gazetteer.lookup(location) is None
+
+
+def test_empty_gazetteer():
+    gazetteer = Gazetteer([], [])
+    assert gazetteer.lookup("Paris") is None
+    assert gazetteer.candidates("paris") == []
+
+
+def test_bundled_gazetteer():
+    assert where(geocode("Paris, France")) == ("Paris", "FR")
+    assert where(geocode("Kingston, Jamaica")) == ("Kingston", "JM")
+    assert geocode("Paris, Texas") is None
+
+
+def test_fill_coordinates():
+    timeline = [
+        {"location": "Lagos, Nigeria"},
+        {"location": "Lagos", "latitude": 1.0, "longitude": 2.0},
+        {"location": "Paris, Texas"},
+        {"location": None},
+    ]
+    assert fill_coordinates(timeline) == 1
+
+    lagos, kept, unknown, empty = timeline
+    assert lagos["geocoded"] == "Lagos, NG"
+    assert (lagos["latitude"], lagos["longitude"]) == pytest.approx((6.5244, 3.3792))
+    assert (kept["latitude"], kept["longitude"]) == (1.0, 2.0)
+    assert "geocoded" not in kept
+    assert unknown.get("latitude") is None
+    assert empty == {"location": None}
+
+
+def test_fill_coordinates_on_update():
+    previous = [
+        {
+            "location": "Lagos",
+            "latitude": 6.5,
+            "longitude": 3.4,
+            "geocoded": "Lagos, NG",
+        },
+        {
+            "location": "Paris",
+            "latitude": 48.9,
+            "longitude": 2.4,
+            "geocoded": "Paris, FR",
+        },
+    ]
+    timeline = [
+        # Still the earlier fill, so it follows the new location
+        {
+            "location": "Paris, France",
+            "latitude": 6.5,
+            "longitude": 3.4,
+            "geocoded": "Lagos, NG",
+        },
+        # The pin was moved by hand, so it is kept
+        {
+            "location": "Paris",
+            "latitude": 48.8,
+            "longitude": 2.3,
+            "geocoded": "Paris, FR",
+        },
+    ]
+    assert fill_coordinates(timeline, previous) == 1
+
+    moved, pinned = timeline
+    assert moved["geocoded"] == "Paris, FR"
+    assert moved["latitude"] == pytest.approx(48.8566)
+    assert (pinned["latitude"], pinned["longitude"]) == (48.8, 2.3)
+    assert pinned["geocoded"] is None
+
+    # Left unchanged, the pin stays put on later updates
+    assert fill_coordinates(timeline, [dict(e) for e in timeline]) == 1
+    assert (pinned["latitude"], pinned["longitude"]) == (48.8, 2.3)
@@ -0,0 +1,261 @@
+import struct
+
+import pytest
+
+from app.core.constants import CLUSTER_MAX_ZOOM, TILE_EXTENT
+from app.services.migration_maps import ScopeGeometry
+from app.utils.geo import clip_line, mercator, simplify
+from app.utils.mvt import LINESTRING, POINT, Layer, encode_geometry, encode_tile
+
+# Protobuf is decoded by hand, following the vector tile specification 2.1
+
+
+def read_varint(data: bytes, position: int):
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+
+
+def read_fields(data: bytes):
+    """(field, value) pairs, value an int, bytes or a fixed64 as bytes"""
+    fields, position = [], 0
+    while position < len(data):
+        key, position = read_varint(data, position)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, position = read_varint(data, position)
+        elif wire_type == 1:
+            value, position = data[position : position + 8], position + 8
+        elif wire_type == 2:
+            length, position = read_varint(data, position)
+            value, position = data[position : position + length], position + length
+        else:
+            raise ValueError(f"Unexpected wire type {wire_type}")
+        fields.append((field, value))
+    return fields
+
+
+def read_packed(data: bytes):
+    values, position = [], 0
+    while position < len(data):
+        value, position = read_varint(data, position)
+        values.append(value)
+    return values
+
+
+def unzigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+def decode_value(data: bytes):
+    [(field, value)] = read_fields(data)
+    if field == 1:
+        return value.decode()
+    if field == 3:
+        return struct.unpack("<d", value)[0]
+    if field == 5:
+        return value
+    if field == 6:
+        return unzigzag(value)
+    if field == 7:
+        return bool(value)
+    raise ValueError(f"Unexpected value field {field}")
+
+
+def decode_geometry(commands):
+    """Absolute coordinates, as a list of parts of (x, y) points"""
+    parts, x, y, i = [], 0, 0, 0
+    while i < len(commands):
+        command, count = commands[i] & 0x7, commands[i] >> 3
+        i += 1
+        if command == 1:
+            parts.append([])
+        for _ in range(count):
+            x += unzigzag(commands[i])
+            y += unzigzag(commands[i + 1])
+            i += 2
+            parts[-1].append((x, y))
+    return parts
+
+
+def decode_tile(data: bytes):
+    layers = {}
+    for field, layer_data in read_fields(data):
+        assert field == 3
+        layer = {"features": []}
+        keys, values, features = [], [], []
+        for layer_field, value in read_fields(layer_data):
+            if layer_field == 15:
+                layer["version"] = value
+            elif layer_field == 1:
+                name = value.decode()
+            elif layer_field == 2:
+                features.append(read_fields(value))
+            elif layer_field == 3:
+                keys.append(value.decode())
+            elif layer_field == 4:
+                values.append(decode_value(value))
+            elif layer_field == 5:
+                layer["extent"] = value
+        for feature in features:
+            fields = dict(feature)
+            tags = read_packed(fields.get(2, b""))
+            properties = {
+                keys[tags[i]]: values[tags[i + 1]] for i in range(0, len(tags), 2)
+            }
+            geometry = decode_geometry(read_packed(fields[4]))
+            layer["features"].append((fields[3], geometry, properties))
+        layers[name] = layer
+    return layers
+
+
+def test_encode_geometry_matches_the_specification_examples():
+    assert encode_geometry(POINT, [(25, 17)]) == [9, 50, 34]
+    assert encode_geometry(POINT, [(5, 7), (3, 2)]) == [17, 10, 14, 3, 9]
+    assert encode_geometry(LINESTRING, [[(2, 2), (2, 10), (10, 10)]]) == [
+        9,
+        4,
+        4,
+        18,
+        0,
+        16,
+        16,
+        0,
+    ]
+
+
+def test_layer_round_trip():
+    layer = Layer("places", 4096)
+    layer.add(POINT, [(-64, 4160)], {"name": "Lagos", "year": 1901, "skip": None})
+    layer.add(
+        POINT, [(10, 20)], {"name": "Accra", "year": -5, "cluster": True, "x": 1.5}
+    )
+    layer.add(LINESTRING, [[(0, 0), (300, 0)], [(0, 10), (0, 20)]], {"year": 1901})
+
+    tile = decode_tile(encode_tile([layer, Layer("empty", 4096)]))
+    assert list(tile) == ["places"]
+    places = tile["places"]
+    assert (places["version"], places["extent"]) == (2, 4096)
+    assert places["features"] == [
+        (POINT, [[(-64, 4160)]], {"name": "Lagos", "year": 1901}),
+        (POINT, [[(10, 20)]], {"name": "Accra", "year": -5, "cluster": True, "x": 1.5}),
+        (LINESTRING, [[(0, 0), (300, 0)], [(0, 10), (0, 20)]], {"year": 1901}),
+    ]
+
+
+def test_layer_keeps_typed_values_apart():
+    layer = Layer("values", 4096)
+    layer.add(POINT, [(0, 0)], {"a": 1, "b": 1.0, "c": True, "d": "1"})
+    [(_, _, properties)] = decode_tile(encode_tile([layer]))["values"]["features"]
+    assert [type(value) for value in properties.values()] == [int, float, bool, str]
+
+
+def test_empty_tile():
+    assert encode_tile([]) == b""
+    assert encode_tile([Layer("events", 4096)]) == b""
+    assert ScopeGeometry([]).tile(0, 0, 0) == b""
+
+
+def test_clip_line():
+    assert clip_line([], 0, 100) == []
+    assert clip_line([(10, 10)], 0, 100) == []
+    assert clip_line([(10, 10), (50, 50)], 0, 100) == [[(10, 10), (50, 50)]]
+    assert clip_line([(200, 0), (200, 100)], 0, 100) == []
+    # Leaves the square and comes back, so it is cut in two
+    assert clip_line([(50, 50), (150, 50), (150, 60), (50, 60)], 0, 100) == [
+        [(50, 50), (100.0, 50.0)],
+        [(100.0, 60.0), (50, 60)],
+    ]
+    # Crosses the whole square
+    assert clip_line([(-50, 50), (150, 50)], 0, 100) == [[(0.0, 50.0), (100.0, 50.0)]]
+
+
+def test_simplify():
+    assert simplify([], 1) == []
+    assert simplify([(0, 0), (5, 5)], 1) == [(0, 0), (5, 5)]
+    assert simplify([(0, 0), (5, 0.5), (10, 0)], 1) == [(0, 0), (10, 0)]
+    assert simplify([(0, 0), (5, 3), (10, 0)], 1) == [(0, 0), (5, 3), (10, 0)]
+    line = [(x, (x % 2) * 0.1) for x in range(50)] + [(50, 40)]
+    assert simplify(line, 1) == [(0, 0), (49, 0.1), (50, 40)]
+
+
+def tile_of(latitude, longitude, z):
+    x, y = mercator(latitude, longitude)
+    return z, int(x * 2**z), int(y * 2**z)
+
+
+def events(record_id, *places):
+    return [
+        {
+            "record_id": record_id,
+            "index": index,
+            "title": record_id,
+            "year": 1900 + index,
+            "event": "moved",
+            "location": "",
+            "latitude": latitude,
+            "longitude": longitude,
+        }
+        for index, (latitude, longitude) in enumerate(places)
+    ]
+
+
+def test_scope_geometry_tile():
+    lagos, accra = (6.5244, 3.3792), (5.6037, -0.187)
+    geometry = ScopeGeometry(
+        events("r1", lagos, accra)
+        + events("r2", lagos, accra)
+        + events("r3", (None, None), lagos)
+    )
+
+    # Far out, points and routes are kept as they are
+    z, x, y = tile_of(*lagos, CLUSTER_MAX_ZOOM)
+    tile = decode_tile(geometry.tile(z, x, y))
+    points = tile["events"]["features"]
+    assert len(points) == 3
+    assert all(feature[0] == POINT for feature in points)
+    assert {properties["record_id"] for _, _, properties in points} == {
+        "r1",
+        "r2",
+        "r3",
+    }
+    for _, [[(px, py)]], _ in points:
+        assert 0 <= px < TILE_EXTENT and 0 <= py < TILE_EXTENT
+    # The two routes are the same line, so they merge into one feature
+    [(kind, parts, properties)] = tile["routes"]["features"]
+    assert kind == LINESTRING
+    assert properties == {"record_count": 2}
+    assert len(parts) == 1
+
+    # Zoomed out, nearby points become a cluster
+    tile = decode_tile(geometry.tile(0, 0, 0))
+    clusters = [p for _, _, p in tile["events"]["features"] if p.get("cluster")]
+    # Lagos and Accra fall on either side of a cluster cell edge
+    assert sorted(
+        (cluster["point_count"], cluster["year_min"], cluster["year_max"])
+        for cluster in clusters
+    ) == [(2, 1901, 1901), (3, 1900, 1901)]
+
+    # Nothing on the far side of the world
+    z, x, y = tile_of(-33.9, 151.2, 8)
+    assert geometry.tile(z, x, y) == b""
+
+
+@pytest.mark.parametrize("z", [0, 3, 8])
+def test_scope_geometry_tiles_share_points_across_zooms(z):
+    geometry = ScopeGeometry(events("r1", (51.5, -0.1), (40.7, -74.0), (6.5, 3.4)))
+    total = 0
+    for x in range(2**z):
+        for y in range(2**z):
+            tile = decode_tile(geometry.tile(z, x, y))
+            for _, [[(px, py)]], properties in tile.get("events", {}).get(
+                "features", []
+            ):
+                if 0 <= px < TILE_EXTENT and 0 <= py < TILE_EXTENT:
+                    total += properties.get("point_count", 1)
+    assert total == 3
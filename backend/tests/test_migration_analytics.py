@@ -0,0 +1,161 @@
+import math
+import random
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from app.services.migration_analytics import (
+    MigrationFlows,
+    _event_rows,
+    region_center,
+    region_codes,
+)
+from app.utils.geo import haversine_km
+
+
+def make_flows(records):
+    flows = MigrationFlows()
+    rows = {record_id: _event_rows(events) for record_id, events in records.items()}
+    # As in load(), records without located events are left out
+    flows._records = {record_id: r for record_id, r in rows.items() if len(r)}
+    return flows
+
+
+def random_records(seed, count=80):
+    rng = random.Random(seed)
+    hubs = [(51.5, -0.1), (40.7, -74.0), (6.5, 3.4), (-33.9, 151.2), (19.4, -99.1)]
+    records = {}
+    for r in range(count):
+        events = []
+        for index in range(rng.randint(0, 6)):
+            latitude, longitude = rng.choice(hubs)
+            events.append(
+                {
+                    "record_id": f"r{r}",
+                    "index": index,
+                    "year": rng.choice([None, rng.randint(1800, 1990)]),
+                    "latitude": None if rng.random() < 0.1 else latitude,
+                    "longitude": longitude + rng.uniform(-1, 1),
+                }
+            )
+        rng.shuffle(events)
+        records[f"r{r}"] = events
+    return records
+
+
+def region(latitude, longitude, resolution):
+    rows, columns = math.ceil(180 / resolution), math.ceil(360 / resolution)
+    row = min(max(int((latitude + 90) // resolution), 0), rows - 1)
+    column = min(max(int((longitude + 180) // resolution), 0), columns - 1)
+    return row * columns + column
+
+
+def expected_flows(records, resolution):
+    """Flows counted one move at a time, to check the array version against"""
+    bins = defaultdict(list)
+    for events in records.values():
+        located = sorted(
+            (e for e in events if e["latitude"] is not None),
+            key=lambda e: e["index"],
+        )
+        for a, b in zip(located, located[1:]):
+            origin = region(a["latitude"], a["longitude"], resolution)
+            destination = region(b["latitude"], b["longitude"], resolution)
+            if origin != destination:
+                decade = (b["year"] or 0) // 10 * 10
+                distance = haversine_km(
+                    a["latitude"], a["longitude"], b["latitude"], b["longitude"]
+                )
+                bins[(decade, origin, destination)].append(distance)
+    ordered = sorted(bins.items(), key=lambda item: (-len(item[1]), item[0]))
+    return [
+        (decade, origin, destination, len(distances), sum(distances) / len(distances))
+        for (decade, origin, destination), distances in ordered
+    ]
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_flows_match_a_move_by_move_count(seed):
+    records = random_records(seed)
+    flows = make_flows(records).flows(resolution=5.0, limit=1000)
+    expected = expected_flows(records, 5.0)
+
+    assert flows["total_moves"] == sum(count for *_, count, _ in expected)
+    assert len(flows["flows"]) == len(expected)
+    for flow, (decade, origin, destination, count, mean) in zip(
+        flows["flows"], expected
+    ):
+        assert flow["decade"] == decade
+        assert flow["origin"] == region_center(origin, 5.0)
+        assert flow["destination"] == region_center(destination, 5.0)
+        assert flow["count"] == count
+        assert flow["mean_distance_km"] == pytest.approx(mean)
+
+
+def test_flows_decade_filter_and_limit():
+    flows = make_flows(random_records(4))
+    everything = flows.flows(resolution=5.0, limit=1000)["flows"]
+    window = flows.flows(5.0, decade_from=1850, decade_to=1900, limit=1000)["flows"]
+    assert window == [f for f in everything if 1850 <= f["decade"] <= 1900]
+    assert flows.flows(resolution=5.0, limit=3)["flows"] == everything[:3]
+
+
+def test_upsert_and_remove_drop_cached_results():
+    flows = make_flows({})
+    assert flows.flows(resolution=5.0)["total_moves"] == 0
+    flows.upsert(
+        "r1",
+        [
+            {"index": 1, "year": 1901, "latitude": 40.7, "longitude": -74.0},
+            {"index": 0, "year": 1890, "latitude": 51.5, "longitude": -0.1},
+        ],
+    )
+    [flow] = flows.flows(resolution=5.0)["flows"]
+    assert flow["decade"] == 1900
+    assert flow["count"] == 1
+    assert flow["mean_distance_km"] == pytest.approx(5570, rel=0.01)
+    flows.remove("r1")
+    assert flows.flows(resolution=5.0)["flows"] == []
+
+
+def test_heatmap():
+    records = random_records(5)
+    heatmap = make_flows(records).heatmap(resolution=10.0)
+    located = [
+        e for events in records.values() for e in events if e["latitude"] is not None
+    ]
+    assert heatmap["total_events"] == len(located)
+    assert sum(cell["count"] for cell in heatmap["cells"]) == len(located)
+
+
+def test_empty_flows():
+    flows = make_flows({"r1": [], "r2": [{"index": 0, "latitude": None}]})
+    assert flows.flows(resolution=1.0) == {
+        "resolution": 1.0,
+        "total_moves": 0,
+        "flows": [],
+    }
+    assert flows.heatmap(resolution=1.0)["cells"] == []
+    assert MigrationFlows().columns()["record"].shape == (0,)
+
+
+def test_region_codes_clip_the_poles_and_antimeridian():
+    codes = region_codes(np.array([90.0, -90.0]), np.array([180.0, -180.0]), 10.0)
+    assert [region_center(code, 10.0) for code in codes] == [
+        (85.0, 175.0),
+        (-85.0, -175.0),
+    ]
+
+
+def test_small_flows_and_cells_are_left_out():
+    records = random_records(6)
+    flows = make_flows(records)
+    everything = flows.flows(resolution=5.0, limit=1000)["flows"]
+    common = flows.flows(resolution=5.0, limit=1000, min_count=3)["flows"]
+    assert common == [flow for flow in everything if flow["count"] >= 3]
+    assert len(common) < len(everything)
+
+    cells = flows.heatmap(resolution=10.0)["cells"]
+    crowded = flows.heatmap(resolution=10.0, min_count=4)["cells"]
+    assert crowded == [cell for cell in cells if cell["count"] >= 4]